@@ -98,12 +98,13 @@ def type_check(ctx: context.Context, *files):
 
 
 @duty
-def test(ctx: context.Context, live: bool = False):
+def test(ctx: context.Context, live: bool = False, benchmark: bool = False):
     """Run tests on a single file."""
     ctx.run(
         (
             'uv run --active --no-sync coverage run  -m pytest -sv --durations=10'
             f'{" --live" if live else ""}'
+            f'{" --benchmark" if benchmark else ""}'
         ),
         title='Running test',
     )
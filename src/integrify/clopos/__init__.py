@@ -7,7 +7,42 @@ EN: https://developer.clopos.com
 __path__ = __import__('pkgutil').extend_path(__path__, __name__)
 
 
+from .breaker import CircuitBreaker
+from .cache import ResponseCache
+from .catalog import CatalogCache, CatalogSync
 from .client import CloposAsyncRequest, CloposClientClass, CloposRequest
+from .coalesce import RequestCoalescer
 from .env import VERSION
+from .executor import TransportConfig
+from .hedge import HedgePolicy
+from .idempotency import IdempotencyRegistry
+from .outbox import Outbox
+from .pagination import PageSizeController
+from .ratelimit import RateLimit, RateLimiter, SQLiteBucketStore
+from .retry import RetryPolicy
+from .tokens import TokenManager
+from .watchers import OrderWatcher, StopListWatcher
 
-__all__ = ['CloposClientClass', 'CloposRequest', 'CloposAsyncRequest', 'VERSION']
+__all__ = [
+    'CloposClientClass',
+    'CloposRequest',
+    'CloposAsyncRequest',
+    'CatalogCache',
+    'CatalogSync',
+    'CircuitBreaker',
+    'HedgePolicy',
+    'IdempotencyRegistry',
+    'OrderWatcher',
+    'Outbox',
+    'PageSizeController',
+    'RateLimit',
+    'RateLimiter',
+    'RequestCoalescer',
+    'ResponseCache',
+    'RetryPolicy',
+    'SQLiteBucketStore',
+    'StopListWatcher',
+    'TokenManager',
+    'TransportConfig',
+    'VERSION',
+]
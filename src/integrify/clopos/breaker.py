@@ -0,0 +1,257 @@
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+import httpx
+
+from integrify.clopos.exceptions import CloposCircuitOpenError
+from integrify.logger import LOGGER_FUNCTION
+
+__all__ = ['CircuitBreaker', 'CircuitStats', 'DEFAULT_GROUPS']
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_GROUPS: dict[str, str] = {
+    **dict.fromkeys(
+        [
+            'get_receipts',
+            'get_receipt_by_id',
+            'create_receipt',
+            'update_closed_receipt',
+            'update_receipt',
+            'close_receipt',
+            'delete_receipt',
+        ],
+        'receipts',
+    ),
+    **dict.fromkeys(['get_orders', 'get_order_by_id', 'create_order', 'update_order'], 'orders'),
+    **dict.fromkeys(
+        [
+            'get_products',
+            'get_product_by_id',
+            'get_stop_list',
+            'get_categories',
+            'get_category_by_id',
+            'get_stations',
+            'get_station_by_id',
+            'get_sale_types',
+            'get_payment_methods',
+        ],
+        'catalog',
+    ),
+    **dict.fromkeys(
+        ['get_customers', 'get_customer_by_id', 'create_customer', 'get_customer_groups'],
+        'customers',
+    ),
+}
+"""Endpoint groups by route name. Other endpoints are in `default` group"""
+
+logger = LOGGER_FUNCTION('Clopos')
+
+
+@dataclass
+class CircuitStats:
+    """Metrics of the circuit of an endpoint group"""
+
+    state: str = CLOSED
+    """Current state: `closed`, `open` or `half_open`"""
+
+    calls: int = 0
+    """Number of requests sent"""
+
+    failures: int = 0
+    """Number of failed requests (transport errors, 5xx responses)"""
+
+    slow_calls: int = 0
+    """Number of requests slower than `slow_call`"""
+
+    rejected: int = 0
+    """Number of requests rejected while circuit was open"""
+
+    trips: int = 0
+    """Number of times circuit was opened"""
+
+
+@dataclass
+class _Circuit:
+    window: deque
+    stats: CircuitStats = field(default_factory=CircuitStats)
+    opened_at: float = 0
+    probes: int = 0
+    """Probe requests in flight (half-open state)"""
+    succeeded: int = 0
+    """Successful probes (half-open state)"""
+
+
+class CircuitBreaker:  # pylint: disable=too-many-instance-attributes
+    """Circuit breaker per endpoint group. When Clopos degrades, requests fail fast with
+    `CloposCircuitOpenError`, instead of piling up on timeouts.
+
+    Circuit of the group is opened when at least `error_rate` of the last `window` requests
+    failed (transport errors, `5xx` responses), or at least `slow_rate` of them took longer than
+    `slow_call` seconds. After `open_for` seconds, the circuit is half-open: up to `probes`
+    requests are let through, and circuit is closed if all of them succeed, or opened again if
+    any fails.
+
+    Example:
+    ```python
+    from integrify.clopos import CircuitBreaker, CloposClientClass
+    from integrify.clopos.exceptions import CloposCircuitOpenError
+
+    breaker = CircuitBreaker(error_rate=0.5, slow_call=5, open_for=30)
+    client = CloposClientClass(auto_auth=True, circuit_breaker=breaker)
+
+    try:
+        client.create_receipt(...)
+    except CloposCircuitOpenError as exc:
+        ...  # e.g. queue the receipt for later, exc.retry_after
+
+    breaker.stats['receipts'].state
+    ```
+    """
+
+    def __init__(
+        self,
+        error_rate: float = 0.5,
+        slow_call: Optional[float] = None,
+        slow_rate: float = 0.8,
+        window: int = 20,
+        min_calls: int = 10,
+        open_for: float = 30,
+        probes: int = 1,
+        groups: Optional[dict[str, str]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            error_rate: Share of failed requests in the window, which opens the circuit
+            slow_call: Duration of a slow request, in seconds (`None` not to track latency)
+            slow_rate: Share of slow requests in the window, which opens the circuit
+            window: Number of the last requests, failure and slow rates are computed over
+            min_calls: Minimum number of requests in the window to open the circuit
+            open_for: Seconds until probe requests are allowed after circuit was opened
+            probes: Number of probe requests in half-open state
+            groups: Endpoint groups by route name (`DEFAULT_GROUPS` by default)
+            clock: Time source, in seconds
+        """
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.window = window
+        self.min_calls = min_calls
+        self.open_for = open_for
+        self.probes = probes
+        self.groups = DEFAULT_GROUPS if groups is None else groups
+        self.clock = clock
+
+        self._circuits: dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> dict[str, CircuitStats]:
+        """Metrics per endpoint group"""
+        return {group: circuit.stats for group, circuit in self._circuits.items()}
+
+    def group(self, route_name: Optional[str]) -> str:
+        """Endpoint group of the route"""
+        return self.groups.get(route_name, 'default')  # type: ignore[arg-type]
+
+    def state(self, group: str) -> str:
+        """Current state of the group circuit"""
+        with self._lock:
+            return self._circuit(group).stats.state
+
+    def _circuit(self, group: str) -> _Circuit:
+        circuit = self._circuits.get(group)
+        if circuit is None:
+            circuit = self._circuits[group] = _Circuit(deque(maxlen=self.window))
+
+        return circuit
+
+    def acquire(self, route_name: Optional[str]) -> None:
+        """Let the request through, or raise `CloposCircuitOpenError` if circuit is open"""
+        group = self.group(route_name)
+
+        with self._lock:
+            circuit = self._circuit(group)
+            stats = circuit.stats
+
+            if stats.state == OPEN:
+                remaining = circuit.opened_at + self.open_for - self.clock()
+                if remaining > 0:
+                    stats.rejected += 1
+                    raise CloposCircuitOpenError(group, remaining)
+
+                stats.state = HALF_OPEN
+                circuit.probes = circuit.succeeded = 0
+                logger.info('Circuit of %s is half-open', group)
+
+            if stats.state == HALF_OPEN:
+                if circuit.probes >= self.probes:
+                    stats.rejected += 1
+                    raise CloposCircuitOpenError(group, 0)
+
+                circuit.probes += 1
+
+    def failed(self, result: Any = None, error: Optional[BaseException] = None) -> bool:
+        """Check if the request failed due to upstream (not because of the request itself)"""
+        if error is not None:
+            return isinstance(error, httpx.TransportError)
+
+        return getattr(result, 'status_code', 0) >= 500
+
+    def release(
+        self,
+        route_name: Optional[str],
+        duration: float,
+        result: Any = None,
+        error: Optional[BaseException] = None,
+    ) -> None:
+        """Record the outcome of the request let through by `acquire`"""
+        group = self.group(route_name)
+        failed = self.failed(result, error)
+        slow = self.slow_call is not None and duration > self.slow_call
+
+        with self._lock:
+            circuit = self._circuit(group)
+            stats = circuit.stats
+
+            stats.calls += 1
+            stats.failures += failed
+            stats.slow_calls += slow
+
+            if stats.state == HALF_OPEN:
+                circuit.probes -= 1
+                if failed or slow:
+                    self._open(group, circuit)
+                elif error is None:
+                    circuit.succeeded += 1
+                    if circuit.succeeded >= self.probes:
+                        stats.state = CLOSED
+                        circuit.window.clear()
+                        logger.info('Circuit of %s is closed', group)
+
+                return
+
+            if stats.state == OPEN:  # opened by another request meanwhile
+                return
+
+            circuit.window.append((failed, slow))
+            if len(circuit.window) < self.min_calls:
+                return
+
+            failures = sum(outcome[0] for outcome in circuit.window) / len(circuit.window)
+            slows = sum(outcome[1] for outcome in circuit.window) / len(circuit.window)
+            if failures >= self.error_rate or slows >= self.slow_rate:
+                self._open(group, circuit)
+
+    def _open(self, group: str, circuit: _Circuit) -> None:
+        circuit.stats.state = OPEN
+        circuit.stats.trips += 1
+        circuit.opened_at = self.clock()
+        circuit.window.clear()
+        logger.warning('Circuit of %s is open for %.1fs', group, self.open_for)
@@ -0,0 +1,148 @@
+import asyncio
+from collections.abc import AsyncIterable
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Optional, Union
+
+from integrify.clopos.schemas.common.response import ErrorResponse, Errors
+
+__all__ = ['BulkResult', 'bulk_create', 'abulk_create', 'DEFAULT_BULK_CONCURRENCY']
+
+DEFAULT_BULK_CONCURRENCY = 16
+"""Number of requests sent at the same time by bulk creation"""
+
+
+@dataclass
+class BulkResult:
+    """Result of bulk creation: ids of created objects and errors of failed ones, by `cid`"""
+
+    created: dict[str, Any] = field(default_factory=dict)
+    """Mapping of `cid`s to ids of the created objects"""
+
+    failed: dict[str, ErrorResponse] = field(default_factory=dict)
+    """Mapping of `cid`s to errors. Exceptions (e.g. network errors) are converted to
+    `ErrorResponse` with exception name in `error`"""
+
+    @property
+    def total(self) -> int:
+        """Number of processed objects"""
+        return len(self.created) + len(self.failed)
+
+    @property
+    def ok(self) -> bool:
+        """Whether all objects were created"""
+        return not self.failed
+
+    def add(self, cid: str, resp: Any = None, error: Optional[BaseException] = None) -> None:
+        """Record response (or exception) of the request of the object"""
+        if error is not None:
+            self.failed[cid] = ErrorResponse(
+                success=False,
+                message=str(error) or type(error).__name__,
+                error=[Errors(message=str(error), exception=type(error).__name__)],
+            )
+            return
+
+        body = getattr(resp, 'body', None)
+        if isinstance(body, ErrorResponse):
+            self.failed[cid] = body
+        elif isinstance(body, dict):  # `raw` validation mode
+            self.created[cid] = (body.get('data') or {}).get('id')
+        else:
+            self.created[cid] = getattr(getattr(body, 'data', None), 'id', None)
+
+
+def _payload(item: Any) -> tuple[str, dict]:
+    """`cid` and arguments of the request of the object (dict or request model)"""
+    payload = item if isinstance(item, dict) else dict(item)
+    return str(payload['cid']), payload
+
+
+def bulk_create(
+    request: Callable[..., Any],
+    items: Iterable[Any],
+    concurrency: int = DEFAULT_BULK_CONCURRENCY,
+    **kwds,
+) -> BulkResult:
+    """Send create requests of the objects in a thread pool, with at most `concurrency` of
+    them in flight. Objects are taken from `items` as requests complete, so the input is never
+    materialized, and only ids (or errors) are kept.
+
+    Args:
+        request: Request function of the create endpoint (e.g. `client.create_receipt`)
+        items: Objects to create (dicts or request models with `cid`)
+        concurrency: Maximum number of requests sent at the same time
+        **kwds: Other arguments of the request function (e.g. `headers`)
+    """
+    result = BulkResult()
+    pending: dict[Future, str] = {}
+
+    def collect(return_when: str) -> None:
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            result.add(pending.pop(future), *_outcome(future))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='clopos-bulk') as pool:
+        try:
+            for item in items:
+                cid, payload = _payload(item)
+                pending[pool.submit(request, **payload, **kwds)] = cid
+                if len(pending) >= concurrency:
+                    collect(FIRST_COMPLETED)
+
+            if pending:
+                collect(ALL_COMPLETED)
+        finally:
+            for future in pending:
+                future.cancel()
+
+    return result
+
+
+def _outcome(future: Union[Future, asyncio.Task]) -> tuple[Any, Optional[BaseException]]:
+    """Response and exception of the completed request"""
+    error = future.exception()
+    return (None, error) if error is not None else (future.result(), None)
+
+
+async def _aiterate(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def abulk_create(
+    request: Callable[..., Awaitable[Any]],
+    items: Union[Iterable[Any], AsyncIterable[Any]],
+    concurrency: int = DEFAULT_BULK_CONCURRENCY,
+    **kwds,
+) -> BulkResult:
+    """Async version of `bulk_create`, which sends requests in tasks. `items` can also be an
+    async iterable.
+    """
+    result = BulkResult()
+    pending: dict[asyncio.Task, str] = {}
+
+    async def collect(return_when: str) -> None:
+        done, _ = await asyncio.wait(pending, return_when=return_when)
+        for task in done:
+            result.add(pending.pop(task), *_outcome(task))
+
+    loop = asyncio.get_running_loop()
+    try:
+        async for item in _aiterate(items):
+            cid, payload = _payload(item)
+            pending[loop.create_task(request(**payload, **kwds))] = cid
+            if len(pending) >= concurrency:
+                await collect(asyncio.FIRST_COMPLETED)
+
+        if pending:
+            await collect(asyncio.ALL_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
+
+    return result
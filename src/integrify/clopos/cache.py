@@ -0,0 +1,252 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+from integrify.api import APIPayloadHandler
+from integrify.clopos.validation import current_validation
+
+__all__ = ['ResponseCache', 'CacheStats', 'DEFAULT_TTLS']
+
+DEFAULT_TTLS: dict[str, float] = {
+    'get_venues': 300,
+    'get_customer_groups': 300,
+    'get_categories': 300,
+    'get_stations': 300,
+    'get_sale_types': 300,
+    'get_payment_methods': 300,
+}
+"""Default TTLs (in seconds) of the endpoints, whose data rarely changes"""
+
+CacheKey = tuple[Hashable, ...]
+
+
+def request_key(
+    route_name: str,
+    handler: APIPayloadHandler,
+    headers: Optional[dict],
+    args: tuple,
+    kwds: dict,
+    client_id: Optional[str] = None,
+) -> CacheKey:
+    """Key of the request: endpoint, serialized params, token scope (credential, brand and
+    venue), and validation mode. Requests with the same key get the same response.
+
+    Credential is the hash of `x-token` header, if it is given explicitly, and `client_id` (of
+    the token manager) otherwise, so that clients with different credentials never share
+    responses.
+    """
+    if handler.req_model:
+        payload = handler.req_model.from_args(*args, **kwds).model_dump(mode='json', by_alias=True)
+    else:
+        payload = kwds
+
+    scope = {**handler.headers, **(headers or {})}
+    token = scope.get('x-token')
+    return (
+        route_name,
+        json.dumps(payload, sort_keys=True, default=str),
+        hashlib.sha256(token.encode()).hexdigest() if token else client_id,
+        scope.get('x-brand'),
+        scope.get('x-venue'),
+        current_validation(),
+    )
+
+
+@dataclass
+class CacheStats:
+    """Counters of the response cache"""
+
+    hits: int = 0
+    """Number of requests served from the cache"""
+
+    misses: int = 0
+    """Number of requests sent, as there were no (fresh) cached responses"""
+
+    evictions: int = 0
+    """Number of entries evicted to stay within the limits"""
+
+    invalidations: int = 0
+    """Number of entries dropped by `invalidate`"""
+
+    stale_hits: int = 0
+    """Number of requests served with stale responses, while they were being refreshed"""
+
+    refreshes: int = 0
+    """Number of stale responses refreshed in the background"""
+
+    refresh_failures: int = 0
+    """Number of failed background refreshes"""
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    size: int
+    stored_at: float
+    expires_at: float
+
+
+class ResponseCache:  # pylint: disable=too-many-instance-attributes
+    """In-memory cache of successful GET responses, with per-endpoint TTLs. Least recently used
+    entries are evicted, when the number of entries or their total size exceeds the limits.
+
+    Responses are keyed by endpoint, serialized request model (so `filters`, `with_`, `selects`
+    etc. are part of the key), brand/venue of the request and validation mode.
+
+    With `max_stale`, expired responses are still served (stale-while-revalidate) for that long,
+    while they are refreshed in the background: in a thread for sync client, in a task for async
+    client. Later than that, callers wait for the fresh response.
+
+    Cached responses are shared between callers, so they should not be modified.
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        ttl: Optional[dict[str, float]] = None,
+        max_entries: int = 1024,
+        max_bytes: int = 16 * 1024 * 1024,
+        max_stale: float = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            ttl: TTLs (in seconds) per endpoint, merged with `DEFAULT_TTLS`. Endpoints with
+                zero TTL (or not listed) are not cached
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum total size of cached responses (by their `Content-Length`)
+            max_stale: How long (in seconds) after expiration responses are served, while they
+                are refreshed in the background. Zero disables stale-while-revalidate
+            clock: Time source, in seconds
+        """
+        self.ttl = {**DEFAULT_TTLS, **(ttl or {})}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_stale = max_stale
+        self.clock = clock
+
+        self.stats = CacheStats()
+        """Cache counters"""
+
+        self._entries: OrderedDict[CacheKey, CacheEntry] = OrderedDict()
+        self._bytes = 0
+        self._refreshing: set[CacheKey] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        """Total size of cached responses in bytes"""
+        return self._bytes
+
+    def cacheable(self, route_name: Optional[str]) -> bool:
+        """Check if responses of the endpoint are cached"""
+        return self.ttl.get(route_name, 0) > 0  # type: ignore[arg-type]
+
+    def key(
+        self,
+        route_name: str,
+        handler: APIPayloadHandler,
+        headers: Optional[dict],
+        args: tuple,
+        kwds: dict,
+        client_id: Optional[str] = None,
+    ) -> CacheKey:
+        """Cache key of the request"""
+        return request_key(route_name, handler, headers, args, kwds, client_id)
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        """Fresh cached response (`None` if there is no such)"""
+        value, fresh = self.lookup(key)
+        return value if fresh else None
+
+    def lookup(self, key: CacheKey) -> tuple[Optional[Any], bool]:
+        """Cached response, and whether it is fresh. Expired responses are returned only within
+        `max_stale` after expiration (`None` otherwise).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            now = self.clock()
+
+            if entry is None or entry.expires_at + self.max_stale <= now:
+                self.stats.misses += 1
+                return None, False
+
+            self._entries.move_to_end(key)
+            if entry.expires_at > now:
+                self.stats.hits += 1
+                return entry.value, True
+
+            self.stats.stale_hits += 1
+            return entry.value, False
+
+    def claim_refresh(self, key: CacheKey) -> bool:
+        """Mark the stale response as being refreshed. Returns `False` if it is already being
+        refreshed, so that only one refresh per response is in flight.
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+
+            self._refreshing.add(key)
+            return True
+
+    def release_refresh(self, key: CacheKey, refreshed: bool) -> None:
+        """Mark the refresh of the response as finished
+
+        Args:
+            key: Cache key of the request
+            refreshed: Whether the response was refreshed successfully
+        """
+        with self._lock:
+            self._refreshing.discard(key)
+
+            if refreshed:
+                self.stats.refreshes += 1
+            else:
+                self.stats.refresh_failures += 1
+
+    def set(self, key: CacheKey, value: Any, size: int) -> None:
+        """Cache the response of the request
+
+        Args:
+            key: Cache key of the request (see `key`)
+            value: Response
+            size: Size of the response in bytes
+        """
+        if size > self.max_bytes:
+            return
+
+        now = self.clock()
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = CacheEntry(value, size, now, now + self.ttl[key[0]])  # type: ignore[index]
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    def invalidate(self, route_name: Optional[str] = None) -> int:
+        """Drop cached responses of the endpoint (or all of them)
+
+        Returns:
+            Number of dropped responses
+        """
+        with self._lock:
+            keys = [key for key in self._entries if route_name in (None, key[0])]
+            for key in keys:
+                self._drop(key)
+
+            self.stats.invalidations += len(keys)
+            return len(keys)
+
+    def _drop(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
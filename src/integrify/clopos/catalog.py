@@ -0,0 +1,541 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator, Optional, Union
+
+from pydantic import BaseModel, TypeAdapter
+
+from integrify.clopos.exceptions import CloposResponseError
+from integrify.clopos.pagination import DEFAULT_CONCURRENCY, DEFAULT_PAGE_LIMIT
+from integrify.clopos.streaming import item_model
+from integrify.logger import LOGGER_FUNCTION
+
+if TYPE_CHECKING:
+    from integrify.clopos.client import CloposClientClass
+
+__all__ = ['CatalogCache', 'CatalogSync', 'CatalogDelta', 'SQLiteCatalogStore', 'CATALOG_ROUTES']
+
+CATALOG_ROUTES: dict[str, str] = {
+    'products': 'get_products',
+    'categories': 'get_categories',
+    'stations': 'get_stations',
+    'sale_types': 'get_sale_types',
+    'payment_methods': 'get_payment_methods',
+}
+"""Catalog kinds and their list endpoints"""
+
+BY_ID_ROUTES: dict[str, str] = {
+    'products': 'get_product_by_id',
+    'categories': 'get_category_by_id',
+    'stations': 'get_station_by_id',
+}
+"""Catalog kinds, whose records can be fetched one by one"""
+
+INDEX_FIELDS = ['id', 'updated_at', 'deleted_at']
+"""Fields of the product index: list of products with these fields only (via `selects`)"""
+
+StoredRecord = tuple[int, str, Optional[str]]
+"""Stored record: (id, JSON of the record, `updated_at`)"""
+
+
+@lru_cache
+def _adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(list[model])  # type: ignore[valid-type]
+
+
+class SQLiteCatalogStore:
+    """Catalog records in a local SQLite database, with their `updated_at` and fetch time.
+    Records are stored as received from Clopos, and validated on load.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path of the database file
+        """
+        self.path = path
+
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS clopos_catalog ('
+                'kind TEXT NOT NULL, id INTEGER NOT NULL, data TEXT NOT NULL, '
+                'updated_at TEXT, fetched_at REAL NOT NULL, PRIMARY KEY (kind, id))'
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def load(self, kind: str) -> tuple[list[str], Optional[float]]:
+        """JSON of the stored records of the kind (ordered by id), and when they were fetched
+        (`None` if there are no records)
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT data, fetched_at FROM clopos_catalog WHERE kind = ? ORDER BY id',
+                (kind,),
+            ).fetchall()
+
+        if not rows:
+            return [], None
+
+        return [data for data, _ in rows], min(fetched_at for _, fetched_at in rows)
+
+    def replace(self, kind: str, records: Iterable[StoredRecord], fetched_at: float) -> None:
+        """Replace all records of the kind"""
+        with self._connect() as conn:
+            conn.execute('DELETE FROM clopos_catalog WHERE kind = ?', (kind,))
+            conn.executemany(
+                'INSERT INTO clopos_catalog VALUES (?, ?, ?, ?, ?)',
+                ((kind, id_, data, updated_at, fetched_at) for id_, data, updated_at in records),
+            )
+
+    def upsert(self, kind: str, records: Iterable[StoredRecord], fetched_at: float) -> None:
+        """Insert or update given records of the kind"""
+        with self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO clopos_catalog VALUES (?, ?, ?, ?, ?)',
+                ((kind, id_, data, updated_at, fetched_at) for id_, data, updated_at in records),
+            )
+
+    def delete(self, kind: str, ids: Iterable[int]) -> None:
+        """Delete given records of the kind"""
+        with self._connect() as conn:
+            conn.executemany(
+                'DELETE FROM clopos_catalog WHERE kind = ? AND id = ?',
+                ((kind, id_) for id_ in ids),
+            )
+
+
+class CatalogCache:  # pylint: disable=too-many-instance-attributes
+    """Products, categories, stations, sale types and payment methods kept in memory, and
+    optionally persisted in SQLite, so that restarted processes do not wait for the full
+    catalog download.
+
+    `start` loads the stored catalog, fetches only the kinds that are not stored yet, and
+    revalidates the stored ones in the background (in a thread for sync client, in a task for
+    async client).
+
+    Example:
+    ```python
+    from integrify.clopos import CatalogCache, CloposRequest
+
+    catalog = CatalogCache(CloposRequest, store='catalog.sqlite3').start()
+
+    catalog['products']  # list of `Product`
+    catalog.get('products', 1)  # `Product` with id 1
+    ```
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        client: 'CloposClientClass',
+        store: Union[str, SQLiteCatalogStore, None] = None,
+        kinds: Iterable[str] = tuple(CATALOG_ROUTES),
+        concurrency: int = DEFAULT_CONCURRENCY,
+        limit: int = DEFAULT_PAGE_LIMIT,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            client: Clopos client (sync or async) to fetch the catalog with
+            store: SQLite store (or path of its file). If not given, catalog is kept in memory only
+            kinds: Catalog kinds to keep (see `CATALOG_ROUTES`)
+            concurrency: Maximum number of pages fetched at the same time
+            limit: Page size
+            clock: Time source of fetch times
+        """
+        self.client = client
+        self.store = SQLiteCatalogStore(store) if isinstance(store, str) else store
+        self.kinds = tuple(kinds)
+        self.concurrency = concurrency
+        self.limit = limit
+        self.clock = clock
+
+        self.records: dict[str, dict[int, BaseModel]] = {}
+        """Records per kind, by id"""
+
+        self.fetched_at: dict[str, float] = {}
+        """When records of the kind were fetched from Clopos"""
+
+        self.revalidation: Union[threading.Thread, asyncio.Task, None] = None
+        """Background revalidation started by `start`/`astart`"""
+
+    def __getitem__(self, kind: str) -> list[Any]:
+        return list(self.records.get(kind, {}).values())
+
+    def get(self, kind: str, id_: int) -> Optional[Any]:
+        """Record of the kind by its id"""
+        return self.records.get(kind, {}).get(id_)
+
+    def load(self) -> list[str]:
+        """Load stored records into memory
+
+        Returns:
+            Kinds, which are not stored
+        """
+        missing = []
+        for kind in self.kinds:
+            rows, fetched_at = self.store.load(kind) if self.store else ([], None)
+            if fetched_at is None:
+                missing.append(kind)
+                continue
+
+            records = _adapter(self._model(kind)).validate_json(f'[{",".join(rows)}]')
+            self.records[kind] = {record.id: record for record in records}
+            self.fetched_at[kind] = fetched_at
+
+        return missing
+
+    def start(self, revalidate: bool = True) -> 'CatalogCache':
+        """Load stored catalog, fetch missing kinds, and revalidate stored ones in a background
+        thread
+        """
+        missing = self.load()
+        self.refresh(missing)
+
+        stored = [kind for kind in self.kinds if kind not in missing]
+        if revalidate and stored:
+            self.revalidation = threading.Thread(
+                target=self._revalidate,
+                args=(stored,),
+                daemon=True,
+            )
+            self.revalidation.start()
+
+        return self
+
+    def refresh(self, kinds: Optional[Iterable[str]] = None) -> None:
+        """Fetch records of the kinds (all by default) and store them"""
+        for kind in self.kinds if kinds is None else kinds:
+            fetched_at = self.clock()
+            items = list(self._fetch_all(kind))
+            self._save(kind, items, fetched_at)
+
+    def _revalidate(self, kinds: list[str]) -> None:
+        try:
+            self.refresh(kinds)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # stored catalog is still served
+            self._logger.exception('Background catalog revalidation failed')
+
+    async def astart(self, revalidate: bool = True) -> 'CatalogCache':
+        """Async version of `start`: revalidation is done in a task"""
+        missing = self.load()
+        await self.arefresh(missing)
+
+        stored = [kind for kind in self.kinds if kind not in missing]
+        if revalidate and stored:
+            self.revalidation = asyncio.get_running_loop().create_task(self._arevalidate(stored))
+
+        return self
+
+    async def arefresh(self, kinds: Optional[Iterable[str]] = None) -> None:
+        """Async version of `refresh`"""
+        for kind in self.kinds if kinds is None else kinds:
+            fetched_at = self.clock()
+            items = [item async for item in self._fetch_all(kind)]
+            self._save(kind, items, fetched_at)
+
+    async def _arevalidate(self, kinds: list[str]) -> None:
+        try:
+            await self.arefresh(kinds)
+        except Exception:  # pylint: disable=broad-exception-caught
+            self._logger.exception('Background catalog revalidation failed')
+
+    def _fetch_all(self, kind: str):
+        # raw items are both validated and stored as they are
+        return self.client.fetch_all(
+            CATALOG_ROUTES[kind],
+            self.concurrency,
+            limit=self.limit,
+            validation='raw',
+        )
+
+    def _save(self, kind: str, items: list[dict], fetched_at: float) -> None:
+        records = _adapter(self._model(kind)).validate_python(items)
+
+        if self.store:
+            self.store.replace(
+                kind,
+                ((item['id'], json.dumps(item), item.get('updated_at')) for item in items),
+                fetched_at,
+            )
+
+        self.records[kind] = {record.id: record for record in records}
+        self.fetched_at[kind] = fetched_at
+
+    def _model(self, kind: str) -> type[BaseModel]:
+        return item_model(self.client.handlers[CATALOG_ROUTES[kind]])
+
+    @property
+    def _logger(self):
+        return LOGGER_FUNCTION('Clopos')
+
+
+@dataclass
+class CatalogDelta:
+    """Changes applied to the mirror by a sync cycle"""
+
+    added: list[int] = field(default_factory=list)
+    """Ids of the new records"""
+
+    updated: list[int] = field(default_factory=list)
+    """Ids of the changed records"""
+
+    deleted: list[int] = field(default_factory=list)
+    """Ids of the deleted records"""
+
+    full_scan: bool = False
+    """Whether all records were downloaded (otherwise, only changed ones were)"""
+
+    fetched: int = 0
+    """Number of full records downloaded"""
+
+    high_water_mark: Optional[str] = None
+    """Latest `updated_at` of the mirror after the cycle"""
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.updated or self.deleted)
+
+
+class CatalogSync:  # pylint: disable=too-many-instance-attributes
+    """Local mirror of a catalog kind (products by default) keyed by id, which is kept in sync
+    with Clopos by fetching only what changed.
+
+    Clopos list endpoints cannot filter by time, so changes are found with an index scan: list
+    of products with `id`, `updated_at` and `deleted_at` only (via `selects`). Records, whose
+    `updated_at` differs from the mirrored one (i.e. changed after the high-water mark), are
+    fetched one by one; records missing in the index or with `deleted_at` are deleted.
+
+    Full scan (all records are downloaded and compared by their hashes) is done on the first
+    cycle, for kinds without index (everything but products), when the index has no
+    `updated_at`, or when more than `max_changes` records changed.
+
+    Example:
+    ```python
+    from integrify.clopos import CatalogSync, CloposRequest
+
+    products = CatalogSync(CloposRequest, store='catalog.sqlite3')
+
+    delta = products.pull()
+    print(delta.added, delta.updated, delta.deleted)
+    products.records[1]  # `Product` with id 1
+    ```
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        client: 'CloposClientClass',
+        kind: str = 'products',
+        store: Union[str, SQLiteCatalogStore, None] = None,
+        max_changes: int = 100,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        limit: int = DEFAULT_PAGE_LIMIT,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            client: Clopos client (sync or async) to fetch the records with
+            kind: Catalog kind to mirror (see `CATALOG_ROUTES`)
+            store: SQLite store (or path of its file), which mirror is loaded from and saved to
+            max_changes: Maximum number of changed records fetched one by one. If more records
+                changed, all of them are downloaded instead
+            concurrency: Maximum number of requests in flight
+            limit: Page size
+            clock: Time source of fetch times
+        """
+        self.client = client
+        self.kind = kind
+        self.store = SQLiteCatalogStore(store) if isinstance(store, str) else store
+        self.max_changes = max_changes
+        self.concurrency = concurrency
+        self.limit = limit
+        self.clock = clock
+
+        self.records: dict[int, BaseModel] = {}
+        """Mirrored records by id"""
+
+        self._hashes: dict[int, str] = {}
+        self._updated_at: dict[int, Optional[str]] = {}
+
+        if self.store:
+            self._load()
+
+    @property
+    def high_water_mark(self) -> Optional[str]:
+        """Latest `updated_at` of the mirrored records"""
+        return max(filter(None, self._updated_at.values()), default=None)
+
+    def pull(self) -> CatalogDelta:
+        """Fetch changes since the last cycle and apply them to the mirror"""
+        if not self.records or self.kind not in BY_ID_ROUTES:
+            return self._apply_scan(list(self._fetch_all()))
+
+        index = list(self._fetch_all(selects=INDEX_FIELDS)) if self.kind == 'products' else None
+        changes = self._diff_index(index)
+        if changes is None:
+            return self._apply_scan(list(self._fetch_all()))
+
+        changed, deleted = changes
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            responses = list(pool.map(self._fetch_by_id, changed))
+
+        return self._apply_changes(changed, responses, deleted)
+
+    async def apull(self) -> CatalogDelta:
+        """Async version of `pull`"""
+        if not self.records or self.kind not in BY_ID_ROUTES:
+            return self._apply_scan([item async for item in self._fetch_all()])
+
+        index = None
+        if self.kind == 'products':
+            index = [item async for item in self._fetch_all(selects=INDEX_FIELDS)]
+
+        changes = self._diff_index(index)
+        if changes is None:
+            return self._apply_scan([item async for item in self._fetch_all()])
+
+        changed, deleted = changes
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(id_: int):
+            async with semaphore:
+                return await self._fetch_by_id(id_)
+
+        responses = await asyncio.gather(*(fetch(id_) for id_ in changed))
+        return self._apply_changes(changed, responses, deleted)
+
+    def _load(self) -> None:
+        rows, _ = self.store.load(self.kind)  # type: ignore[union-attr]
+        records = _adapter(self._model()).validate_json(f'[{",".join(rows)}]')
+
+        for data, record in zip(rows, records):
+            item = json.loads(data)
+            self._mirror(record.id, record, item)
+
+    def _fetch_all(self, **kwds):
+        return self.client.fetch_all(
+            CATALOG_ROUTES[self.kind],
+            self.concurrency,
+            limit=self.limit,
+            validation='raw',
+            **kwds,
+        )
+
+    def _fetch_by_id(self, id_: int):
+        return getattr(self.client, BY_ID_ROUTES[self.kind])(id_, validation='raw')
+
+    def _diff_index(self, index: Optional[list[dict]]) -> Optional[tuple[list[int], list[int]]]:
+        """Changed and deleted ids by the index (`None` if full scan is needed)"""
+        if index is None or any('updated_at' not in item for item in index):
+            return None
+
+        changed, deleted, seen = [], [], set()
+        for item in index:
+            id_ = item['id']
+            seen.add(id_)
+
+            if item.get('deleted_at'):
+                if id_ in self.records:
+                    deleted.append(id_)
+            elif id_ not in self.records or self._updated_at[id_] != item['updated_at']:
+                changed.append(id_)
+
+        deleted.extend(id_ for id_ in self.records if id_ not in seen)
+
+        if len(changed) > self.max_changes:
+            return None
+
+        return changed, deleted
+
+    def _apply_scan(self, items: list[dict]) -> CatalogDelta:
+        """Apply full list of records, comparing them with the mirror by their hashes"""
+        fetched_at = self.clock()
+        delta = CatalogDelta(full_scan=True, fetched=len(items))
+
+        live = [item for item in items if not item.get('deleted_at')]
+        records = _adapter(self._model()).validate_python(live)
+
+        upserts, seen = [], set()
+        for item, record in zip(live, records):
+            seen.add(record.id)
+            if record.id not in self.records:
+                delta.added.append(record.id)
+            elif self._hashes[record.id] != _hash(item):
+                delta.updated.append(record.id)
+            else:
+                continue
+
+            upserts.append(self._mirror(record.id, record, item))
+
+        delta.deleted = [id_ for id_ in self.records if id_ not in seen]
+        self._save(upserts, delta.deleted, fetched_at)
+
+        delta.high_water_mark = self.high_water_mark
+        return delta
+
+    def _apply_changes(
+        self,
+        changed: list[int],
+        responses: list[Any],
+        deleted: list[int],
+    ) -> CatalogDelta:
+        """Apply records fetched one by one"""
+        fetched_at = self.clock()
+        delta = CatalogDelta(deleted=deleted, fetched=len(changed))
+
+        items = []
+        for id_, resp in zip(changed, responses):
+            if resp.status_code == 404:  # deleted after the index was fetched
+                delta.deleted.append(id_)
+            elif not resp.ok:
+                raise CloposResponseError(f'Could not fetch record {id_}', resp)
+            elif resp.body['data'].get('id') != id_:
+                raise CloposResponseError(f'Record {id_} was answered with another one', resp)
+            else:
+                items.append(resp.body['data'])
+
+        upserts = []
+        records = _adapter(self._model()).validate_python(items)
+        for item, record in zip(items, records):
+            (delta.updated if record.id in self.records else delta.added).append(record.id)
+            upserts.append(self._mirror(record.id, record, item))
+
+        self._save(upserts, delta.deleted, fetched_at)
+
+        delta.high_water_mark = self.high_water_mark
+        return delta
+
+    def _mirror(self, id_: int, record: BaseModel, item: dict) -> StoredRecord:
+        self.records[id_] = record
+        self._hashes[id_] = _hash(item)
+        self._updated_at[id_] = item.get('updated_at')
+        return id_, json.dumps(item), item.get('updated_at')
+
+    def _save(self, upserts: list[StoredRecord], deleted: list[int], fetched_at: float) -> None:
+        for id_ in deleted:
+            self.records.pop(id_, None)
+            self._hashes.pop(id_, None)
+            self._updated_at.pop(id_, None)
+
+        if self.store:
+            self.store.upsert(self.kind, upserts, fetched_at)
+            self.store.delete(self.kind, deleted)
+
+    def _model(self) -> type[BaseModel]:
+        return item_model(self.client.handlers[CATALOG_ROUTES[self.kind]])
+
+
+def _hash(item: dict) -> str:
+    data = json.dumps(item, sort_keys=True).encode()
+    return hashlib.sha1(data, usedforsecurity=False).hexdigest()
@@ -1,61 +1,118 @@
-from datetime import date, datetime
-from decimal import Decimal
-from typing import TYPE_CHECKING, Literal, Optional, Union
-
-from integrify.api import APIClient
+import asyncio
+import contextvars
+import importlib
+import threading
+import time
+from functools import partial
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, Union
+from urllib.parse import urljoin
+
+import httpx
+
+from integrify.api import APIClient, APIPayloadHandler
 from integrify.clopos import env
-from integrify.clopos.handlers import (
-    AuthHandler,
-    CreateCustomerHandler,
-    CreateOrderHandler,
-    CreateReceiptHandler,
-    DeleteReceiptHandler,
-    GetByIDHandler,
-    GetCategoriesHandler,
-    GetCategoryByIDHandler,
-    GetCustomersHandler,
-    GetOrderByIDHandler,
-    GetOrdersHandler,
-    GetPaginatedDataHandler,
-    GetProductByIDHandler,
-    GetProductsHandler,
-    GetReceiptsHandler,
-    GetStationsHandler,
-    GetStopListHandler,
-    UpdateClosedReceiptHandler,
-    UpdateOrderHandler,
-    UpdateReceiptHandler,
-)
-from integrify.clopos.schemas.auth.response import AuthResponse
-from integrify.clopos.schemas.categories.object import Category
-from integrify.clopos.schemas.common.response import (
-    BaseResponse,
-    ObjectListResponse,
-    ObjectResponse,
+from integrify.clopos.breaker import CircuitBreaker
+from integrify.clopos.bulk import DEFAULT_BULK_CONCURRENCY, abulk_create, bulk_create
+from integrify.clopos.cache import ResponseCache, request_key
+from integrify.clopos.coalesce import RequestCoalescer
+from integrify.clopos.exceptions import CloposResponseError
+from integrify.clopos.executor import CloposExecutor, TransportConfig
+from integrify.clopos.hedge import HedgePolicy
+from integrify.clopos.idempotency import (
+    DEFAULT_LOOKUP_LIMIT,
+    LOOKUP_ARGS,
+    RECONCILE_ROUTES,
+    IdempotencyRegistry,
+    payload_cid,
 )
-from integrify.clopos.schemas.customers.object import Customer, Group
-from integrify.clopos.schemas.customers.request import CustomerFilter
-from integrify.clopos.schemas.enums import (
-    CategoryType,
-    DiscountType,
-    Gender,
-    OrderStatus,
+from integrify.clopos.pagination import (
+    DEFAULT_CONCURRENCY,
+    PageSizeController,
+    afetch_all,
+    apaginate,
+    fetch_all,
+    page_items,
+    paginate,
 )
-from integrify.clopos.schemas.orders.object import Order, OrderPayloadIn
-from integrify.clopos.schemas.products.object import Product, StopList
-from integrify.clopos.schemas.products.request import GetProducstRequestFilter, StopListFilter
-from integrify.clopos.schemas.receipts.object import Receipt, ReceiptProductIn
-from integrify.clopos.schemas.receipts.request import PaymentMethodIn, UpdateReceiptMetaData
-from integrify.clopos.schemas.sales.object import PaymentMethod, SaleType
-from integrify.clopos.schemas.stations.object import Station
-from integrify.clopos.schemas.users.object import User
-from integrify.clopos.schemas.venues.object import Venue
-from integrify.schemas import APIResponse
+from integrify.clopos.ratelimit import RateLimiter
+from integrify.clopos.retry import RetryPolicy
+from integrify.clopos.schemas.common.request import PaginatedDataRequest
+from integrify.clopos.streaming import AsyncStreamedPage, StreamedPage, item_model
+from integrify.clopos.tokens import TokenManager
+from integrify.clopos.validation import ValidationMode, current_validation, validation
 from integrify.utils import UNSET, Unset, UnsetOrNone
 
+if TYPE_CHECKING:
+    from datetime import date, datetime
+    from decimal import Decimal
+    from typing import Any, AsyncIterable, Iterable, Literal
+
+    from integrify.clopos.schemas.auth.response import AuthResponse
+    from integrify.clopos.schemas.categories.object import Category
+    from integrify.clopos.schemas.common.response import (
+        BaseResponse,
+        ObjectListResponse,
+        ObjectResponse,
+    )
+    from integrify.clopos.schemas.customers.object import Customer, Group
+    from integrify.clopos.schemas.customers.request import CustomerFilter
+    from integrify.clopos.schemas.enums import (
+        CategoryType,
+        DiscountType,
+        Gender,
+        OrderStatus,
+    )
+    from integrify.clopos.schemas.orders.object import Order, OrderPayloadIn
+    from integrify.clopos.schemas.products.object import Product, StopList
+    from integrify.clopos.schemas.products.request import GetProducstRequestFilter, StopListFilter
+    from integrify.clopos.schemas.receipts.object import Receipt, ReceiptProductIn
+    from integrify.clopos.schemas.receipts.request import PaymentMethodIn, UpdateReceiptMetaData
+    from integrify.clopos.schemas.sales.object import PaymentMethod, SaleType
+    from integrify.clopos.schemas.stations.object import Station
+    from integrify.clopos.schemas.users.object import User
+    from integrify.clopos.schemas.venues.object import Venue
+    from integrify.schemas import APIResponse
+
 __all__ = ['CloposClientClass', 'CloposRequest', 'CloposAsyncRequest']
 
 
+class LazyHandlers(dict):
+    """Mapping of route names to handlers, which creates handlers on first access.
+
+    Values can be given as handler instances, classes, or class names in
+    `integrify.clopos.handlers` (that module, with all schemas, is imported on first access).
+    `configure` is called with route name and handler, once the handler is created.
+    """
+
+    def __init__(self, configure: Optional[Callable[[str, APIPayloadHandler], None]] = None):
+        super().__init__()
+        self.configure = configure
+
+    def __getitem__(self, route_name: str) -> APIPayloadHandler:
+        handler = super().__getitem__(route_name)
+
+        if not isinstance(handler, APIPayloadHandler):
+            if isinstance(handler, str):
+                handler = getattr(importlib.import_module('integrify.clopos.handlers'), handler)
+
+            handler = handler()
+            if self.configure is not None:
+                self.configure(route_name, handler)
+
+            super().__setitem__(route_name, handler)
+
+        return handler
+
+    def get(self, route_name: str, default=None):  # type: ignore[override]
+        return self[route_name] if route_name in self else default
+
+    def values(self):  # type: ignore[override]
+        return [self[route_name] for route_name in self]
+
+    def items(self):  # type: ignore[override]
+        return [(route_name, self[route_name]) for route_name in self]
+
+
 class CloposClientClass(APIClient):
     """Base class for CloposClient"""
 
@@ -66,86 +123,809 @@ class CloposClientClass(APIClient):
         default_handler=None,
         sync: bool = True,
         dry: bool = False,
+        token_manager: Optional[TokenManager] = None,
+        auto_auth: bool = False,
+        validation: Optional[ValidationMode] = None,
+        cache: Optional[ResponseCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        retry_policy: Optional[RetryPolicy] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        coalescer: Optional[RequestCoalescer] = None,
+        hedging: Optional[HedgePolicy] = None,
+        transport: Optional[TransportConfig] = None,
+        idempotency: Optional[IdempotencyRegistry] = None,
     ):
-        super().__init__(name, base_url, default_handler, sync, dry)
+        """
+        Args:
+            name: Client name, used for logging
+            base_url: Base url of Clopos API
+            default_handler: Handler for the routes that do not have their own
+            sync: Sync (True) or Async (False) client
+            dry: Return data to be sent, instead of sending request
+            token_manager: Manager to acquire, cache and refresh tokens. If set, `x-token`
+                header is injected into every request automatically
+            auto_auth: Shortcut for `token_manager=TokenManager()`
+            validation: Default validation mode of responses (`full` or `raw`).
+                Can be overridden per call with `validation` argument of the endpoint
+            cache: Cache of GET responses. Endpoints and their TTLs are set in the cache
+            rate_limiter: Client-side rate limiter. Requests over the limit wait for their turn
+            retry_policy: Retries of transient failures of idempotent requests
+            circuit_breaker: Circuit breaker per endpoint group, to fail fast while Clopos is down
+            coalescer: Coalescing of identical GET requests in flight into a single one
+            hedging: Hedged requests of latency-critical GET endpoints
+            transport: Configuration of httpx client: connection pool, HTTP/2, timeouts per
+                endpoint and custom transport
+            idempotency: Registry of `cid`s of write requests, so that they are not repeated
+                (and are looked up after ambiguous failures, before being sent again)
+        """
+        # The same as `APIClient.__init__`, but httpx client and handlers are created on first use
+        self.base_url = base_url
+        self.default_handler = default_handler or APIPayloadHandler(None, None)
+
+        self.request_executor = CloposExecutor(name=name, sync=sync, dry=dry, transport=transport)
+        """API request executor"""
+
+        self.urls: dict[str, dict[str, str]] = {}
+        """Mapping of route names to their endpoints and methods"""
+
+        self.handlers: LazyHandlers = LazyHandlers(configure=self._configure_handler)
+        """Mapping of route names to their payload handlers"""
+
+        self._routes: dict[tuple[str, str], str] = {}
+        """Mapping of full urls and methods to route names (the first one registered)"""
+
+        self._handler_routes: dict[APIPayloadHandler, str] = {}
+        """Mapping of created handlers to route names (for routes with the same url and method)"""
+
+        self.validation = validation
+        self.cache = cache
+        self.rate_limiter = rate_limiter
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.coalescer = coalescer
+        self.hedging = hedging
+        self.idempotency = idempotency
+        self._refresh_tasks: set[asyncio.Task] = set()
+
+        self.token_manager: Optional[TokenManager] = None
+        if token_manager or auto_auth:
+            self.set_token_manager(token_manager or TokenManager())
 
         self.add_url('auth', env.API.AUTH, verb='POST')
-        self.add_handler('auth', AuthHandler)
+        self.add_handler('auth', 'AuthHandler')
 
         self.add_url('get_venues', env.API.VENUES, verb='GET')
-        self.add_handler('get_venues', GetPaginatedDataHandler(Venue))
+        self.add_handler('get_venues', 'GetVenuesHandler')
 
         self.add_url('get_users', env.API.USERS, verb='GET')
-        self.add_handler('get_users', GetPaginatedDataHandler(User))
+        self.add_handler('get_users', 'GetUsersHandler')
         self.add_url('get_user_by_id', env.API.USER_BY_ID, verb='GET')
-        self.add_handler('get_user_by_id', GetByIDHandler(User))
+        self.add_handler('get_user_by_id', 'GetUserByIDHandler')
 
         self.add_url('get_customers', env.API.CUSTOMERS, verb='GET')
-        self.add_handler('get_customers', GetCustomersHandler)
+        self.add_handler('get_customers', 'GetCustomersHandler')
         self.add_url('get_customer_by_id', env.API.CUSTOMER_BY_ID, verb='GET')
-        self.add_handler('get_customer_by_id', GetByIDHandler(Customer))
+        self.add_handler('get_customer_by_id', 'GetCustomerByIDHandler')
         self.add_url('create_customer', env.API.CUSTOMERS, verb='POST')
-        self.add_handler('create_customer', CreateCustomerHandler)
+        self.add_handler('create_customer', 'CreateCustomerHandler')
         self.add_url('get_customer_groups', env.API.CUSTOMER_GROUPS, verb='GET')
-        self.add_handler('get_customer_groups', GetPaginatedDataHandler(Group))
+        self.add_handler('get_customer_groups', 'GetCustomerGroupsHandler')
 
         self.add_url('get_categories', env.API.CATEGORIES, verb='GET')
-        self.add_handler('get_categories', GetCategoriesHandler)
+        self.add_handler('get_categories', 'GetCategoriesHandler')
         self.add_url('get_category_by_id', env.API.CATEGORY_BY_ID, verb='GET')
-        self.add_handler('get_category_by_id', GetCategoryByIDHandler)
+        self.add_handler('get_category_by_id', 'GetCategoryByIDHandler')
 
         self.add_url('get_stations', env.API.STATIONS, verb='GET')
-        self.add_handler('get_stations', GetStationsHandler)
+        self.add_handler('get_stations', 'GetStationsHandler')
         self.add_url('get_station_by_id', env.API.STATION_BY_ID, verb='GET')
-        self.add_handler('get_station_by_id', GetByIDHandler(Station))
+        self.add_handler('get_station_by_id', 'GetStationByIDHandler')
 
         self.add_url('get_products', env.API.PRODUCTS, verb='GET')
-        self.add_handler('get_products', GetProductsHandler)
+        self.add_handler('get_products', 'GetProductsHandler')
         self.add_url('get_product_by_id', env.API.PRODUCT_BY_ID, verb='GET')
-        self.add_handler('get_product_by_id', GetProductByIDHandler)
+        self.add_handler('get_product_by_id', 'GetProductByIDHandler')
         self.add_url('get_stop_list', env.API.STOP_LIST, verb='GET')
-        self.add_handler('get_stop_list', GetStopListHandler)
+        self.add_handler('get_stop_list', 'GetStopListHandler')
 
         self.add_url('get_sale_types', env.API.SALE_TYPES, verb='GET')
-        self.add_handler('get_sale_types', GetPaginatedDataHandler(SaleType))
+        self.add_handler('get_sale_types', 'GetSaleTypesHandler')
         self.add_url('get_payment_methods', env.API.PAYMENT_METHODS, verb='GET')
-        self.add_handler('get_payment_methods', GetPaginatedDataHandler(PaymentMethod))
+        self.add_handler('get_payment_methods', 'GetPaymentMethodsHandler')
 
         self.add_url('get_orders', env.API.ORDERS, verb='GET')
-        self.add_handler('get_orders', GetOrdersHandler)
+        self.add_handler('get_orders', 'GetOrdersHandler')
         self.add_url('get_order_by_id', env.API.ORDER_BY_ID, verb='GET')
-        self.add_handler('get_order_by_id', GetOrderByIDHandler)
+        self.add_handler('get_order_by_id', 'GetOrderByIDHandler')
         self.add_url('create_order', env.API.ORDERS, verb='POST')
-        self.add_handler('create_order', CreateOrderHandler)
+        self.add_handler('create_order', 'CreateOrderHandler')
         self.add_url('update_order', env.API.ORDER_BY_ID, verb='PUT')
-        self.add_handler('update_order', UpdateOrderHandler)
+        self.add_handler('update_order', 'UpdateOrderHandler')
 
         self.add_url('get_receipts', env.API.RECEIPTS, verb='GET')
-        self.add_handler('get_receipts', GetReceiptsHandler)
+        self.add_handler('get_receipts', 'GetReceiptsHandler')
         self.add_url('get_receipt_by_id', env.API.RECEIPT_BY_ID, verb='GET')
-        self.add_handler('get_receipt_by_id', GetByIDHandler(Receipt))
+        self.add_handler('get_receipt_by_id', 'GetReceiptByIDHandler')
         self.add_url('create_receipt', env.API.RECEIPTS, verb='POST')
-        self.add_handler('create_receipt', CreateReceiptHandler)
+        self.add_handler('create_receipt', 'CreateReceiptHandler')
         self.add_url('update_closed_receipt', env.API.RECEIPT_BY_ID, verb='PATCH')
-        self.add_handler('update_closed_receipt', UpdateClosedReceiptHandler)
+        self.add_handler('update_closed_receipt', 'UpdateClosedReceiptHandler')
         self.add_url('update_receipt', env.API.RECEIPT_BY_ID, verb='PUT')
-        self.add_handler('update_receipt', UpdateReceiptHandler)
+        self.add_handler('update_receipt', 'UpdateReceiptHandler')
+        self.add_url('close_receipt', env.API.RECEIPT_BY_ID, verb='PUT')
+        self.add_handler('close_receipt', 'CloseReceiptHandler')
         self.add_url('delete_receipt', env.API.RECEIPT_BY_ID, verb='DELETE')
-        self.add_handler('delete_receipt', DeleteReceiptHandler)
+        self.add_handler('delete_receipt', 'DeleteReceiptHandler')
+
+    def add_url(self, route_name: str, url: str, verb: str, base_url: Optional[str] = None) -> None:
+        super().add_url(route_name, url, verb, base_url)
+
+        full_url = urljoin(self.urls[route_name]['base_url'], url)
+        self._routes.setdefault((full_url, verb), route_name)
+
+    def add_handler(  # type: ignore[override]
+        self,
+        route_name: str,
+        handler_class: Union[str, type[APIPayloadHandler]],
+    ) -> None:
+        """Add payload handler to the endpoint. Handler is created on first use.
+
+        Args:
+            route_name: Name of the endpoint (e.g. `get_products`)
+            handler_class: Handler class, or its name in `integrify.clopos.handlers` (so that
+                handlers and schemas are not imported until the first request)
+        """
+        self.handlers[route_name] = handler_class
+
+    def _configure_handler(self, route_name: str, handler: APIPayloadHandler) -> None:
+        """Remember route of the handler, and set timeout of the endpoint, if it has its own"""
+        self._handler_routes[handler] = route_name
+
+        timeout = self.request_executor.transport.route_timeout(route_name)
+        if timeout is not None:
+            handler.req_args = {**handler.req_args, 'timeout': timeout}
 
     def _build_request_lambda(self, func, url, verb, handler):
         # No headers needed in auth
         if url.endswith(env.API.AUTH):
             return super()._build_request_lambda(func, url, verb, handler)
 
-        return lambda *args, headers, **kwds: func(
-            url,
+        route_name = self._handler_routes.get(handler) or self._routes.get((url, verb))
+
+        if self.request_executor.sync:
+
+            def request(*args, headers=UNSET, validation=UNSET, **kwds):
+                args = tuple(arg for arg in args if arg is not UNSET)
+                kwds = {k: v for k, v in kwds.items() if v is not UNSET}
+
+                def attempt():
+                    authed = self._authorize(headers)
+                    resp = self._send(
+                        route_name, func, url, verb, handler, *args, headers=authed, **kwds
+                    )
+
+                    if self._rejected(headers, authed, resp):
+                        authed = self._authorize(headers)
+                        resp = self._send(
+                            route_name, func, url, verb, handler, *args, headers=authed, **kwds
+                        )
+
+                    return resp
+
+                def send():
+                    call = self._hedge(route_name, verb, attempt)
+                    call = self._idempotent(route_name, handler, headers, args, kwds, call)
+                    if not self._retryable(route_name, verb, handler, args, kwds):
+                        return call()
+
+                    return self.retry_policy.call(route_name, call)  # type: ignore[union-attr]
+
+                with self._validation(validation):
+                    key = self._request_key(route_name, verb, handler, headers, args, kwds)
+                    if key is None:
+                        return send()
+
+                    fetch = self._coalesce(route_name, key, send)
+                    if not self._cached(route_name):
+                        return fetch()
+
+                    resp, fresh = self.cache.lookup(key)  # type: ignore[union-attr]
+                    if resp is None:
+                        resp = fetch()
+                        self._cache_response(key, resp)
+                    elif not fresh and self.cache.claim_refresh(key):  # type: ignore[union-attr]
+                        self._spawn_refresh(key, fetch)
+
+                return resp
+
+            return request
+
+        async def arequest(*args, headers=UNSET, validation=UNSET, **kwds):
+            args = tuple(arg for arg in args if arg is not UNSET)
+            kwds = {k: v for k, v in kwds.items() if v is not UNSET}
+
+            async def attempt():
+                authed = await self._aauthorize(headers)
+                resp = await self._asend(
+                    route_name, func, url, verb, handler, *args, headers=authed, **kwds
+                )
+
+                if await self._arejected(headers, authed, resp):
+                    authed = await self._aauthorize(headers)
+                    resp = await self._asend(
+                        route_name, func, url, verb, handler, *args, headers=authed, **kwds
+                    )
+
+                return resp
+
+            async def send():
+                call = self._hedge(route_name, verb, attempt)
+                call = self._idempotent(route_name, handler, headers, args, kwds, call)
+                if not self._retryable(route_name, verb, handler, args, kwds):
+                    return await call()
+
+                return await self.retry_policy.acall(route_name, call)  # type: ignore[union-attr]
+
+            with self._validation(validation):
+                key = self._request_key(route_name, verb, handler, headers, args, kwds)
+                if key is None:
+                    return await send()
+
+                fetch = self._coalesce(route_name, key, send)
+                if not self._cached(route_name):
+                    return await fetch()
+
+                resp, fresh = self.cache.lookup(key)  # type: ignore[union-attr]
+                if resp is None:
+                    resp = await fetch()
+                    self._cache_response(key, resp)
+                elif not fresh and self.cache.claim_refresh(key):  # type: ignore[union-attr]
+                    self._aspawn_refresh(key, fetch)
+
+            return resp
+
+        return arequest
+
+    def _hedge(self, route_name, verb, attempt):
+        """Wrap `attempt`, so that slow requests are hedged (if enabled for the endpoint)"""
+        if (
+            self.hedging is None
+            or verb != 'GET'
+            or self.request_executor.dry
+            or not self.hedging.hedged(route_name)
+        ):
+            return attempt
+
+        if self.request_executor.sync:
+            return partial(self.hedging.call, route_name, attempt)
+
+        return partial(self.hedging.acall, route_name, attempt)
+
+    def _idempotent(self, route_name, handler, headers, args, kwds, attempt):
+        """Wrap `attempt`, so that requests with `cid` go through the idempotency registry
+        (if enabled for the endpoint)
+        """
+        registry = self.idempotency
+        if registry is None or self.request_executor.dry or not registry.tracked(route_name):
+            return attempt
+
+        cid = payload_cid(handler.handle_request(*args, **kwds))
+        if not cid:
+            return attempt
+
+        lookup = (self._lookup if self.request_executor.sync else self._alookup)(
+            route_name, cid, headers, current_validation()
+        )
+        call = registry.call if self.request_executor.sync else registry.acall
+        return partial(call, route_name, cid, attempt, lookup)  # type: ignore[operator]
+
+    def _lookup(self, route_name, cid, headers, mode):
+        """Function, which finds the object of `cid` among the latest ones (response of its
+        by-id endpoint, or `None` if it does not exist). `CloposResponseError` is raised if the
+        lookup fails.
+        """
+
+        def lookup():
+            if route_name not in RECONCILE_ROUTES:
+                return None
+
+            list_route, by_id_route = RECONCILE_ROUTES[route_name]
+            page = getattr(self, list_route)(
+                limit=getattr(self.idempotency, 'lookup_limit', DEFAULT_LOOKUP_LIMIT),
+                headers=headers,
+                validation='raw',
+                **LOOKUP_ARGS.get(list_route, {}),
+            )
+
+            id_ = next((item['id'] for item in page_items(page) if item.get('cid') == cid), None)
+            if id_ is None:
+                return None
+
+            return getattr(self, by_id_route)(id_, headers=headers, validation=mode)
+
+        return lookup
+
+    def _alookup(self, route_name, cid, headers, mode):
+        """Async version of `_lookup`"""
+
+        async def lookup():
+            if route_name not in RECONCILE_ROUTES:
+                return None
+
+            list_route, by_id_route = RECONCILE_ROUTES[route_name]
+            page = await getattr(self, list_route)(
+                limit=getattr(self.idempotency, 'lookup_limit', DEFAULT_LOOKUP_LIMIT),
+                headers=headers,
+                validation='raw',
+                **LOOKUP_ARGS.get(list_route, {}),
+            )
+
+            id_ = next((item['id'] for item in page_items(page) if item.get('cid') == cid), None)
+            if id_ is None:
+                return None
+
+            return await getattr(self, by_id_route)(id_, headers=headers, validation=mode)
+
+        return lookup
+
+    def _retryable(self, route_name, verb, handler, args, kwds) -> bool:
+        """Check if failed request should be retried by the retry policy (if set)"""
+        if self.retry_policy is None or self.request_executor.dry:
+            return False
+
+        # writes are retried only if the registry reconciles their `cid` before sending again
+        registry = self.idempotency
+        if verb not in self.retry_policy.verbs and (
+            registry is None or not registry.tracked(route_name)
+        ):
+            return False
+
+        return self.retry_policy.retryable(
+            route_name,
             verb,
-            handler,
+            lambda: handler.handle_request(*args, **kwds),
+        )
+
+    def _send(self, route_name: Optional[str], func, *args, **kwds):
+        """Send the request through circuit breaker and rate limiter (if set)"""
+        if self.request_executor.dry:
+            return func(*args, **kwds)
+
+        breaker = self.circuit_breaker
+        if breaker is not None:
+            breaker.acquire(route_name)
+
+        start = time.monotonic()
+        try:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(route_name)
+                start = time.monotonic()
+
+            resp = func(*args, **kwds)
+        except BaseException as exc:
+            if breaker is not None:
+                breaker.release(route_name, time.monotonic() - start, error=exc)
+            raise
+
+        if breaker is not None:
+            breaker.release(route_name, time.monotonic() - start, result=resp)
+
+        return resp
+
+    async def _asend(self, route_name: Optional[str], func, *args, **kwds):
+        """Async version of `_send`"""
+        if self.request_executor.dry:
+            return await func(*args, **kwds)
+
+        breaker = self.circuit_breaker
+        if breaker is not None:
+            breaker.acquire(route_name)
+
+        start = time.monotonic()
+        try:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire(route_name)
+                start = time.monotonic()
+
+            resp = await func(*args, **kwds)
+        except BaseException as exc:
+            if breaker is not None:
+                breaker.release(route_name, time.monotonic() - start, error=exc)
+            raise
+
+        if breaker is not None:
+            breaker.release(route_name, time.monotonic() - start, result=resp)
+
+        return resp
+
+    def _request_key(self, route_name, verb, handler, headers, args, kwds):
+        """Key of the request (`None` if its response is neither cached, nor coalesced)"""
+        if verb != 'GET' or self.request_executor.dry:
+            return None
+
+        if not self._cached(route_name) and not (
+            self.coalescer is not None and self.coalescer.coalesced(route_name)
+        ):
+            return None
+
+        client_id = self.token_manager.key()[0] if self.token_manager else None
+        return request_key(route_name, handler, headers or None, args, kwds, client_id)
+
+    def _cached(self, route_name) -> bool:
+        """Check if responses of the endpoint are cached"""
+        return self.cache is not None and self.cache.cacheable(route_name)
+
+    def _coalesce(self, route_name, key, send):
+        """Wrap `send`, so that identical requests in flight are coalesced (if enabled)"""
+        if self.coalescer is None or not self.coalescer.coalesced(route_name):
+            return send
+
+        if self.request_executor.sync:
+            return partial(self.coalescer.call, key, send)
+
+        return partial(self.coalescer.acall, key, send)
+
+    def _cache_response(self, key, resp) -> bool:
+        """Cache the successful response. Returns `False` if the response failed."""
+        if not getattr(resp, 'ok', False):
+            return False
+
+        size = resp.headers.get('content-length') if resp.headers else None
+        self.cache.set(key, resp, int(size) if size else len(resp.model_dump_json()))  # type: ignore[union-attr]
+        return True
+
+    def _refresh(self, key, send) -> None:
+        refreshed = False
+        try:
+            refreshed = self._cache_response(key, send())
+        except Exception:  # pylint: disable=broad-exception-caught
+            # stale response is served until `max_stale`, then request is sent by the caller
+            self.request_executor.logger.exception('Background refresh of %s failed', key[0])
+        finally:
+            self.cache.release_refresh(key, refreshed)  # type: ignore[union-attr]
+
+    def _spawn_refresh(self, key, send) -> None:
+        """Refresh the stale response in a background thread (in the same validation mode)"""
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(self._refresh, key, send), daemon=True).start()
+
+    async def _arefresh(self, key, send) -> None:
+        refreshed = False
+        try:
+            refreshed = self._cache_response(key, await send())
+        except Exception:  # pylint: disable=broad-exception-caught
+            self.request_executor.logger.exception('Background refresh of %s failed', key[0])
+        finally:
+            self.cache.release_refresh(key, refreshed)  # type: ignore[union-attr]
+
+    def _aspawn_refresh(self, key, send) -> None:
+        """Async version of `_spawn_refresh`: refresh in a task"""
+        task = asyncio.get_running_loop().create_task(self._arefresh(key, send))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    def invalidate_cache(self, route_name: Optional[str] = None) -> int:
+        """Drop cached responses of the endpoint (or all of them), e.g. after the data was
+        changed in Clopos
+
+        Args:
+            route_name: Name of the endpoint (e.g. `get_categories`)
+
+        Returns:
+            Number of dropped responses
+        """
+        if self.cache is None:
+            return 0
+
+        return self.cache.invalidate(route_name)
+
+    def _validation(self, mode: Unset[ValidationMode]):
+        """Validation mode of the call: given one, or the default one of the client"""
+        return validation(self.validation if mode is UNSET else mode)
+
+    def set_token_manager(self, token_manager: TokenManager) -> None:
+        """Token manager setter. After this, `x-token` is not needed in headers anymore
+
+        Args:
+            token_manager: Manager to acquire, cache and refresh tokens
+        """
+        token_manager.bind(self)
+        self.token_manager = token_manager
+
+    def __getattr__(self, name: str):
+        """Auto-paginating iterators: `iter_<name>` for every paginated `get_<name>` endpoint.
+
+        Called only if attribute is neither a real attribute, nor an endpoint.
+        """
+        route_name = f'get_{name[5:]}'
+        if not (name.startswith('iter_') and self.is_paginated(route_name)):
+            raise AttributeError(name)
+
+        def iterate(*args, stream: bool = False, **kwds):
+            request = partial(self.stream, route_name) if stream else getattr(self, route_name)
+
+            if self.request_executor.sync:
+                return paginate(request, *args, **kwds)
+
+            return apaginate(request, *args, **kwds)
+
+        return iterate
+
+    def fetch_all(self, route_name: str, concurrency: int = DEFAULT_CONCURRENCY, **kwds):
+        """Fetch all objects of the paginated endpoint concurrently, and yield them in order.
+
+        First page is fetched to learn `total`, then the remaining pages are fetched
+        concurrently (in thread pool for sync client, in tasks for async client), with at most
+        `concurrency` pages in flight.
+
+        Example:
+        ```python
+        from integrify.clopos import CloposAsyncRequest, CloposRequest
+
+        for receipt in CloposRequest.fetch_all('get_receipts', concurrency=8, limit=200):
+            ...
+
+        async for receipt in CloposAsyncRequest.fetch_all('get_receipts', concurrency=8):
+            ...
+        ```
+
+        Args:
+            route_name: Name of the paginated endpoint (e.g. `get_receipts`)
+            concurrency: Maximum number of pages fetched at the same time
+            **kwds: Arguments of the endpoint (`page` to start from, `limit`, `headers` etc.)
+        """
+        if not self.is_paginated(route_name):
+            raise ValueError(f'{route_name} is not a paginated endpoint')
+
+        if self.request_executor.sync:
+            return fetch_all(getattr(self, route_name), concurrency, **kwds)
+
+        return afetch_all(getattr(self, route_name), concurrency, **kwds)
+
+    def create_receipts_bulk(
+        self,
+        receipts: 'Union[Iterable[Any], AsyncIterable[Any]]',
+        concurrency: int = DEFAULT_BULK_CONCURRENCY,
+        **kwds,
+    ):
+        """Create receipts concurrently, and return `BulkResult` with ids of the created
+        receipts and errors of the failed ones, by `cid` (after awaiting, for async client).
+
+        Receipts are taken from `receipts` (any iterable, or async iterable for async client)
+        as requests complete, with at most `concurrency` of them in flight, so the input is
+        never materialized. Rate limiter, retry policy and circuit breaker of the client apply
+        to every request. Responses are not validated (`validation='raw'`), as only ids are kept.
+
+        Example:
+        ```python
+        from integrify.clopos import CloposClientClass, RateLimiter
+
+        client = CloposClientClass(auto_auth=True, rate_limiter=RateLimiter(20))
+
+        result = client.create_receipts_bulk(receipts_from_db(), concurrency=16)
+        result.created  # {'cid-1': 101, ...}
+        result.failed  # {'cid-2': ErrorResponse(...), ...}
+        ```
+
+        Args:
+            receipts: `CreateReceiptRequest`s, or dicts of `create_receipt` arguments
+            concurrency: Maximum number of requests sent at the same time
+            **kwds: Other arguments of `create_receipt` (`headers`, `validation`)
+        """
+        kwds.setdefault('validation', 'raw')
+
+        if self.request_executor.sync:
+            return bulk_create(self.create_receipt, receipts, concurrency, **kwds)  # type: ignore[arg-type]
+
+        return abulk_create(self.create_receipt, receipts, concurrency, **kwds)
+
+    def stream(
+        self,
+        route_name: str,
+        *args,
+        headers: Unset[dict] = UNSET,
+        validation: Unset[ValidationMode] = UNSET,
+        **kwds,
+    ):
+        """Request a page of the list endpoint, and stream its items: they are parsed and
+        validated one by one while the response body is being received, so that memory usage
+        is proportional to a single item, not the whole page.
+
+        Returns `StreamedPage` (`AsyncStreamedPage` for async client, after awaiting), which
+        can be iterated once. `total` is available in `body` after all items are consumed.
+        `CloposResponseError` is raised if the request fails.
+
+        `iter_<name>(stream=True)` does the same for all pages.
+
+        Example:
+        ```python
+        from integrify.clopos import CloposAsyncRequest, CloposRequest
+
+        for product in CloposRequest.stream('get_products', limit=5000, with_=['modificator_groups']):
+            ...
+
+        page = await CloposAsyncRequest.stream('get_products', limit=5000)
+        async for product in page:
+            ...
+        ```
+
+        Args:
+            route_name: Name of the paginated endpoint (e.g. `get_products`)
+            headers: Headers for request
+            validation: Validation mode of the items (default one of the client, if not given)
+            **kwds: Arguments of the endpoint
+        """  # noqa: E501
+        if not self.is_paginated(route_name):
+            raise ValueError(f'{route_name} is not a paginated endpoint')
+
+        if self.request_executor.dry:
+            raise ValueError('Responses cannot be streamed in dry mode')
+
+        with self._validation(validation):
+            mode = current_validation()
+
+        if self.request_executor.sync:
+            return self._stream(route_name, headers, mode, args, kwds)
+
+        return self._astream(route_name, headers, mode, args, kwds)
+
+    def _stream(
+        self,
+        route_name: str,
+        headers: Unset[dict],
+        mode: ValidationMode,
+        args: tuple,
+        kwds: dict,
+    ):
+        """Sync implementation of `stream`"""
+        client: httpx.Client = self.request_executor.client  # type: ignore[assignment]
+
+        authed = self._authorize(headers)
+        request = self._stream_request(route_name, authed, args, kwds)
+        response = self._send(route_name, client.send, request, stream=True)
+
+        if self._rejected(headers, authed, response):
+            response.close()
+            request = self._stream_request(route_name, self._authorize(headers), args, kwds)
+            response = self._send(route_name, client.send, request, stream=True)
+
+        if not response.is_success:
+            response.read()
+            response.close()
+            self._stream_failed(route_name, response)
+
+        return StreamedPage(response, item_model(self.handlers[route_name]), mode)
+
+    async def _astream(
+        self,
+        route_name: str,
+        headers: Unset[dict],
+        mode: ValidationMode,
+        args: tuple,
+        kwds: dict,
+    ):
+        """Async implementation of `stream`"""
+        client: httpx.AsyncClient = self.request_executor.client  # type: ignore[assignment]
+
+        authed = await self._aauthorize(headers)
+        request = self._stream_request(route_name, authed, args, kwds)
+        response = await self._asend(route_name, client.send, request, stream=True)
+
+        if await self._arejected(headers, authed, response):
+            await response.aclose()
+            request = self._stream_request(route_name, await self._aauthorize(headers), args, kwds)
+            response = await self._asend(route_name, client.send, request, stream=True)
+
+        if not response.is_success:
+            await response.aread()
+            await response.aclose()
+            self._stream_failed(route_name, response)
+
+        return AsyncStreamedPage(response, item_model(self.handlers[route_name]), mode)
+
+    def _stream_request(
+        self,
+        route_name: str,
+        headers: Unset[dict],
+        args: tuple,
+        kwds: dict,
+    ) -> httpx.Request:
+        """Build the request of the endpoint, the same way request executor does"""
+        handler = self.handlers[route_name]
+        url = urljoin(self.urls[route_name]['base_url'], self.urls[route_name]['url'])
+
+        data = handler.handle_request(
             *(arg for arg in args if arg is not UNSET),
-            headers=headers,
             **{k: v for k, v in kwds.items() if v is not UNSET},
         )
+        payload = {'params' if self.urls[route_name]['verb'] == 'GET' else 'json': data}
+
+        return self.request_executor.client.build_request(
+            self.urls[route_name]['verb'],
+            handler.set_urlparams(url),
+            headers={**handler.headers, **(headers or {})},
+            **payload,
+            **handler.req_args,
+        )
+
+    def _stream_failed(self, route_name: str, response: httpx.Response):
+        """Log and raise error for the failed streamed request"""
+        self.request_executor.logger.error(
+            '%s request to %s failed. Status code was %d. Content => %s',
+            self.request_executor.client_name,
+            self.urls[route_name]['url'],
+            response.status_code,
+            response.content.decode(),
+        )
+
+        raise CloposResponseError(
+            'Could not fetch page',
+            self.handlers[route_name].handle_response(response),
+        )
+
+    def is_paginated(self, route_name: str) -> bool:
+        """Check if the endpoint accepts `page` and `limit`"""
+        req_model = getattr(self.handlers.get(route_name), 'req_model', None)
+        return isinstance(req_model, type) and issubclass(req_model, PaginatedDataRequest)
+
+    def _authorize(self, headers: Unset[dict]) -> Unset[dict]:
+        """Add cached token to the headers (if token manager is set and token is not given)"""
+        if not self.token_manager or self.request_executor.dry or 'x-token' in (headers or {}):
+            return headers
+
+        headers = self._scope(headers)
+        headers['x-token'] = self.token_manager.get_token(
+            headers.get('x-brand'),
+            headers.get('x-venue'),
+        )
+        return headers
+
+    def _scope(self, headers: Unset[dict]) -> dict:
+        """Copy of the headers with `x-brand` and `x-venue` of the token manager's scope, so that
+        the token is sent to the brand and venue it was issued for (not the ones of env variables)
+        """
+        headers = dict(headers or {})
+        _, brand, venue_id = self.token_manager.key(  # type: ignore[union-attr]
+            headers.get('x-brand'),
+            headers.get('x-venue'),
+        )
+        if brand:
+            headers['x-brand'] = brand
+
+        if venue_id:
+            headers['x-venue'] = venue_id
+
+        return headers
+
+    def _rejected(self, headers: Unset[dict], authed: Unset[dict], resp) -> bool:
+        """Check if the token injected by token manager was rejected. If so, it is invalidated,
+        and request should be retried once with the fresh token.
+        """
+        if authed is headers or getattr(resp, 'status_code', None) != 401:
+            return False
+
+        self.token_manager.reject(authed)  # type: ignore[union-attr,arg-type]
+        return True
+
+    async def _arejected(self, headers: Unset[dict], authed: Unset[dict], resp) -> bool:
+        """Async version of `_rejected`"""
+        if authed is headers or getattr(resp, 'status_code', None) != 401:
+            return False
+
+        await self.token_manager.areject(authed)  # type: ignore[union-attr,arg-type]
+        return True
+
+    async def _aauthorize(self, headers: Unset[dict]) -> Unset[dict]:
+        """Async version of `_authorize`"""
+        if not self.token_manager or self.request_executor.dry or 'x-token' in (headers or {}):
+            return headers
+
+        headers = self._scope(headers)
+        headers['x-token'] = await self.token_manager.aget_token(
+            headers.get('x-brand'),
+            headers.get('x-venue'),
+        )
+        return headers
 
     if TYPE_CHECKING:
         # pylint: disable=all
@@ -1229,10 +2009,10 @@ class CloposClientClass(APIClient):
             ```python
             from integrify.clopos import CloposClient
 
-            CloposClient.update_closed_receipt(1, order_status='NEW', headers={'x-brand': 'openapitest', 'x-venue': '1', 'x-token': 'token'})
+            CloposClient.close_receipt(1, cid='uuid', payment_methods=[{'id': 1, 'name': 'Cash', 'amount': 100}], closed_at='2025-01-01 12:00:00', headers={'x-brand': 'openapitest', 'x-venue': '1', 'x-token': 'token'})
 
             # Or if you have set the environment variables
-            CloposClient.update_closed_receipt(id=1, order_status='NEW', headers={'x-token': 'token'})
+            CloposClient.close_receipt(id=1, cid='uuid', payment_methods=[{'id': 1, 'name': 'Cash', 'amount': 100}], closed_at='2025-01-01 12:00:00', headers={'x-token': 'token'})
             ```
 
             **Response format: [`ObjectResponse[Receipt]`][integrify.clopos.schemas.common.response.ObjectResponse]**
@@ -1273,6 +2053,329 @@ class CloposClientClass(APIClient):
             ```
             """  # noqa: E501
 
+        def iter_venues(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[Venue]:
+            """Iterate over all venues, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_venues`][integrify.clopos.client.CloposClientClass.get_venues].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_venues(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_venues(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
+        def iter_users(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[User]:
+            """Iterate over all users, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_users`][integrify.clopos.client.CloposClientClass.get_users].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_users(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_users(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
+        def iter_customers(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            with_: Unset[list[str]] = UNSET,
+            filters: Unset[list[CustomerFilter]] = UNSET,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[Customer]:
+            """Iterate over all customers, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_customers`][integrify.clopos.client.CloposClientClass.get_customers].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_customers(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_customers(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
+        def iter_customer_groups(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[Group]:
+            """Iterate over all customer groups, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_customer_groups`][integrify.clopos.client.CloposClientClass.get_customer_groups].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_customer_groups(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_customer_groups(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
+        def iter_categories(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            parent_id: Unset[int] = UNSET,
+            type: Unset[CategoryType] = UNSET,
+            include_children: Unset[bool] = True,
+            include_inactive: Unset[bool] = False,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[Category]:
+            """Iterate over all categories, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_categories`][integrify.clopos.client.CloposClientClass.get_categories].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_categories(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_categories(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
+        def iter_stations(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            status: Unset[int] = UNSET,
+            can_print: Unset[bool] = UNSET,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[Station]:
+            """Iterate over all stations, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_stations`][integrify.clopos.client.CloposClientClass.get_stations].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_stations(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_stations(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
+        def iter_products(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            selects: Unset[Union[str, list[str]]] = UNSET,
+            filters: Unset[GetProducstRequestFilter] = UNSET,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[Product]:
+            """Iterate over all products, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_products`][integrify.clopos.client.CloposClientClass.get_products].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_products(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_products(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
+        def iter_sale_types(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[SaleType]:
+            """Iterate over all sale types, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_sale_types`][integrify.clopos.client.CloposClientClass.get_sale_types].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_sale_types(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_sale_types(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
+        def iter_payment_methods(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[PaymentMethod]:
+            """Iterate over all payment methods, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_payment_methods`][integrify.clopos.client.CloposClientClass.get_payment_methods].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_payment_methods(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_payment_methods(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
+        def iter_orders(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            status: Unset[OrderStatus] = UNSET,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[Order]:
+            """Iterate over all orders, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_orders`][integrify.clopos.client.CloposClientClass.get_orders].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_orders(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_orders(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
+        def iter_receipts(
+            self,
+            *,
+            page: int = 1,
+            limit: Union[int, PageSizeController] = 100,
+            stream: bool = False,
+            sort_by: Unset[str] = 'created_at',
+            sort_order: Unset[int] = -1,
+            date_from: Unset[Union[str, datetime]] = UNSET,
+            date_to: Unset[Union[str, datetime]] = UNSET,
+            headers: Unset[dict[str, str]] = UNSET,
+        ) -> Iterator[Receipt]:
+            """Iterate over all receipts, fetching them page by page.
+
+            Only one page is kept in memory. Iteration stops on the last page (using `total` of
+            the response), and `CloposResponseError` is raised if any page request fails.
+            `limit` can be a `PageSizeController` to tune page size on the fly.
+            With `stream=True`, items are parsed one by one while the page is received (see `stream`).
+            For arguments, see [`get_receipts`][integrify.clopos.client.CloposClientClass.get_receipts].
+
+            Example:
+            ```python
+            from integrify.clopos import CloposRequest, CloposAsyncRequest
+
+            for obj in CloposRequest.iter_receipts(headers={'x-token': 'token'}):
+                ...
+
+            async for obj in CloposAsyncRequest.iter_receipts(headers={'x-token': 'token'}):
+                ...
+            ```
+            """  # noqa: E501
+
 
 CloposRequest = CloposClientClass(sync=True)
 CloposAsyncRequest = CloposClientClass(sync=False)
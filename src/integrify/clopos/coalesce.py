@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from integrify.clopos.cache import CacheKey
+
+__all__ = ['RequestCoalescer', 'CoalesceStats']
+
+
+@dataclass
+class CoalesceStats:
+    """Counters of the request coalescer"""
+
+    sent: int = 0
+    """Number of requests sent upstream"""
+
+    coalesced: int = 0
+    """Number of requests, which joined an identical request in flight"""
+
+
+class RequestCoalescer:
+    """Coalescing of identical in-flight GET requests: while a request is in flight, identical
+    ones (same endpoint, params, token scope and validation mode) wait for it, instead of being
+    sent too. All of them get the same response object, so do not modify it.
+
+    Example:
+    ```python
+    from integrify.clopos import CloposClientClass, RequestCoalescer
+
+    coalescer = RequestCoalescer()
+    client = CloposClientClass(auto_auth=True, sync=False, coalescer=coalescer)
+
+    await asyncio.gather(*(client.get_product_by_id(419) for _ in range(50)))  # 1 request
+    coalescer.stats.coalesced  # 49
+    ```
+    """
+
+    def __init__(self, routes: Optional[Iterable[str]] = None):
+        """
+        Args:
+            routes: Endpoints, whose requests are coalesced (all GET endpoints if not given)
+        """
+        self.routes = frozenset(routes) if routes is not None else None
+        self.stats = CoalesceStats()
+
+        self._futures: dict[CacheKey, Future] = {}
+        self._tasks: dict[CacheKey, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def coalesced(self, route_name: Optional[str]) -> bool:
+        """Check if requests to the endpoint are coalesced"""
+        return self.routes is None or route_name in self.routes
+
+    def call(self, key: CacheKey, send: Callable[[], Any]) -> Any:
+        """Send the request, or wait for the identical one in flight"""
+        with self._lock:
+            future = self._futures.get(key)
+            leader = future is None
+            if leader:
+                future = self._futures[key] = Future()
+                self.stats.sent += 1
+            else:
+                self.stats.coalesced += 1
+
+        if not leader:
+            return future.result()  # type: ignore[union-attr]
+
+        try:
+            result = send()
+        except BaseException as exc:
+            future.set_exception(exc)  # type: ignore[union-attr]
+            raise
+        else:
+            future.set_result(result)  # type: ignore[union-attr]
+        finally:
+            with self._lock:
+                del self._futures[key]
+
+        return result
+
+    async def acall(self, key: CacheKey, send: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of `call`. Request is sent in a task, so that it is not cancelled
+        when the caller, which sent it, is cancelled.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.get_running_loop().create_task(send())
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+            self.stats.sent += 1
+        else:
+            self.stats.coalesced += 1
+
+        return await asyncio.shield(task)
@@ -0,0 +1,34 @@
+from typing import Any, Optional
+
+__all__ = ['CloposError', 'CloposResponseError', 'CloposAuthError', 'CloposCircuitOpenError']
+
+
+class CloposError(Exception):
+    """Base exception for errors raised by Clopos client itself (not the API responses)"""
+
+
+class CloposResponseError(CloposError):
+    """Raised by helpers (e.g. auto-paginating iterators), which cannot return failed response"""
+
+    def __init__(self, message: str, response: Optional[Any] = None):
+        super().__init__(message)
+
+        self.response = response
+        """Failed response (if any)"""
+
+
+class CloposAuthError(CloposResponseError):
+    """Raised when client could not acquire token with given credentials"""
+
+
+class CloposCircuitOpenError(CloposError):
+    """Raised instead of sending the request, while circuit of its endpoint group is open"""
+
+    def __init__(self, group: str, retry_after: float):
+        super().__init__(f'Circuit of {group} is open, retry after {retry_after:.1f}s')
+
+        self.group = group
+        """Endpoint group"""
+
+        self.retry_after = retry_after
+        """Seconds until probe requests are allowed"""
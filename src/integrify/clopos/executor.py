@@ -0,0 +1,143 @@
+import ssl
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+import httpx
+
+from integrify.api import APIExecutor
+from integrify.logger import LOGGER_FUNCTION
+
+__all__ = ['CloposExecutor', 'TransportConfig']
+
+
+@dataclass
+class TransportConfig:  # pylint: disable=too-many-instance-attributes
+    """Configuration of httpx client: connection pool, HTTP/2, timeouts and transport.
+
+    Example:
+    ```python
+    from integrify.clopos import CloposClientClass, TransportConfig
+
+    transport = TransportConfig(
+        max_connections=200,
+        max_keepalive_connections=50,
+        keepalive_expiry=30,
+        http2=True,  # requires `pip install 'httpx[http2]'`
+        timeouts={'create_receipt': 30, 'get_stop_list': httpx.Timeout(2, connect=1)},
+    )
+    client = CloposClientClass(auto_auth=True, sync=False, transport=transport)
+    ```
+    """
+
+    timeout: Union[float, httpx.Timeout] = 10
+    """Default timeout of requests, in seconds"""
+
+    connect_timeout: Optional[float] = None
+    """Timeout of establishing connection (`timeout` if not given), in seconds"""
+
+    timeouts: dict[str, Union[float, httpx.Timeout]] = field(default_factory=dict)
+    """Timeouts per endpoint, e.g. `{'create_receipt': 30}`"""
+
+    max_connections: Optional[int] = 100
+    """Maximum number of connections (`None` for no limit)"""
+
+    max_keepalive_connections: Optional[int] = 20
+    """Maximum number of idle connections kept alive (`0` to close them after each request)"""
+
+    keepalive_expiry: Optional[float] = 5
+    """Seconds, after which idle connections are closed"""
+
+    http2: bool = False
+    """Use HTTP/2 (requires `h2` package: `pip install 'httpx[http2]'`)"""
+
+    verify: Union[bool, str, ssl.SSLContext] = True
+    """SSL verification: `False`, path to CA bundle, or SSL context"""
+
+    transport: Optional[Union[httpx.BaseTransport, httpx.AsyncBaseTransport]] = None
+    """Custom transport (e.g. `httpx.MockTransport` in tests). Pool settings are ignored then"""
+
+    def client_timeout(self) -> httpx.Timeout:
+        """Default timeout of the client"""
+        if isinstance(self.timeout, httpx.Timeout):
+            return self.timeout
+
+        return httpx.Timeout(self.timeout, connect=self.connect_timeout or self.timeout)
+
+    def route_timeout(self, route_name: str) -> Optional[httpx.Timeout]:
+        """Timeout of the endpoint (`None` if it uses the default one)"""
+        timeout = self.timeouts.get(route_name)
+        if timeout is None or isinstance(timeout, httpx.Timeout):
+            return timeout
+
+        return httpx.Timeout(timeout, connect=self.connect_timeout or timeout)
+
+    def client_kwargs(self) -> dict:
+        """Arguments of httpx client"""
+        kwds: dict = {'timeout': self.client_timeout()}
+
+        if self.transport is not None:
+            kwds['transport'] = self.transport
+        else:
+            kwds['limits'] = httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            )
+            kwds['http2'] = self.http2
+            kwds['verify'] = self.verify
+
+        return kwds
+
+
+class CloposExecutor(APIExecutor):
+    """Request executor, which creates its httpx client on first request, not on construction.
+
+    Creating httpx client takes tens of milliseconds (mostly loading of SSL certificates), and
+    module-level clients (`CloposRequest`, `CloposAsyncRequest`) would pay it on import.
+    """
+
+    def __init__(  # pylint: disable=super-init-not-called
+        self,
+        name: str,
+        sync: bool = True,
+        dry: bool = False,
+        transport: Optional[TransportConfig] = None,
+    ):
+        """
+        Args:
+            name: Client name, used for logging
+            sync: Sync (True) or Async (False) client
+            dry: Return data to be sent, instead of sending request
+            transport: Configuration of httpx client (default one, if not given)
+        """
+        # `APIExecutor.__init__` is not called, as it creates httpx client right away
+        self.sync = sync
+        self.dry = dry
+        self.client_name = name
+        self.logger = LOGGER_FUNCTION(name)
+        self.transport = transport or TransportConfig()
+
+        self._client: Optional[Union[httpx.Client, httpx.AsyncClient]] = None
+        self._client_lock = threading.Lock()
+
+    @property  # type: ignore[override]
+    def client(self) -> Union[httpx.Client, httpx.AsyncClient]:
+        """httpx client, created on first access"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self.create_client()
+
+        return self._client
+
+    @client.setter
+    def client(self, client: Union[httpx.Client, httpx.AsyncClient]) -> None:
+        self._client = client
+
+    def create_client(self) -> Union[httpx.Client, httpx.AsyncClient]:
+        """Create httpx client with the transport configuration"""
+        if self.sync:
+            return httpx.Client(**self.transport.client_kwargs())
+
+        return httpx.AsyncClient(**self.transport.client_kwargs())
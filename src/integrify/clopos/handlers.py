@@ -1,5 +1,6 @@
 import json
-from functools import cached_property
+import threading
+from functools import cached_property, lru_cache
 from typing import Annotated, Union
 
 from pydantic import Field
@@ -17,7 +18,7 @@ from integrify.clopos.schemas.common.response import (
     ObjectListResponse,
     ObjectResponse,
 )
-from integrify.clopos.schemas.customers.object import Customer
+from integrify.clopos.schemas.customers.object import Customer, Group
 from integrify.clopos.schemas.customers.request import CreateCustomerRequest, GetCustomersRequest
 from integrify.clopos.schemas.orders.object import Order
 from integrify.clopos.schemas.orders.request import (
@@ -40,30 +41,67 @@ from integrify.clopos.schemas.receipts.request import (
     UpdateClosedReceiptRequest,
     UpdateReceiptRequest,
 )
+from integrify.clopos.schemas.sales.object import PaymentMethod, SaleType
 from integrify.clopos.schemas.stations.object import Station
 from integrify.clopos.schemas.stations.request import GetStationsRequest
+from integrify.clopos.schemas.users.object import User
+from integrify.clopos.schemas.venues.object import Venue
+from integrify.clopos.validation import current_validation
+from integrify.schemas import APIResponse
+
+
+@lru_cache(maxsize=None)
+def response_type(resp_model):
+    """`resp_model` or `ErrorResponse`, discriminated by `success`.
+
+    Built once per model, so that all handlers (of all clients) share the same type, and
+    `APIResponse[...]` schema for it is built once per process.
+    """
+    return Annotated[Union[resp_model, ErrorResponse], Field(discriminator='success')]
+
+
+@lru_cache(maxsize=None)
+def response_validator(resp_type) -> type[APIResponse]:
+    """`APIResponse[resp_type]`, parametrized (and its schema built) once per process"""
+    return APIResponse[resp_type]  # type: ignore[valid-type]
 
 
 class AuthHandler(APIPayloadHandler):
     def __init__(
         self,
         req_model=AuthRequest,
-        resp_model=Annotated[Union[AuthResponse, ErrorResponse], Field(discriminator='success')],
+        resp_model=response_type(AuthResponse),
         dry=False,
     ):
         super().__init__(req_model, resp_model, dry)  # ty: ignore[invalid-argument-type]
 
+    def handle_response(self, resp):
+        return response_validator(self.resp_model).model_validate(resp, from_attributes=True)
+
 
 class AuthedAPIPayloadHandler(APIPayloadHandler):
     def __init__(self, req_model=None, resp_model=None, dry=False):
+        self._local = threading.local()
         super().__init__(
             req_model,
-            Annotated[
-                Union[resp_model, ErrorResponse], Field(discriminator='success')
-            ],  # ty: ignore[invalid-argument-type]
+            response_type(resp_model),  # ty: ignore[invalid-argument-type]
             dry,
         )
 
+    @property
+    def _APIPayloadHandler__req_model(self):  # pylint: disable=invalid-name
+        """Request model of the current call, kept per thread.
+
+        `APIPayloadHandler` stores it on the handler in `handle_request`, and reads it in
+        `set_urlparams`. One handler serves all calls of its endpoint, so with a shared attribute,
+        concurrent calls from other threads could send each other's ids.
+        """
+        return getattr(self._local, 'req_model', None)
+
+    @_APIPayloadHandler__req_model.setter
+    def _APIPayloadHandler__req_model(self, req_model):  # pylint: disable=invalid-name
+        self._local.req_model = req_model
+
     @cached_property
     def headers(self):
         default = super().headers
@@ -76,9 +114,33 @@ class AuthedAPIPayloadHandler(APIPayloadHandler):
 
         return default
 
+    @cached_property
+    def validator(self) -> type[APIResponse]:
+        """Response model, shared with other handlers of the same response type"""
+        return response_validator(self.resp_model)
+
+    def handle_response(self, resp):
+        """Handle response according to the validation mode of the current call (see
+        `integrify.clopos.validation`). Error responses are always validated as `ErrorResponse`.
+        """
+        if current_validation() == 'full':
+            return self.validator.model_validate(resp, from_attributes=True)
+
+        content = json.loads(resp.content)
+        if not (isinstance(content, dict) and content.get('success') is True):
+            return self.validator.model_validate(resp, from_attributes=True)
+
+        return APIResponse.model_construct(
+            ok=resp.is_success,
+            status_code=resp.status_code,
+            headers=dict(resp.headers),
+            body=content,
+        )
+
 
+@lru_cache(maxsize=None)
 def GetPaginatedDataHandler(object_type, req_model=PaginatedDataRequest):  # pylint: disable=invalid-name
-    """Function to dynamically create ObjectListResponse[object_type]"""
+    """Function to dynamically create ObjectListResponse[object_type] (once per object type)"""
 
     class _GetPaginatedDataHandler(AuthedAPIPayloadHandler):
         def __init__(self, dry=False):
@@ -91,8 +153,9 @@ def GetPaginatedDataHandler(object_type, req_model=PaginatedDataRequest):  # pyl
     return _GetPaginatedDataHandler
 
 
+@lru_cache(maxsize=None)
 def GetByIDHandler(object_type, req_model=ByIDRequest):  # pylint: disable=invalid-name
-    """Function to dynamically create ObjectResponse[object_type]"""
+    """Function to dynamically create ObjectResponse[object_type] (once per object type)"""
 
     class _GetByIDHandler(AuthedAPIPayloadHandler):
         def __init__(self, dry=False):
@@ -105,6 +168,16 @@ def GetByIDHandler(object_type, req_model=ByIDRequest):  # pylint: disable=inval
     return _GetByIDHandler
 
 
+GetVenuesHandler = GetPaginatedDataHandler(Venue)
+GetUsersHandler = GetPaginatedDataHandler(User)
+GetUserByIDHandler = GetByIDHandler(User)
+GetCustomerByIDHandler = GetByIDHandler(Customer)
+GetCustomerGroupsHandler = GetPaginatedDataHandler(Group)
+GetStationByIDHandler = GetByIDHandler(Station)
+GetSaleTypesHandler = GetPaginatedDataHandler(SaleType)
+GetPaymentMethodsHandler = GetPaginatedDataHandler(PaymentMethod)
+GetReceiptByIDHandler = GetByIDHandler(Receipt)
+
 ###################################################################################################
 
 
@@ -0,0 +1,274 @@
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+__all__ = ['HedgePolicy', 'HedgeStats', 'HEDGED_ROUTES']
+
+HEDGED_ROUTES = frozenset({'get_stop_list', 'get_product_by_id'})
+"""Latency-critical endpoints, hedged by default"""
+
+
+@dataclass
+class HedgeStats:
+    """Metrics of the hedging policy"""
+
+    requests: int = 0
+    """Number of hedged-endpoint requests"""
+
+    hedged: int = 0
+    """Number of requests, for which a hedge was sent"""
+
+    wins: int = 0
+    """Number of hedges, which returned before the original request"""
+
+    over_budget: int = 0
+    """Number of hedges not sent, as the budget was exhausted"""
+
+    @property
+    def hedge_rate(self) -> float:
+        """Share of requests, which were hedged"""
+        return self.hedged / self.requests if self.requests else 0
+
+    @property
+    def win_rate(self) -> float:
+        """Share of hedges, which won"""
+        return self.wins / self.hedged if self.hedged else 0
+
+
+@dataclass
+class _Attempt:
+    """Start of the request sent in the pool. Its latency is recorded once: when it returns, or
+    when it loses (elapsed time then, which is a lower bound of the latency)
+    """
+
+    start: Optional[float] = None
+    recorded: bool = False
+
+
+class HedgePolicy:  # pylint: disable=too-many-instance-attributes
+    """Hedged requests of latency-critical GET endpoints: if the response does not arrive in
+    time, an identical request is sent, and whichever returns first is taken.
+
+    The delay is `percentile` of the recent latencies of the endpoint (`initial_delay` until
+    there are `min_samples` of them), so that only the slowest requests are hedged. Losing
+    requests are recorded with the time they took until they lost, so that slow responses are
+    not left out of the latencies. At most
+    `budget` share of requests are hedged, to cap the extra load on Clopos.
+
+    The losing request is cancelled with the async client. With the sync client, requests are
+    sent in a thread pool of `workers` threads, and response of the losing one is discarded.
+    Every hedged call holds up to two workers, so the pool should have twice as many workers as
+    there are concurrent calls of hedged endpoints. The delay is counted from the moment the
+    request starts in the pool, so time spent waiting for a free worker does not trigger
+    hedges.
+
+    Example:
+    ```python
+    from integrify.clopos import CloposClientClass, HedgePolicy
+
+    hedging = HedgePolicy(percentile=0.9, budget=0.05)
+    client = CloposClientClass(auto_auth=True, sync=False, hedging=hedging)
+
+    hedging.stats.hedge_rate, hedging.stats.wins
+    ```
+    """
+
+    def __init__(
+        self,
+        routes: Iterable[str] = HEDGED_ROUTES,
+        percentile: float = 0.95,
+        initial_delay: float = 0.5,
+        min_delay: float = 0.01,
+        budget: float = 0.1,
+        window: int = 100,
+        min_samples: int = 20,
+        workers: int = 16,
+    ):
+        """
+        Args:
+            routes: Endpoints to hedge (GET endpoints only)
+            percentile: Percentile of the recent latencies to send hedge after
+            initial_delay: Delay until there are enough samples, in seconds
+            min_delay: Minimum delay, in seconds
+            budget: Maximum share of requests, which can be hedged
+            window: Number of the recent latencies per endpoint
+            min_samples: Minimum number of latencies to derive the delay from
+            workers: Size of the thread pool of the sync client (two per concurrent call)
+        """
+        self.routes = frozenset(routes)
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.budget = budget
+        self.window = window
+        self.min_samples = min_samples
+        self.workers = workers
+
+        self.stats = HedgeStats()
+
+        self._latencies: dict[str, deque] = {}
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def hedged(self, route_name: Optional[str]) -> bool:
+        """Check if requests to the endpoint are hedged"""
+        return route_name in self.routes
+
+    def delay(self, route_name: str) -> float:
+        """Time to wait for the response before sending hedge, in seconds"""
+        with self._lock:
+            latencies = sorted(self._latencies.get(route_name, ()))
+
+        if len(latencies) < self.min_samples:
+            return self.initial_delay
+
+        index = min(int(len(latencies) * self.percentile), len(latencies) - 1)
+        return max(latencies[index], self.min_delay)
+
+    def observe(self, route_name: str, latency: float) -> None:
+        """Record latency of the request to the endpoint"""
+        with self._lock:
+            latencies = self._latencies.get(route_name)
+            if latencies is None:
+                latencies = self._latencies[route_name] = deque(maxlen=self.window)
+
+            latencies.append(latency)
+
+    def _record(self, route_name: str, attempt: _Attempt) -> None:
+        """Record latency of the attempt (elapsed time so far), unless it is already recorded,
+        or the attempt has not started
+        """
+        with self._lock:
+            if attempt.start is None or attempt.recorded:
+                return
+
+            attempt.recorded = True
+
+        self.observe(route_name, time.monotonic() - attempt.start)
+
+    def _start(self) -> None:
+        with self._lock:
+            self.stats.requests += 1
+
+    def _claim(self) -> bool:
+        """Take a hedge from the budget"""
+        with self._lock:
+            if self.stats.hedged + 1 > self.budget * self.stats.requests:
+                self.stats.over_budget += 1
+                return False
+
+            self.stats.hedged += 1
+            return True
+
+    def _won(self) -> None:
+        with self._lock:
+            self.stats.wins += 1
+
+    @property
+    def pool(self) -> ThreadPoolExecutor:
+        """Thread pool of the sync client, created on first use"""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='clopos-hedge')
+
+        return self._pool
+
+    def _submit(
+        self,
+        route_name: str,
+        send: Callable[[], Any],
+        started: Optional[threading.Event] = None,
+    ) -> tuple[Future, _Attempt]:
+        """Send the request in the pool (in the current context), and record its latency.
+        `started` is set, once a worker picks the request up.
+        """
+        attempt = _Attempt()
+
+        def timed():
+            if started is not None:
+                started.set()
+
+            attempt.start = time.monotonic()
+            result = send()
+            self._record(route_name, attempt)
+            return result
+
+        return self.pool.submit(contextvars.copy_context().run, timed), attempt
+
+    def call(self, route_name: str, send: Callable[[], Any]) -> Any:
+        """Send the request, and hedge it if it is slow"""
+        self._start()
+        started = threading.Event()
+        primary, attempt = self._submit(route_name, send, started)
+
+        started.wait()  # time in the queue of the pool is not latency of Clopos
+        done, _ = wait([primary], timeout=self.delay(route_name))
+        if done or not self._claim():
+            return primary.result()
+
+        hedge, hedge_attempt = self._submit(route_name, send)
+        attempts = {primary: attempt, hedge: hedge_attempt}
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            winner = next((f for f in done if f.exception() is None), None)
+            if winner is not None:
+                for future in pending:
+                    future.cancel()  # discarded, if already running
+                    self._record(route_name, attempts[future])
+
+                if winner is hedge:
+                    self._won()
+
+                return winner.result()
+
+        return primary.result()  # both failed
+
+    async def _timed(self, route_name: str, send: Callable[[], Awaitable[Any]]) -> Any:
+        start = time.monotonic()
+        try:
+            result = await send()
+        except asyncio.CancelledError:  # lost, the elapsed time is a lower bound of latency
+            self.observe(route_name, time.monotonic() - start)
+            raise
+
+        self.observe(route_name, time.monotonic() - start)
+        return result
+
+    async def acall(self, route_name: str, send: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of `call`. The losing request is cancelled."""
+        self._start()
+        loop = asyncio.get_running_loop()
+        primary = loop.create_task(self._timed(route_name, send))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(primary), self.delay(route_name))
+        except asyncio.TimeoutError:
+            if not self._claim():
+                return await primary
+        except BaseException:
+            primary.cancel()
+            raise
+
+        hedge = loop.create_task(self._timed(route_name, send))
+        pending = {primary, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((t for t in done if t.exception() is None), None)
+                if winner is not None:
+                    if winner is hedge:
+                        self._won()
+
+                    return winner.result()
+
+            return primary.result()  # both failed
+        finally:
+            for task in pending:
+                task.cancel()
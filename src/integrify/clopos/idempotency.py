@@ -0,0 +1,270 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+import httpx
+
+from integrify.clopos.coalesce import RequestCoalescer
+
+__all__ = [
+    'IdempotencyRegistry',
+    'IdempotencyStats',
+    'IDEMPOTENT_ROUTES',
+    'LOOKUP_ARGS',
+    'RECONCILE_ROUTES',
+    'payload_cid',
+]
+
+IDEMPOTENT_ROUTES = frozenset({'create_receipt', 'create_order', 'create_customer'})
+"""Write endpoints with client-generated `cid`"""
+
+RECONCILE_ROUTES: dict[str, tuple[str, str]] = {
+    'create_receipt': ('get_receipts', 'get_receipt_by_id'),
+    'create_customer': ('get_customers', 'get_customer_by_id'),
+}
+"""List and by-id endpoints to look up objects by `cid`, per write endpoint"""
+
+LOOKUP_ARGS: dict[str, dict[str, Any]] = {
+    'get_receipts': {'sort_by': 'created_at', 'sort_order': -1},
+}
+"""Arguments of list endpoints, so that the latest objects come first (`get_customers` can
+not be sorted, its default order is used)"""
+
+DEFAULT_LOOKUP_LIMIT = 50
+"""Number of the latest objects, in which `cid` is looked up"""
+
+AMBIGUOUS_STATUSES = frozenset({500, 502, 504})
+"""Status codes, after which the request may have been processed"""
+
+RegistryKey = tuple[str, str]
+
+
+def payload_cid(data: Any) -> Optional[str]:
+    """`cid` of the request data (top-level, or in `meta`)"""
+    if not isinstance(data, dict):
+        return None
+
+    meta = data.get('meta')
+    return data.get('cid') or (meta.get('cid') if isinstance(meta, dict) else None)
+
+
+@dataclass
+class IdempotencyStats:
+    """Counters of the idempotency registry"""
+
+    sent: int = 0
+    """Number of requests sent"""
+
+    replayed: int = 0
+    """Number of repeated requests, answered with the remembered response"""
+
+    ambiguous: int = 0
+    """Number of failures, after which it is unknown if the object was created"""
+
+    reconciled: int = 0
+    """Number of objects found by lookup after ambiguous failures (and not created again)"""
+
+
+class IdempotencyRegistry:  # pylint: disable=too-many-instance-attributes
+    """Registry of recently sent `cid`s of write endpoints, and their successful responses.
+
+    - Repeated requests with the same `cid` get the remembered response, instead of being sent.
+    - Concurrent requests with the same `cid` are sent once.
+    - After ambiguous failures (timeouts, dropped connections, `500`, `502`, `504`), the
+      object may have been created. The next attempt (e.g. a retry of `RetryPolicy`) looks up
+      the object by `cid` first (`RECONCILE_ROUTES`), and returns it, if it exists.
+
+    This makes retries of write endpoints safe, so they can be retried aggressively.
+
+    Example:
+    ```python
+    from integrify.clopos import CloposClientClass, IdempotencyRegistry, RetryPolicy
+
+    client = CloposClientClass(
+        auto_auth=True,
+        idempotency=IdempotencyRegistry(ttl=3600),
+        retry_policy=RetryPolicy(attempts=5),
+    )
+    ```
+    """
+
+    def __init__(
+        self,
+        routes: Iterable[str] = IDEMPOTENT_ROUTES,
+        ttl: float = 600,
+        max_entries: int = 10_000,
+        lookup_limit: int = DEFAULT_LOOKUP_LIMIT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            routes: Write endpoints, whose requests are tracked by `cid`
+            ttl: Time to remember responses, in seconds
+            max_entries: Maximum number of remembered `cid`s (least recent are evicted)
+            lookup_limit: Number of the latest objects, in which `cid` is looked up
+            clock: Time function
+        """
+        self.routes = frozenset(routes)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lookup_limit = lookup_limit
+        self.clock = clock
+
+        self.stats = IdempotencyStats()
+
+        self._responses: OrderedDict[RegistryKey, tuple[float, Any]] = OrderedDict()
+        self._uncertain: OrderedDict[RegistryKey, None] = OrderedDict()
+        self._in_flight = RequestCoalescer()
+        self._lock = threading.Lock()
+
+    def tracked(self, route_name: Optional[str]) -> bool:
+        """Check if requests to the endpoint are tracked"""
+        return route_name in self.routes
+
+    def get(self, route_name: str, cid: str) -> Optional[Any]:
+        """Remembered response of the request (`None` if there is none, or it expired)"""
+        key = (route_name, cid)
+        with self._lock:
+            entry = self._responses.get(key)
+            if entry is None:
+                return None
+
+            if entry[0] <= self.clock():
+                del self._responses[key]
+                return None
+
+            self._responses.move_to_end(key)
+            return entry[1]
+
+    def remember(self, route_name: str, cid: str, resp: Any) -> None:
+        """Remember successful response of the request"""
+        key = (route_name, cid)
+        with self._lock:
+            self._uncertain.pop(key, None)
+            self._responses[key] = (self.clock() + self.ttl, resp)
+            self._responses.move_to_end(key)
+
+            while len(self._responses) > self.max_entries:
+                self._responses.popitem(last=False)
+
+    def uncertain(self, route_name: str, cid: str) -> bool:
+        """Check if the last attempt of the request failed ambiguously"""
+        with self._lock:
+            return (route_name, cid) in self._uncertain
+
+    def clear(self) -> None:
+        """Forget all requests"""
+        with self._lock:
+            self._responses.clear()
+            self._uncertain.clear()
+
+    @staticmethod
+    def ambiguous(result: Any = None, error: Optional[BaseException] = None) -> bool:
+        """Check if the request may have been processed, although it failed"""
+        if error is not None:
+            # the request was not sent, if the connection could not be established
+            return isinstance(error, httpx.TransportError) and not isinstance(
+                error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+            )
+
+        return getattr(result, 'status_code', None) in AMBIGUOUS_STATUSES
+
+    def _mark(self, key: RegistryKey) -> None:
+        with self._lock:
+            self.stats.ambiguous += 1
+            self._uncertain[key] = None
+            while len(self._uncertain) > self.max_entries:
+                self._uncertain.popitem(last=False)
+
+    def _settle(self, key: RegistryKey, result: Any = None, error: Optional[BaseException] = None):
+        if error is None and getattr(result, 'ok', False):
+            self.remember(*key, result)
+        elif self.ambiguous(result, error):
+            self._mark(key)
+
+    def _reconciled(self, key: RegistryKey, found: Any) -> bool:
+        """Record result of the lookup, and check if the object was found"""
+        if not getattr(found, 'ok', False):
+            return False
+
+        with self._lock:
+            self.stats.reconciled += 1
+
+        self.remember(*key, found)
+        return True
+
+    def call(
+        self,
+        route_name: str,
+        cid: str,
+        send: Callable[[], Any],
+        lookup: Callable[[], Optional[Any]],
+    ) -> Any:
+        """Send the request, unless its response is remembered, or (after an ambiguous
+        failure) the object is found by `lookup`
+
+        Args:
+            route_name: Name of the endpoint
+            cid: `cid` of the request
+            send: Sends the request
+            lookup: Returns response with the object of `cid`, or `None` if it does not exist
+        """
+        resp = self.get(route_name, cid)
+        if resp is not None:
+            self.stats.replayed += 1
+            return resp
+
+        key = (route_name, cid)
+
+        def attempt():
+            if self.uncertain(*key):
+                found = lookup()
+                if self._reconciled(key, found):
+                    return found
+
+            self.stats.sent += 1
+            try:
+                result = send()
+            except Exception as exc:
+                self._settle(key, error=exc)
+                raise
+
+            self._settle(key, result)
+            return result
+
+        return self._in_flight.call(key, attempt)
+
+    async def acall(
+        self,
+        route_name: str,
+        cid: str,
+        send: Callable[[], Awaitable[Any]],
+        lookup: Callable[[], Awaitable[Optional[Any]]],
+    ) -> Any:
+        """Async version of `call`"""
+        resp = self.get(route_name, cid)
+        if resp is not None:
+            self.stats.replayed += 1
+            return resp
+
+        key = (route_name, cid)
+
+        async def attempt():
+            if self.uncertain(*key):
+                found = await lookup()
+                if self._reconciled(key, found):
+                    return found
+
+            self.stats.sent += 1
+            try:
+                result = await send()
+            except Exception as exc:
+                self._settle(key, error=exc)
+                raise
+
+            self._settle(key, result)
+            return result
+
+        return await self._in_flight.acall(key, attempt)
@@ -0,0 +1,543 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from contextlib import closing, contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional
+
+import httpx
+from pydantic_core import to_jsonable_python
+
+from integrify.clopos.exceptions import CloposCircuitOpenError
+from integrify.clopos.idempotency import RECONCILE_ROUTES, payload_cid
+from integrify.clopos.retry import RETRY_STATUSES, RetryPolicy
+from integrify.logger import LOGGER_FUNCTION
+from integrify.utils import UNSET
+
+if TYPE_CHECKING:
+    from integrify.clopos.client import CloposClientClass
+
+__all__ = ['Outbox', 'OutboxEntry', 'OutboxStats', 'OUTBOX_ROUTES', 'DEDUPED_ROUTES']
+
+OUTBOX_ROUTES = frozenset(
+    {
+        'create_receipt',
+        'update_receipt',
+        'close_receipt',
+        'update_closed_receipt',
+        'delete_receipt',
+        'create_order',
+        'update_order',
+    },
+)
+"""Write endpoints, which can be sent through the outbox"""
+
+DEDUPED_ROUTES = frozenset({'create_receipt', 'close_receipt'})
+"""Endpoints, whose requests with the same `cid` are sent only once (orders have no declared
+`cid`, so `create_order` is not deduplicated)
+"""
+
+CREATE_ROUTES = frozenset({'create_receipt', 'create_order'})
+"""Endpoints, whose responses give `id` to the next requests of the same key"""
+
+
+@dataclass
+class OutboxEntry:
+    """Write request in the outbox"""
+
+    id: int
+    """Position of the entry in the outbox"""
+
+    key: str
+    """Ordering key (`cid` of the receipt, or given one): entries of a key are sent in order"""
+
+    route_name: str
+    """Endpoint of the request"""
+
+    payload: dict
+    """Arguments of the endpoint"""
+
+    status: str
+    """`pending`, `delivered` or `failed`"""
+
+    attempts: int
+    """Number of sending attempts"""
+
+    error: Optional[str]
+    """Last error"""
+
+
+@dataclass
+class OutboxStats:
+    """Counters of the outbox"""
+
+    enqueued: int = 0
+    """Number of enqueued requests"""
+
+    duplicates: int = 0
+    """Number of requests, which were already enqueued or delivered (the same `cid`)"""
+
+    delivered: int = 0
+    """Number of delivered requests"""
+
+    retries: int = 0
+    """Number of failed attempts, which will be retried"""
+
+    failed: int = 0
+    """Number of requests, which failed permanently (e.g. validation errors)"""
+
+
+class Outbox:  # pylint: disable=too-many-instance-attributes
+    """Durable outbox of write requests (receipts and orders) in a local SQLite database.
+
+    Requests are enqueued with their `cid` and sent by a dispatcher (`dispatch`, or a
+    background loop with `start`/`arun`), so that they survive crashes of the process and
+    outages of Clopos. Failed attempts (network errors, `408`, `429`, `5xx`, open circuit) are
+    retried with exponential backoff until the request is delivered.
+
+    Entries of the same key (`cid` of the receipt by default) are sent in order: create before
+    update and close, close before delete. `id` of the created receipt (or order) is added to
+    the next requests of the key, if they do not have it. Requests of `DEDUPED_ROUTES` with
+    the same `cid` are enqueued once, and their `409` responses are taken as already delivered
+    (e.g. the receipt was created before a crash, but the outbox did not record it), as is `404`
+    of `delete_receipt`. `id` of the existing receipt is then looked up by its `cid`. A request,
+    which fails permanently, blocks the next ones of its key until it is requeued.
+
+    Use a single dispatcher per database. Requests can be enqueued from any process. Async
+    dispatcher (`adispatch`, `arun`) and `aenqueue` access the database in worker threads, so
+    that the event loop is not blocked while another process holds its lock.
+
+    Example:
+    ```python
+    from integrify.clopos import CloposClientClass, Outbox
+
+    client = CloposClientClass(auto_auth=True)
+    outbox = Outbox(client, 'outbox.db').start()
+
+    outbox.enqueue('create_receipt', cid='a7890398', payment_methods=[...], user_id=1)
+    outbox.enqueue('close_receipt', cid='a7890398', payment_methods=[...], closed_at='...')
+    ```
+    """
+
+    def __init__(
+        self,
+        client: 'CloposClientClass',
+        path: str,
+        backoff: float = 1,
+        max_backoff: float = 300,
+        max_attempts: Optional[int] = None,
+        interval: float = 1,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            client: Clopos client to send requests with
+            path: Path of the database file
+            backoff: Delay before the first retry, in seconds (doubled after each attempt)
+            max_backoff: Maximum delay between retries, in seconds
+            max_attempts: Number of attempts, after which the request fails (unlimited if not
+                given, as the outbox is meant to outlive outages)
+            interval: Polling interval of the background dispatcher, in seconds
+            clock: Time function, wall-clock (entries survive restarts)
+        """
+        self.client = client
+        self.path = path
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.interval = interval
+        self.clock = clock
+
+        self.stats = OutboxStats()
+
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS clopos_outbox ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT NOT NULL, route TEXT NOT NULL, '
+                'dedupe TEXT, payload TEXT NOT NULL, headers TEXT, '
+                "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, "
+                'next_at REAL NOT NULL, object_id INTEGER, error TEXT)'
+            )
+            conn.execute(
+                'CREATE UNIQUE INDEX IF NOT EXISTS clopos_outbox_dedupe '
+                'ON clopos_outbox (route, dedupe)'
+            )
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS clopos_outbox_key ON clopos_outbox (key, status)'
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def enqueue(
+        self,
+        route_name: str,
+        key: Optional[str] = None,
+        headers: Optional[dict] = None,
+        **payload,
+    ) -> int:
+        """Store the request in the outbox, and return its entry id (id of the existing entry,
+        if request with the same `cid` was already enqueued).
+
+        Args:
+            route_name: Write endpoint (e.g. `create_receipt`, see `OUTBOX_ROUTES`)
+            key: Ordering key (`cid` of the payload, if not given)
+            headers: Headers of the request (prefer token manager of the client to `x-token`,
+                as tokens expire before the request may be sent)
+            **payload: Arguments of the endpoint
+        """
+        if route_name not in OUTBOX_ROUTES:
+            raise ValueError(f'{route_name} can not be sent through the outbox')
+
+        key = key or payload.get('cid')
+        if not key:
+            raise ValueError('Either `key`, or `cid` in the payload is required')
+
+        dedupe = payload.get('cid') if route_name in DEDUPED_ROUTES else None
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO clopos_outbox '
+                '(key, route, dedupe, payload, headers, next_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (
+                    str(key),
+                    route_name,
+                    dedupe,
+                    json.dumps(to_jsonable_python(payload)),
+                    json.dumps(headers) if headers else None,
+                    self.clock(),
+                ),
+            )
+            if cursor.rowcount:
+                self.stats.enqueued += 1
+                entry_id = cursor.lastrowid
+            else:
+                self.stats.duplicates += 1
+                entry_id = conn.execute(
+                    'SELECT id FROM clopos_outbox WHERE route = ? AND dedupe = ?',
+                    (route_name, dedupe),
+                ).fetchone()[0]
+
+        self._wakeup.set()
+        return entry_id  # type: ignore[return-value]
+
+    async def aenqueue(
+        self,
+        route_name: str,
+        key: Optional[str] = None,
+        headers: Optional[dict] = None,
+        **payload,
+    ) -> int:
+        """Async version of `enqueue`"""
+        return await asyncio.to_thread(self.enqueue, route_name, key, headers, **payload)
+
+    def pending(self) -> int:
+        """Number of requests waiting to be sent"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM clopos_outbox WHERE status = 'pending'"
+            ).fetchone()[0]
+
+    def failed(self) -> list[OutboxEntry]:
+        """Requests, which failed permanently (and block the next requests of their keys)"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT id, key, route, payload, status, attempts, error FROM clopos_outbox '
+                "WHERE status = 'failed' ORDER BY id"
+            ).fetchall()
+
+        return [self._entry(row) for row in rows]
+
+    def requeue(self, entry_id: int, **payload) -> None:
+        """Send the failed request again, optionally with corrected arguments"""
+        with self._connect() as conn:
+            if payload:
+                (stored,) = conn.execute(
+                    'SELECT payload FROM clopos_outbox WHERE id = ?', (entry_id,)
+                ).fetchone()
+                conn.execute(
+                    'UPDATE clopos_outbox SET payload = ? WHERE id = ?',
+                    (json.dumps({**json.loads(stored), **to_jsonable_python(payload)}), entry_id),
+                )
+
+            conn.execute(
+                "UPDATE clopos_outbox SET status = 'pending', attempts = 0, next_at = ? "
+                "WHERE id = ? AND status = 'failed'",
+                (self.clock(), entry_id),
+            )
+
+        self._wakeup.set()
+
+    def _ready(self) -> list[tuple]:
+        """The oldest undelivered entry of every key, if it is pending and due"""
+        with self._connect() as conn:
+            return conn.execute(
+                'SELECT id, key, route, payload, headers, attempts FROM clopos_outbox '
+                'WHERE id IN ('
+                "SELECT MIN(id) FROM clopos_outbox WHERE status != 'delivered' GROUP BY key"
+                ") AND status = 'pending' AND next_at <= ? ORDER BY id",
+                (self.clock(),),
+            ).fetchall()
+
+    def _request(self, row: tuple) -> Optional[tuple[Callable[..., Any], dict]]:
+        """Request function and its arguments for the entry (`None` if `id` is unknown)"""
+        entry_id, key, route_name, payload, headers, _ = row
+        payload = json.loads(payload)
+
+        if route_name not in CREATE_ROUTES and 'id' not in payload:
+            with self._connect() as conn:
+                found = conn.execute(
+                    'SELECT object_id FROM clopos_outbox '
+                    'WHERE key = ? AND object_id IS NOT NULL AND id < ? ORDER BY id DESC',
+                    (key, entry_id),
+                ).fetchone()
+
+            if found is None:
+                self._fail(row, 'ID of the object is unknown: it was not created in the outbox')
+                return None
+
+            payload['id'] = found[0]
+
+        payload['headers'] = json.loads(headers) if headers else UNSET
+        payload['validation'] = 'raw'
+        return getattr(self.client, route_name), payload
+
+    def dispatch(self) -> int:
+        """Send due requests (in order per key) until there are none, and return the number of
+        delivered ones
+        """
+        delivered = 0
+        while rows := self._ready():
+            sent = 0
+            for row in rows:
+                request = self._request(row)
+                if request is None:
+                    continue
+
+                func, kwds = request
+                try:
+                    resp = func(**kwds)
+                except Exception as exc:  # pylint: disable=broad-exception-caught
+                    sent += self._settle(row, error=exc)
+                    continue
+
+                lookup = self._conflict_lookup(row, resp)
+                try:
+                    found = lookup() if lookup else None
+                except Exception as exc:  # pylint: disable=broad-exception-caught
+                    self._retry(row, f'Lookup of the existing object failed: {exc!r}')
+                    continue
+
+                sent += self._settle(row, resp=resp, found=found)
+
+            if not sent:  # only retries are left, they are due later
+                break
+
+            delivered += sent
+
+        return delivered
+
+    async def adispatch(self) -> int:
+        """Async version of `dispatch`, which sends requests of different keys concurrently"""
+
+        async def send(row: tuple) -> int:
+            request = await asyncio.to_thread(self._request, row)
+            if request is None:
+                return 0
+
+            func, kwds = request
+            try:
+                resp = await func(**kwds)
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                return await asyncio.to_thread(self._settle, row, error=exc)
+
+            lookup = self._conflict_lookup(row, resp)
+            try:
+                found = await lookup() if lookup else None
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                await asyncio.to_thread(
+                    self._retry, row, f'Lookup of the existing object failed: {exc!r}'
+                )
+                return 0
+
+            return await asyncio.to_thread(self._settle, row, resp=resp, found=found)
+
+        delivered = 0
+        while rows := await asyncio.to_thread(self._ready):
+            sent = sum(await asyncio.gather(*(send(row) for row in rows)))
+            if not sent:
+                break
+
+            delivered += sent
+
+        return delivered
+
+    def _conflict_lookup(self, row: tuple, resp: Any) -> Optional[Callable[[], Any]]:
+        """Lookup of the object, which already exists according to `409` response of the create
+        request (`None` for other responses, or if the object can not be looked up by `cid`)
+        """
+        route_name, payload, headers = row[2], json.loads(row[3]), row[4]
+        status = getattr(resp, 'status_code', None)
+        if status != 409 or route_name not in RECONCILE_ROUTES:
+            return None
+
+        cid = payload_cid(payload)
+        if not cid:
+            return None
+
+        # pylint: disable-next=protected-access
+        lookup = self.client._lookup if self.client.request_executor.sync else self.client._alookup
+        return lookup(route_name, cid, json.loads(headers) if headers else UNSET, 'raw')
+
+    def _settle(
+        self,
+        row: tuple,
+        resp: Any = None,
+        error: Optional[BaseException] = None,
+        found: Any = None,
+    ) -> int:
+        """Record outcome of the attempt, and return `1` if the request was delivered.
+        `found` is the existing object of `409` response, if it was looked up.
+        """
+        route_name = row[2]
+        status = getattr(resp, 'status_code', None)
+
+        if error is None and (
+            getattr(resp, 'ok', False) or (status == 404 and route_name == 'delete_receipt')
+        ):
+            self._delivered(row, resp)
+            return 1
+
+        if status == 409 and route_name in DEDUPED_ROUTES:
+            self.stats.duplicates += 1
+            if route_name in CREATE_ROUTES and not getattr(found, 'ok', False):
+                self._logger.warning(
+                    'Outbox request %s (%s) conflicted, but the existing object was not found',
+                    row[0],
+                    route_name,
+                )
+
+            self._delivered(row, found if getattr(found, 'ok', False) else None)
+            return 1
+
+        if isinstance(error, CloposCircuitOpenError):
+            self._retry(row, str(error), error.retry_after)
+        elif isinstance(error, httpx.TransportError):
+            self._retry(row, repr(error))
+        elif error is not None:
+            self._fail(row, repr(error))
+        elif status in RETRY_STATUSES:
+            self._retry(row, _message(resp), RetryPolicy.retry_after(resp))
+        else:
+            self._fail(row, _message(resp))
+
+        return 0
+
+    def _delivered(self, row: tuple, resp: Any) -> None:
+        object_id = None
+        if row[2] in CREATE_ROUTES:
+            body = getattr(resp, 'body', None)
+            object_id = (body.get('data') or {}).get('id') if isinstance(body, dict) else None
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE clopos_outbox SET status = 'delivered', attempts = attempts + 1, "
+                'object_id = ?, error = NULL WHERE id = ?',
+                (object_id, row[0]),
+            )
+
+        self.stats.delivered += 1
+
+    def _retry(self, row: tuple, error: str, retry_after: Optional[float] = None) -> None:
+        attempts = row[5] + 1
+        if self.max_attempts is not None and attempts >= self.max_attempts:
+            self._fail(row, error)
+            return
+
+        delay = min(self.backoff * 2 ** (attempts - 1), self.max_backoff)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE clopos_outbox SET attempts = ?, next_at = ?, error = ? WHERE id = ?',
+                (attempts, self.clock() + delay, error, row[0]),
+            )
+
+        self.stats.retries += 1
+        self._logger.warning(
+            'Outbox request %s failed, retrying in %.1fs: %s', row[0], delay, error
+        )
+
+    def _fail(self, row: tuple, error: str) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE clopos_outbox SET status = 'failed', attempts = attempts + 1, error = ? "
+                'WHERE id = ?',
+                (error, row[0]),
+            )
+
+        self.stats.failed += 1
+        self._logger.error('Outbox request %s (%s) failed: %s', row[0], row[2], error)
+
+    def run(self) -> None:
+        """Dispatch requests every `interval` seconds (or as soon as they are enqueued), until
+        `stop` is called
+        """
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            try:
+                self.dispatch()
+            except Exception:  # pylint: disable=broad-exception-caught
+                self._logger.exception('Outbox dispatch failed')
+
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+    def start(self) -> 'Outbox':
+        """Run dispatcher in a background thread"""
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    async def arun(self) -> None:
+        """Async version of `run`, for async client (e.g. in a task)"""
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            try:
+                await self.adispatch()
+            except Exception:  # pylint: disable=broad-exception-caught
+                self._logger.exception('Outbox dispatch failed')
+
+            await asyncio.sleep(self.interval)
+
+    def stop(self) -> None:
+        """Stop dispatcher"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    @staticmethod
+    def _entry(row: tuple) -> OutboxEntry:
+        entry_id, key, route_name, payload, status, attempts, error = row
+        return OutboxEntry(entry_id, key, route_name, json.loads(payload), status, attempts, error)
+
+    @property
+    def _logger(self):
+        return LOGGER_FUNCTION('Clopos')
+
+
+def _message(resp: Any) -> str:
+    """Error message of the failed response"""
+    body = getattr(resp, 'body', None)
+    message = getattr(body, 'message', None) or (body if isinstance(body, str) else None)
+    return f'{getattr(resp, "status_code", None)}: {message or "request failed"}'
@@ -0,0 +1,365 @@
+import asyncio
+import math
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator, Optional, Union
+
+from integrify.clopos.exceptions import CloposResponseError
+from integrify.clopos.schemas.common.response import PaginatedResponse
+from integrify.clopos.streaming import AsyncStreamedPage, StreamedPage
+
+__all__ = [
+    'paginate',
+    'apaginate',
+    'fetch_all',
+    'afetch_all',
+    'PageSizeController',
+    'PageSample',
+    'DEFAULT_PAGE_LIMIT',
+]
+
+DEFAULT_PAGE_LIMIT = 100
+"""Page size used by auto-paginating iterators, if `limit` is not given"""
+
+DEFAULT_CONCURRENCY = 8
+"""Number of pages fetched at the same time by `fetch_all`"""
+
+
+def page_items(resp: Any) -> Any:
+    """Items of the list response. Raises `CloposResponseError` for failed responses.
+    Streamed pages are items themselves, and are checked while they are consumed.
+    """
+    if isinstance(resp, (StreamedPage, AsyncStreamedPage)):
+        return resp
+
+    body = getattr(resp, 'body', None)
+
+    # `raw` validation mode returns decoded JSON
+    if isinstance(body, dict) and body.get('success') is True:
+        return body['data']
+
+    if not isinstance(body, PaginatedResponse):
+        raise CloposResponseError('Could not fetch page', resp)
+
+    return body.data  # type: ignore[attr-defined]
+
+
+def page_total(resp: Any) -> Any:
+    """`total` of the list response (`UNSET` or `None`, if it is not given)"""
+    body = resp.body
+    return body.get('total') if isinstance(body, dict) else body.total
+
+
+def is_last_page(resp: Any, items: list, page: int, limit: int) -> bool:
+    """Check if there is nothing to fetch after this page: by `total`, if it is given (pages can
+    be short before the last one), and by the short page otherwise
+    """
+    total = page_total(resp)
+    if isinstance(total, int):
+        return page * limit >= total
+
+    return len(items) < limit
+
+
+def last_page(resp: Any, limit: int) -> int:
+    """Number of the last page, calculated from `total` (0 if `total` is not given)"""
+    total = page_total(resp)
+    return math.ceil(total / limit) if isinstance(total, int) else 0
+
+
+def response_size(resp: Any) -> int:
+    """Size of the response body in bytes (from `Content-Length`, 0 if it is unknown)"""
+    try:
+        return int(resp.headers.get('content-length', 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+
+@dataclass
+class PageSample:
+    """Observation of a single page, recorded by `PageSizeController`"""
+
+    page: int
+    limit: int
+    items: int
+    seconds: float
+    size: int
+    """Response size in bytes"""
+
+
+class PageSizeController:
+    """Tunes page size of auto-paginating iterators on the fly. After every page, `limit` is
+    doubled if the page was fast and small compared to the targets, and halved if it was slow or
+    too big. It always stays within `[min_limit, max_limit]`.
+
+    Size only changes when the next page can start exactly at the current offset (e.g. doubling
+    on page 3 of 10 items would skip items 21-30), so items are never skipped or repeated.
+
+    Pass it as `limit` to `iter_*` methods. One controller can be reused between iterations,
+    so that next iteration starts from the converged size.
+    """  # noqa: E501
+
+    def __init__(
+        self,
+        limit: int = DEFAULT_PAGE_LIMIT,
+        min_limit: int = 10,
+        max_limit: int = 1000,
+        target_seconds: float = 1.0,
+        max_page_bytes: int = 4 * 1024 * 1024,
+        history_size: int = 1000,
+    ):
+        """
+        Args:
+            limit: Initial page size
+            min_limit: Minimum page size
+            max_limit: Maximum page size
+            target_seconds: Desired response time of a single page
+            max_page_bytes: Maximum desired response size of a single page
+            history_size: Number of last observations kept in `history`
+        """
+        if not 0 < min_limit <= max_limit:
+            raise ValueError('`min_limit` must be positive and not greater than `max_limit`')
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_seconds = target_seconds
+        self.max_page_bytes = max_page_bytes
+
+        self.limit = min(max(limit, min_limit), max_limit)
+        """Current page size"""
+
+        self.history: deque[PageSample] = deque(maxlen=history_size)
+        """Last observed pages, with page sizes used for them"""
+
+    @property
+    def limits(self) -> list[int]:
+        """Page sizes used for the observed pages, in order"""
+        return [sample.limit for sample in self.history]
+
+    def observe(self, page: int, limit: int, items: int, seconds: float, size: int) -> None:
+        """Record the observation of a page"""
+        self.history.append(PageSample(page, limit, items, seconds, size))
+
+    def desired_limit(self) -> int:
+        """Page size, desired after the last observation (not aligned to offsets)"""
+        if not self.history:
+            return self.limit
+
+        sample = self.history[-1]
+        limit = sample.limit
+        fit = float(self.max_limit)
+
+        if sample.seconds > 0:
+            fit = min(fit, limit * self.target_seconds / sample.seconds)
+
+        if sample.size and sample.items:
+            fit = min(fit, self.max_page_bytes / (sample.size / sample.items))
+
+        if fit >= limit * 2:
+            limit *= 2
+        elif fit < limit:
+            limit //= 2
+
+        return min(max(limit, self.min_limit), self.max_limit)
+
+    def next_page(self, page: int, limit: int) -> tuple[int, int]:
+        """Number and size of the page after the given one"""
+        offset = page * limit
+        desired = self.desired_limit()
+
+        if offset % desired == 0:
+            self.limit = desired
+
+        return offset // self.limit + 1, self.limit
+
+
+def _page_size(limit: Union[int, PageSizeController]) -> tuple[int, Optional[PageSizeController]]:
+    if isinstance(limit, PageSizeController):
+        return limit.limit, limit
+
+    return limit, None
+
+
+def paginate(
+    request: Callable[..., Any],
+    page: int = 1,
+    limit: Union[int, PageSizeController] = DEFAULT_PAGE_LIMIT,
+    **kwds,
+) -> Iterator[Any]:
+    """Fetch pages one by one, and yield their items. Only one page is kept in memory
+    (or one item, if request function returns streamed pages, see `CloposClientClass.stream`).
+
+    Args:
+        request: Request function of the paginated endpoint (e.g. `client.get_products`)
+        page: Page to start from
+        limit: Page size, or `PageSizeController` to tune it on the fly
+        **kwds: Other arguments of the request function
+    """
+    size, controller = _page_size(limit)
+
+    while True:
+        start = time.perf_counter()
+        resp = request(page=page, limit=size, **kwds)
+        seconds = time.perf_counter() - start
+
+        items = page_items(resp)
+        yield from items
+
+        last = is_last_page(resp, items, page, size)
+        if controller:
+            controller.observe(page, size, len(items), seconds, response_size(resp))
+
+        del resp, items
+        if last:
+            return
+
+        page, size = controller.next_page(page, size) if controller else (page + 1, size)
+
+
+async def apaginate(
+    request: Callable[..., Awaitable[Any]],
+    page: int = 1,
+    limit: Union[int, PageSizeController] = DEFAULT_PAGE_LIMIT,
+    **kwds,
+) -> AsyncIterator[Any]:
+    """Async version of `paginate`"""
+    size, controller = _page_size(limit)
+
+    while True:
+        start = time.perf_counter()
+        resp = await request(page=page, limit=size, **kwds)
+        seconds = time.perf_counter() - start
+
+        items = page_items(resp)
+        if isinstance(items, AsyncStreamedPage):
+            try:
+                async for item in items:
+                    yield item
+            finally:
+                await items.aclose()
+        else:
+            for item in items:
+                yield item
+
+        last = is_last_page(resp, items, page, size)
+        if controller:
+            controller.observe(page, size, len(items), seconds, response_size(resp))
+
+        del resp, items
+        if last:
+            return
+
+        page, size = controller.next_page(page, size) if controller else (page + 1, size)
+
+
+def fetch_all(
+    request: Callable[..., Any],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    page: int = 1,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    **kwds,
+) -> Iterator[Any]:
+    """Fetch the first page, then the rest of them concurrently in a thread pool, and yield
+    their items in page order. At most `concurrency` pages are fetched (and kept in memory)
+    at the same time. If response does not have `total`, pages are fetched one by one.
+
+    Args:
+        request: Request function of the paginated endpoint (e.g. `client.get_products`)
+        concurrency: Maximum number of pages fetched at the same time
+        page: Page to start from
+        limit: Page size
+        **kwds: Other arguments of the request function
+    """
+    resp = request(page=page, limit=limit, **kwds)
+    items = page_items(resp)
+
+    if is_last_page(resp, items, page, limit):
+        yield from items
+        return
+
+    last = last_page(resp, limit)
+    del resp
+
+    yield from items
+    del items
+
+    if not last:
+        yield from paginate(request, page + 1, limit, **kwds)
+        return
+
+    pages = iter(range(page + 1, last + 1))
+    window: deque[Future] = deque()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        try:
+            for next_page in pages:
+                window.append(pool.submit(request, page=next_page, limit=limit, **kwds))
+                if len(window) == concurrency:
+                    break
+
+            while window:
+                items = page_items(window.popleft().result())
+
+                next_page = next(pages, None)
+                if next_page is not None:
+                    window.append(pool.submit(request, page=next_page, limit=limit, **kwds))
+
+                yield from items
+                del items
+        finally:
+            for future in window:
+                future.cancel()
+
+
+async def afetch_all(
+    request: Callable[..., Awaitable[Any]],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    page: int = 1,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    **kwds,
+) -> AsyncIterator[Any]:
+    """Async version of `fetch_all`, which fetches pages in concurrent tasks"""
+    resp = await request(page=page, limit=limit, **kwds)
+    items = page_items(resp)
+
+    if is_last_page(resp, items, page, limit):
+        for item in items:
+            yield item
+        return
+
+    last = last_page(resp, limit)
+    del resp
+
+    for item in items:
+        yield item
+    del items
+
+    if not last:
+        async for item in apaginate(request, page + 1, limit, **kwds):
+            yield item
+        return
+
+    pages = iter(range(page + 1, last + 1))
+    window: deque[asyncio.Future] = deque()
+
+    try:
+        for next_page in pages:
+            window.append(asyncio.ensure_future(request(page=next_page, limit=limit, **kwds)))
+            if len(window) == concurrency:
+                break
+
+        while window:
+            items = page_items(await window.popleft())
+
+            next_page = next(pages, None)
+            if next_page is not None:
+                window.append(asyncio.ensure_future(request(page=next_page, limit=limit, **kwds)))
+
+            for item in items:
+                yield item
+            del items
+    finally:
+        for future in window:
+            future.cancel()
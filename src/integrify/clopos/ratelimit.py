@@ -0,0 +1,233 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Callable, Optional, Union
+
+__all__ = [
+    'RateLimiter',
+    'RateLimit',
+    'WaitStats',
+    'BucketStore',
+    'MemoryBucketStore',
+    'SQLiteBucketStore',
+]
+
+GLOBAL = '*'
+"""Bucket key of the global limit"""
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """Token bucket: `rate` requests per second, with bursts of up to `burst` requests"""
+
+    rate: float
+    """Requests per second"""
+
+    burst: Optional[float] = None
+    """Bucket capacity (`rate`, but at least 1, if not given)"""
+
+    @property
+    def capacity(self) -> float:
+        """Bucket capacity"""
+        return self.burst if self.burst is not None else max(self.rate, 1)
+
+
+@dataclass
+class WaitStats:
+    """Wait time metrics of the rate limiter"""
+
+    requests: int = 0
+    """Number of requests passed through the limiter"""
+
+    delayed: int = 0
+    """Number of requests, which had to wait"""
+
+    total_wait: float = 0
+    """Total wait time in seconds"""
+
+    max_wait: float = 0
+    """Longest wait time in seconds"""
+
+    @property
+    def mean_wait(self) -> float:
+        """Mean wait time per request in seconds"""
+        return self.total_wait / self.requests if self.requests else 0
+
+    def add(self, wait: float) -> None:
+        """Record wait time of a request"""
+        self.requests += 1
+        if wait > 0:
+            self.delayed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+
+class BucketStore(ABC):  # pylint: disable=too-few-public-methods
+    """Storage of token buckets. Reservations must be atomic, so that buckets can be shared
+    between threads (and processes, for persistent stores).
+    """
+
+    @abstractmethod
+    def reserve(self, key: str, limit: RateLimit, now: float) -> float:
+        """Take a token from the bucket, and return how long to wait until it is available.
+        Tokens are reserved in advance (bucket goes below zero), so that waiting callers are
+        served in order.
+        """
+
+    @staticmethod
+    def _take(state: Optional[tuple[float, float]], limit: RateLimit, now: float):
+        """New (tokens, updated) of the bucket after taking a token, and wait time"""
+        tokens, updated = state if state else (limit.capacity, now)
+        tokens = min(limit.capacity, tokens + max(now - updated, 0) * limit.rate) - 1
+        return (tokens, now), (-tokens / limit.rate if tokens < 0 else 0)
+
+
+class MemoryBucketStore(BucketStore):  # pylint: disable=too-few-public-methods
+    """Buckets of the current process (default)"""
+
+    def __init__(self):
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, key: str, limit: RateLimit, now: float) -> float:
+        with self._lock:
+            self._buckets[key], wait = self._take(self._buckets.get(key), limit, now)
+            return wait
+
+
+class SQLiteBucketStore(BucketStore):  # pylint: disable=too-few-public-methods
+    """Buckets shared between processes through a SQLite database"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Path of the database file
+        """
+        self.path = path
+
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                conn.execute(
+                    'CREATE TABLE IF NOT EXISTS clopos_buckets ('
+                    'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+                )
+
+    def reserve(self, key: str, limit: RateLimit, now: float) -> float:
+        with closing(sqlite3.connect(self.path, timeout=30, isolation_level=None)) as conn:
+            conn.execute('BEGIN IMMEDIATE')  # lock the database until commit
+            try:
+                row = conn.execute(
+                    'SELECT tokens, updated FROM clopos_buckets WHERE key = ?',
+                    (key,),
+                ).fetchone()
+
+                state, wait = self._take(row, limit, now)
+                conn.execute(
+                    'INSERT OR REPLACE INTO clopos_buckets VALUES (?, ?, ?)', (key, *state)
+                )
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+
+            conn.execute('COMMIT')
+            return wait
+
+
+class RateLimiter:
+    """Client-side token bucket rate limiter: a global limit for all requests, and optional
+    limits per endpoint (e.g. tighter for `create_receipt`). Requests over the limit wait for
+    their turn: with `time.sleep` in sync client, with `asyncio.sleep` in async client.
+
+    Buckets are shared between threads and coroutines of the process. With `SQLiteBucketStore`,
+    they are shared between processes too (clock is `time.time` for that reason).
+
+    Example:
+    ```python
+    from integrify.clopos import CloposClientClass, RateLimiter
+
+    limiter = RateLimiter(rate=10, endpoints={'create_receipt': 2, 'get_products': 20})
+    client = CloposClientClass(auto_auth=True, rate_limiter=limiter)
+
+    limiter.stats.mean_wait, limiter.endpoint_stats['create_receipt'].max_wait
+    ```
+    """
+
+    def __init__(
+        self,
+        rate: Union[float, RateLimit, None] = None,
+        endpoints: Optional[dict[str, Union[float, RateLimit]]] = None,
+        store: Optional[BucketStore] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        Args:
+            rate: Global limit (requests per second, or `RateLimit`). No global limit if not given
+            endpoints: Limits per endpoint (e.g. `{'create_receipt': 2}`), applied in addition to
+                the global one
+            store: Bucket store (`MemoryBucketStore` by default)
+            clock: Time source, in seconds
+        """
+        self.limit = self._limit(rate) if rate is not None else None
+        self.endpoints = {name: self._limit(limit) for name, limit in (endpoints or {}).items()}
+        self.store = store or MemoryBucketStore()
+        self.clock = clock
+
+        self.stats = WaitStats()
+        """Wait time metrics of all requests"""
+
+        self.endpoint_stats: dict[str, WaitStats] = {}
+        """Wait time metrics per endpoint"""
+
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _limit(limit: Union[float, RateLimit]) -> RateLimit:
+        return limit if isinstance(limit, RateLimit) else RateLimit(limit)
+
+    def reserve(self, route_name: Optional[str]) -> float:
+        """Reserve a request to the endpoint, and return how long to wait before sending it"""
+        now = self.clock()
+        wait = 0.0
+
+        if self.limit:
+            wait = self.store.reserve(GLOBAL, self.limit, now)
+
+        limit = self.endpoints.get(route_name)  # type: ignore[arg-type]
+        if limit:
+            wait = max(wait, self.store.reserve(route_name, limit, now))  # type: ignore[arg-type]
+
+        with self._lock:
+            self.stats.add(wait)
+            self.endpoint_stats.setdefault(route_name or GLOBAL, WaitStats()).add(wait)
+
+        return wait
+
+    def acquire(self, route_name: Optional[str] = None) -> float:
+        """Wait (blocking) until the request to the endpoint can be sent
+
+        Returns:
+            Wait time in seconds
+        """
+        wait = self.reserve(route_name)
+        if wait > 0:
+            time.sleep(wait)
+
+        return wait
+
+    async def aacquire(self, route_name: Optional[str] = None) -> float:
+        """Async version of `acquire`. Reservations in persistent stores wait for their database
+        lock, so they are made in a worker thread, not to block the event loop.
+        """
+        if isinstance(self.store, MemoryBucketStore):
+            wait = self.reserve(route_name)
+        else:
+            wait = await asyncio.to_thread(self.reserve, route_name)
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        return wait
@@ -0,0 +1,244 @@
+import asyncio
+import random
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Iterable, Optional
+
+import httpx
+
+from integrify.clopos.idempotency import payload_cid
+from integrify.logger import LOGGER_FUNCTION
+
+__all__ = ['RetryPolicy', 'RetryStats', 'RETRY_STATUSES']
+
+RETRY_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+"""Status codes of transient errors"""
+
+RETRY_VERBS = frozenset({'GET', 'DELETE'})
+"""Idempotent methods, retried by default"""
+
+CID_ROUTES = frozenset({'create_receipt', 'create_customer'})
+"""Endpoints, which are retried only when `cid` is given (and the client reconciles it)"""
+
+logger = LOGGER_FUNCTION('Clopos')
+
+
+@dataclass
+class RetryStats:
+    """Retry metrics of the policy"""
+
+    calls: int = 0
+    """Number of calls through the policy"""
+
+    retries: int = 0
+    """Number of retried attempts"""
+
+    recovered: int = 0
+    """Number of calls, which succeeded after retries"""
+
+    exhausted: int = 0
+    """Number of calls, which still failed after retries (or deadline)"""
+
+    total_delay: float = 0
+    """Total time slept between attempts, in seconds"""
+
+    max_delay: float = 0
+    """Longest delay between attempts, in seconds"""
+
+    route_retries: Counter = field(default_factory=Counter)
+    """Number of retried attempts per endpoint"""
+
+
+class RetryPolicy:  # pylint: disable=too-many-instance-attributes
+    """Retries of transient failures: connection errors, timeouts, and responses with
+    `statuses` (5xx, 429 by default).
+
+    Only idempotent requests are retried: `GET` and `DELETE` (`verbs`), and `create_receipt` or
+    `create_customer` with `cid` (`cid_routes`) when the client has `IdempotencyRegistry`.
+    Clopos answers a repeated `cid` with `409`, not with the created object, so after an
+    ambiguous failure the registry looks the object up by its `cid` before sending it again.
+    Orders have no declared `cid`, so `create_order` is not retried. Delay between attempts
+    grows exponentially (`backoff * multiplier ** retry`, up to `max_backoff`), with full
+    jitter, unless the server asks for a specific one with `Retry-After`. Attempts are not
+    made after `deadline` seconds since the first one.
+
+    Example:
+    ```python
+    from integrify.clopos import CloposClientClass, RetryPolicy
+
+    client = CloposClientClass(auto_auth=True, retry_policy=RetryPolicy(attempts=4, deadline=30))
+    client.retry_policy.stats.retries
+    ```
+    """
+
+    def __init__(
+        self,
+        attempts: int = 3,
+        backoff: float = 0.5,
+        multiplier: float = 2,
+        max_backoff: float = 30,
+        jitter: bool = True,
+        deadline: Optional[float] = 60,
+        statuses: Iterable[int] = RETRY_STATUSES,
+        verbs: Iterable[str] = RETRY_VERBS,
+        cid_routes: Iterable[str] = CID_ROUTES,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            attempts: Maximum number of attempts (including the first one)
+            backoff: Delay before the first retry, in seconds
+            multiplier: Growth factor of the delay
+            max_backoff: Maximum delay between attempts, in seconds
+            jitter: Randomize delays (between zero and the computed one), so that clients
+                failed at the same time do not retry at the same time
+            deadline: Total time budget of the call in seconds (`None` for no limit)
+            statuses: Status codes, which are retried
+            verbs: Methods, which are retried
+            cid_routes: Endpoints, which are retried only if request has `cid`
+            clock: Time source, in seconds
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.multiplier = multiplier
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.deadline = deadline
+        self.statuses = frozenset(statuses)
+        self.verbs = frozenset(verbs)
+        self.cid_routes = frozenset(cid_routes)
+        self.clock = clock
+
+        self.stats = RetryStats()
+        self._lock = threading.Lock()
+
+    def retryable(self, route_name: Optional[str], verb: str, payload: Callable[[], Any]) -> bool:
+        """Check if requests to the endpoint are idempotent
+
+        Args:
+            route_name: Name of the endpoint
+            verb: Method of the endpoint
+            payload: Returns data of the request (called only for `cid_routes`)
+        """
+        if verb in self.verbs:
+            return True
+
+        if route_name not in self.cid_routes:
+            return False
+
+        return bool(payload_cid(payload()))
+
+    def transient(self, result: Any = None, error: Optional[BaseException] = None) -> bool:
+        """Check if the failure (response, or raised error) is worth retrying"""
+        if error is not None:
+            return isinstance(error, httpx.TransportError)
+
+        return getattr(result, 'status_code', None) in self.statuses
+
+    def delay(self, retry: int, result: Any = None) -> float:
+        """Delay before the retry (`retry` starts from `0`), in seconds"""
+        retry_after = self.retry_after(result)
+        if retry_after is not None:
+            return retry_after
+
+        delay = min(self.max_backoff, self.backoff * self.multiplier**retry)
+        return random.uniform(0, delay) if self.jitter else delay
+
+    @staticmethod
+    def retry_after(result: Any) -> Optional[float]:
+        """Delay asked by the server with `Retry-After` header (seconds, or HTTP date)"""
+        headers = getattr(result, 'headers', None) or {}
+        value = headers.get('retry-after') or headers.get('Retry-After')
+        if not value:
+            return None
+
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0)
+        except (TypeError, ValueError):
+            return None
+
+    def _next_delay(self, route_name, retry, started, result, error) -> Optional[float]:
+        """Delay before the next attempt, or `None` if the call should not be retried"""
+        if retry + 1 >= self.attempts or not self.transient(result, error):
+            return None
+
+        delay = self.delay(retry, result)
+        if self.deadline is not None and self.clock() + delay - started > self.deadline:
+            return None
+
+        with self._lock:
+            self.stats.retries += 1
+            self.stats.total_delay += delay
+            self.stats.max_delay = max(self.stats.max_delay, delay)
+            self.stats.route_retries[route_name] += 1
+
+        logger.warning(
+            'Retrying %s in %.2fs (attempt %d): %s',
+            route_name,
+            delay,
+            retry + 2,
+            error or getattr(result, 'status_code', None),
+        )
+        return delay
+
+    def _finish(self, retry: int, failed: bool) -> None:
+        with self._lock:
+            self.stats.calls += 1
+            if retry and failed:
+                self.stats.exhausted += 1
+            elif retry:
+                self.stats.recovered += 1
+
+    def call(self, route_name: Optional[str], attempt: Callable[[], Any]) -> Any:
+        """Call `attempt` until it succeeds, its failure is not transient, or retries are over"""
+        started = self.clock()
+        retry = 0
+
+        while True:
+            result, error = None, None
+            try:
+                result = attempt()
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                error = exc
+
+            delay = self._next_delay(route_name, retry, started, result, error)
+            if delay is None:
+                self._finish(retry, error is not None or self.transient(result))
+                if error is not None:
+                    raise error
+
+                return result
+
+            time.sleep(delay)
+            retry += 1
+
+    async def acall(self, route_name: Optional[str], attempt: Callable[[], Any]) -> Any:
+        """Async version of `call`"""
+        started = self.clock()
+        retry = 0
+
+        while True:
+            result, error = None, None
+            try:
+                result = await attempt()
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                error = exc
+
+            delay = self._next_delay(route_name, retry, started, result, error)
+            if delay is None:
+                self._finish(retry, error is not None or self.transient(result))
+                if error is not None:
+                    raise error
+
+                return result
+
+            await asyncio.sleep(delay)
+            retry += 1
@@ -7,7 +7,7 @@ from integrify.clopos.helpers import IsoDate
 from integrify.clopos.schemas.common.request import PaginatedDataRequest
 from integrify.clopos.schemas.enums import Gender
 from integrify.schemas import PayloadBaseModel
-from integrify.utils import UnsetField, UnsetOrNoneField
+from integrify.utils import UNSET, UnsetField, UnsetOrNoneField
 
 
 class CustomerFilter(TypedDict):
@@ -22,7 +22,11 @@ class GetCustomersRequest(PaginatedDataRequest):
     @model_serializer()
     def serialize_model(self) -> dict:
         """Model serializer"""
-        data = {}
+        data = {
+            key: value
+            for key, value in (('page', self.page), ('limit', self.limit))
+            if value is not UNSET
+        }
 
         for i, with_item in enumerate(self.with_ or []):
             data[f'with[{i}]'] = with_item
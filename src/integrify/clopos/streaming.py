@@ -0,0 +1,259 @@
+import json
+import re
+from typing import Any, AsyncIterator, Callable, Iterator, Optional, get_args
+
+import httpx
+from pydantic import BaseModel
+
+from integrify.api import APIPayloadHandler
+from integrify.clopos.exceptions import CloposResponseError
+from integrify.clopos.schemas.common.response import PaginatedResponse
+from integrify.clopos.validation import ValidationMode
+
+__all__ = ['DataStreamParser', 'StreamedPage', 'AsyncStreamedPage', 'item_model']
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+# Parser states
+_START, _KEY, _COLON, _VALUE, _AFTER_VALUE, _ITEM, _AFTER_ITEM, _END = range(8)
+
+
+class DataStreamParser:
+    """Incremental parser of a JSON object, which is fed by text chunks. Items of its `data` array
+    are decoded and returned one by one, as soon as they are fully received. Other keys (e.g.
+    `success`, `total`) are collected in `meta`.
+
+    Only the current (incomplete) item and the last chunk are kept in memory.
+    """  # noqa: E501
+
+    def __init__(self, key: str = 'data'):
+        """
+        Args:
+            key: Top-level key of the array to stream
+        """
+        self.key = key
+
+        self.meta: dict[str, Any] = {}
+        """Top-level keys other than the streamed array"""
+
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._pos = 0
+        self._state = _START
+        self._current_key = ''
+
+    def feed(self, text: str) -> list[Any]:
+        """Parse next chunk of the document, and return items, completed with it"""
+        self._buffer = self._buffer[self._pos :] + text
+        self._pos = 0
+
+        items: list[Any] = []
+        while self._step(items):
+            pass
+
+        return items
+
+    def close(self) -> dict[str, Any]:
+        """Check that the document is complete, and return `meta`"""
+        self._skip_whitespace()
+
+        if self._state != _END or self._pos != len(self._buffer):
+            raise ValueError('Incomplete or invalid JSON document')
+
+        return self.meta
+
+    def _skip_whitespace(self) -> None:
+        self._pos = _WHITESPACE.match(self._buffer, self._pos).end()  # type: ignore[union-attr]
+
+    def _decode(self) -> tuple[bool, Any]:
+        """Decode a value at the current position. As a number at the end of the buffer might be
+        incomplete, value is decoded only if some character follows it.
+        """  # noqa: E501
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            return False, None
+
+        if end >= len(self._buffer):
+            return False, None
+
+        self._pos = end
+        return True, value
+
+    def _expect(self, char: str) -> bool:
+        if self._buffer[self._pos] != char:
+            raise ValueError(f'Expected {char!r} at {self._pos}, got {self._buffer[self._pos]!r}')
+
+        self._pos += 1
+        return True
+
+    # pylint: disable-next=too-many-return-statements,too-many-branches
+    def _step(self, items: list) -> bool:
+        """Parse the next token. Returns `False` if more data is needed."""
+        self._skip_whitespace()
+        if self._pos >= len(self._buffer):
+            return False
+
+        char = self._buffer[self._pos]
+        state = self._state
+
+        if state == _START:
+            self._state = _KEY
+            return self._expect('{')
+
+        if state == _KEY:
+            if char == '}' and not self.meta:
+                self._state = _END
+                return self._expect('}')
+
+            ok, self._current_key = self._decode()
+            if not ok:
+                return False
+
+            self._state = _COLON
+            return True
+
+        if state == _COLON:
+            self._state = _VALUE
+            return self._expect(':')
+
+        if state == _VALUE:
+            if self._current_key == self.key and char == '[':
+                self._state = _ITEM
+                return self._expect('[')
+
+            ok, value = self._decode()
+            if not ok:
+                return False
+
+            self.meta[self._current_key] = value
+            self._state = _AFTER_VALUE
+            return True
+
+        if state == _AFTER_VALUE:
+            if char == ',':
+                self._state = _KEY
+                return self._expect(',')
+
+            self._state = _END
+            return self._expect('}')
+
+        if state == _ITEM:
+            if char == ']':
+                self._state = _AFTER_VALUE
+                return self._expect(']')
+
+            ok, value = self._decode()
+            if not ok:
+                return False
+
+            items.append(value)
+            self._state = _AFTER_ITEM
+            return True
+
+        if state == _AFTER_ITEM:
+            if char == ',':
+                self._state = _ITEM
+                return self._expect(',')
+
+            self._state = _AFTER_VALUE
+            return self._expect(']')
+
+        raise ValueError(f'Unexpected data after the end of JSON document at {self._pos}')
+
+
+def item_model(handler: APIPayloadHandler) -> type[BaseModel]:
+    """Object type of the list endpoint handler (e.g. `Product` for `ObjectListResponse[Product]`)"""  # noqa: E501
+    resp_model = get_args(get_args(handler.resp_model)[0])[0]
+    return get_args(resp_model.model_fields['data'].annotation)[0]
+
+
+class _BaseStreamedPage:  # pylint: disable=too-many-instance-attributes,too-few-public-methods
+    def __init__(
+        self,
+        response: httpx.Response,
+        model: type[BaseModel],
+        validation: ValidationMode = 'full',
+    ):
+        self.response = response
+        """Streamed httpx response"""
+
+        self.model = model
+        """Model of the items"""
+
+        self._convert: Callable[[Any], Any] = {
+            'full': model.model_validate,
+            'raw': lambda item: item,
+        }[validation]
+
+        self.status_code = response.status_code
+        self.headers = dict(response.headers)
+
+        self.body: Optional[PaginatedResponse] = None
+        """Response without `data`. Available after all items are consumed"""
+
+        self.count = 0
+        """Number of items consumed so far"""
+
+        self._parser = DataStreamParser()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _parse(self, chunk: str) -> Iterator[BaseModel]:
+        try:
+            items = self._parser.feed(chunk)
+        except ValueError as e:
+            raise CloposResponseError('Could not parse streamed page', self) from e
+
+        for item in items:
+            self.count += 1
+            yield self._convert(item)
+
+    def _finish(self) -> None:
+        try:
+            meta = self._parser.close()
+        except ValueError as e:
+            raise CloposResponseError('Could not parse streamed page', self) from e
+
+        if meta.get('success') is not True:
+            raise CloposResponseError('Could not fetch page', self)
+
+        self.body = PaginatedResponse.model_validate(meta)
+
+
+class StreamedPage(_BaseStreamedPage):
+    """Page of a list endpoint, whose items are parsed and validated one by one while the
+    response body is being received. Can be iterated only once; response is closed afterwards.
+    """
+
+    def __iter__(self) -> Iterator[BaseModel]:
+        try:
+            for chunk in self.response.iter_text():
+                yield from self._parse(chunk)
+
+            self._finish()
+        finally:
+            self.response.close()
+
+    def close(self) -> None:
+        """Close the response without consuming the rest of it"""
+        self.response.close()
+
+
+class AsyncStreamedPage(_BaseStreamedPage):
+    """Async version of `StreamedPage`"""
+
+    async def __aiter__(self) -> AsyncIterator[BaseModel]:
+        try:
+            async for chunk in self.response.aiter_text():
+                for item in self._parse(chunk):
+                    yield item
+
+            self._finish()
+        finally:
+            await self.response.aclose()
+
+    async def aclose(self) -> None:
+        """Close the response without consuming the rest of it"""
+        await self.response.aclose()
@@ -0,0 +1,689 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import closing, contextmanager
+from dataclasses import asdict, dataclass
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Optional
+
+from integrify.clopos import env
+from integrify.clopos.exceptions import CloposAuthError
+from integrify.clopos.schemas.auth.response import AuthResponse
+from integrify.logger import LOGGER_FUNCTION
+from integrify.utils import UNSET, Unset
+
+try:
+    import fcntl
+except ModuleNotFoundError:  # Windows
+    fcntl = None  # type: ignore[assignment]  # pylint: disable=invalid-name
+
+if TYPE_CHECKING:
+    from integrify.clopos.client import CloposClientClass
+
+__all__ = [
+    'TokenManager',
+    'TokenStats',
+    'CachedToken',
+    'TokenStore',
+    'MemoryTokenStore',
+    'FileTokenStore',
+    'SQLiteTokenStore',
+]
+
+TokenKey = tuple[str, str, str]
+"""Token scope: (client_id, brand, venue_id)"""
+
+EXPIRY_LEEWAY = 5
+"""Seconds before actual expiry when token is not considered usable anymore (clock skew)"""
+
+STORE_LOCK_POLL_INTERVAL = 0.05
+"""Seconds between attempts of async clients to take the lock of shared token store"""
+
+
+@dataclass
+class TokenStats:
+    refreshes: int = 0
+    """Number of successful `auth` calls"""
+
+    background_refreshes: int = 0
+    """Number of refreshes done ahead of expiry, without blocking any request"""
+
+    cache_hits: int = 0
+    """Number of requests served with already cached token"""
+
+    waits: int = 0
+    """Number of requests that had to wait for `auth` call to finish"""
+
+    store_hits: int = 0
+    """Number of tokens reused from the shared token store, instead of calling `auth`"""
+
+    rejections: int = 0
+    """Number of requests retried because token was rejected (401) by Clopos"""
+
+
+@dataclass
+class CachedToken:
+    token: str
+    """Token itself"""
+
+    expires_at: float
+    """Unix timestamp of token expiry"""
+
+    refresh_at: float
+    """Unix timestamp after which token should be refreshed"""
+
+
+class TokenStore(ABC):
+    """Base class for token stores, which share tokens between token managers.
+
+    Stores are keyed by token scope (`client_id:brand:venue_id`). `acquire` and `release` guard
+    refreshes, so that only one of the sharing managers calls `auth` for the scope.
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[CachedToken]:
+        """Stored token of the scope (if any)"""
+
+    @abstractmethod
+    def set(self, key: str, token: CachedToken) -> None:
+        """Store token of the scope"""
+
+    @abstractmethod
+    def delete(self, key: str, token: Optional[str] = None) -> None:
+        """Delete stored token of the scope (only if it is `token`, when given)"""
+
+    def acquire(self, key: str, blocking: bool = True) -> bool:  # pylint: disable=unused-argument
+        """Take refresh lock of the scope. Returns `False` if not `blocking` and lock is taken"""
+        return True
+
+    def release(self, key: str) -> None:
+        """Release refresh lock of the scope"""
+
+
+class MemoryTokenStore(TokenStore):
+    """Token store to share tokens between clients of the same process"""
+
+    def __init__(self):
+        self._tokens: dict[str, CachedToken] = {}
+        self._lock = threading.Lock()
+        self._locks: dict[str, threading.Lock] = {}
+
+    def get(self, key: str) -> Optional[CachedToken]:
+        return self._tokens.get(key)
+
+    def set(self, key: str, token: CachedToken) -> None:
+        self._tokens[key] = token
+
+    def delete(self, key: str, token: Optional[str] = None) -> None:
+        with self._lock:
+            cached = self._tokens.get(key)
+            if cached is not None and token in (None, cached.token):
+                del self._tokens[key]
+
+    def acquire(self, key: str, blocking: bool = True) -> bool:
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+
+        return lock.acquire(blocking)
+
+    def release(self, key: str) -> None:
+        self._locks[key].release()
+
+
+class _LockFileTokenStore(TokenStore):
+    """Token store, which guards refreshes with `fcntl` lock on `<path>.lock` file.
+
+    Without `fcntl` (e.g. Windows) refreshes are guarded only inside the process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock_path = f'{path}.lock'
+        self._held: dict[str, int] = {}
+        self._local = MemoryTokenStore()
+
+    def acquire(self, key: str, blocking: bool = True) -> bool:
+        if not self._local.acquire(key, blocking):
+            return False
+
+        if fcntl is None:
+            return True
+
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            os.close(fd)
+            self._local.release(key)
+            return False
+
+        self._held[key] = fd
+        return True
+
+    def release(self, key: str) -> None:
+        fd = self._held.pop(key, None)
+        if fd is not None:
+            os.close(fd)  # closing the file releases the lock
+
+        self._local.release(key)
+
+
+class FileTokenStore(_LockFileTokenStore):
+    """Token store, which shares tokens between processes through a JSON file.
+
+    Reads and writes are guarded with `fcntl` locks (where available). Example:
+
+    ```python
+    from integrify.clopos import CloposClientClass, TokenManager
+    from integrify.clopos.tokens import FileTokenStore
+
+    # Every worker reuses token acquired by any of them, until it expires
+    manager = TokenManager(store=FileTokenStore('/tmp/clopos-tokens.json'))
+    client = CloposClientClass(token_manager=manager)
+    ```
+    """
+
+    def get(self, key: str) -> Optional[CachedToken]:
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                if fcntl is not None:
+                    fcntl.flock(file, fcntl.LOCK_SH)
+
+                content = file.read()
+        except FileNotFoundError:
+            return None
+
+        entry = json.loads(content or '{}').get(key)
+        return CachedToken(**entry) if entry else None
+
+    def set(self, key: str, token: CachedToken) -> None:
+        self._update(lambda data: data.__setitem__(key, asdict(token)))
+
+    def delete(self, key: str, token: Optional[str] = None) -> None:
+        def change(data: dict):
+            if key in data and token in (None, data[key]['token']):
+                del data[key]
+
+        self._update(change)
+
+    def _update(self, change: Callable[[dict], Any]) -> None:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+
+        with open(fd, 'r+', encoding='utf-8') as file:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_EX)
+
+            now = time.time()
+            data = {
+                k: v for k, v in json.loads(file.read() or '{}').items() if v['expires_at'] > now
+            }
+            change(data)
+
+            file.seek(0)
+            file.truncate()
+            json.dump(data, file)
+
+
+class SQLiteTokenStore(_LockFileTokenStore):
+    """Token store, which shares tokens between processes through a SQLite database"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS clopos_tokens ('
+                'key TEXT PRIMARY KEY, token TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, refresh_at REAL NOT NULL)'
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        with closing(sqlite3.connect(self.path, timeout=30)) as conn:
+            with conn:
+                yield conn
+
+    def get(self, key: str) -> Optional[CachedToken]:
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT token, expires_at, refresh_at FROM clopos_tokens WHERE key = ?',
+                (key,),
+            ).fetchone()
+
+        return CachedToken(*row) if row else None
+
+    def set(self, key: str, token: CachedToken) -> None:
+        with self._connect() as conn:
+            conn.execute('DELETE FROM clopos_tokens WHERE expires_at <= ?', (time.time(),))
+            conn.execute(
+                'INSERT OR REPLACE INTO clopos_tokens VALUES (?, ?, ?, ?)',
+                (key, token.token, token.expires_at, token.refresh_at),
+            )
+
+    def delete(self, key: str, token: Optional[str] = None) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                'DELETE FROM clopos_tokens WHERE key = ? AND (? IS NULL OR token = ?)',
+                (key, token, token),
+            )
+
+
+class TokenManager:  # pylint: disable=too-many-instance-attributes
+    """Token lifecycle manager for Clopos clients.
+
+    Calls `auth` once per scope (client_id, brand, venue_id), caches the token and refreshes it
+    `refresh_margin` seconds before it expires. With `background_refresh` enabled, refresh is
+    done by a timer (sync client) or a task (async client), so requests never wait on `auth`
+    in steady state.
+
+    Refresh is single-flight: per scope, only one `auth` request is in flight at a time (per
+    thread lock for sync client, shared future for async client), and all other callers wait for
+    its result. With async client, the future is shared within an event loop, and background
+    refresh scheduled in another loop (e.g. of previous `asyncio.run`) is moved to the current
+    one.
+
+    With a shared `store`, tokens are reused by all managers (e.g. in other worker processes)
+    using the same store, so that only one of them calls `auth` per scope. With async client,
+    the store is read and written in worker threads, so that waiting for its locks does not
+    block the event loop.
+
+    Example:
+    ```python
+    from integrify.clopos import CloposClientClass, TokenManager
+
+    client = CloposClientClass(token_manager=TokenManager(refresh_margin=120))
+    client.get_products()  # `x-token` header is injected automatically
+    ```
+    """
+
+    def __init__(
+        self,
+        client_id: Unset[str] = UNSET,
+        client_secret: Unset[str] = UNSET,
+        brand: Unset[str] = UNSET,
+        venue_id: Unset[str] = UNSET,
+        refresh_margin: float = 60,
+        background_refresh: bool = True,
+        store: Optional[TokenStore] = None,
+    ):
+        """
+        Args:
+            client_id: Client ID provided by Clopos. Defaults to `CLOPOS_CLIENT_ID`
+            client_secret: Client secret provided by Clopos. Defaults to `CLOPOS_CLIENT_SECRET`
+            brand: Default brand to authenticate. Defaults to `CLOPOS_BRAND`
+            venue_id: Default venue ID to authenticate. Defaults to `CLOPOS_VENUE_ID`
+            refresh_margin: How many seconds before expiry token should be refreshed
+            background_refresh: Refresh tokens ahead of time, without blocking requests
+            store: Token store to share tokens with other managers/processes
+        """
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.brand = brand
+        self.venue_id = venue_id
+        self.refresh_margin = refresh_margin
+        self.background_refresh = background_refresh
+        self.store = store
+
+        self.stats = TokenStats()
+        """Token usage counters"""
+
+        self._client: Optional['CloposClientClass'] = None
+        self._tokens: dict[TokenKey, CachedToken] = {}
+        self._lock = threading.Lock()
+        self._locks: dict[TokenKey, threading.Lock] = {}
+        self._inflight: dict[TokenKey, asyncio.Future] = {}
+        self._timers: dict[TokenKey, Any] = {}
+        self._timer_loops: dict[TokenKey, asyncio.AbstractEventLoop] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def bind(self, client: 'CloposClientClass') -> None:
+        """Attach manager to the client which will be used for `auth` calls"""
+        self._client = client
+
+    @property
+    def client(self) -> 'CloposClientClass':
+        """Client, which `auth` is called with"""
+        if self._client is None:
+            raise RuntimeError('TokenManager is not bound to any client')
+
+        return self._client
+
+    def key(self, brand: Optional[str] = None, venue_id: Optional[str] = None) -> TokenKey:
+        """Token scope for given brand and venue (falls back to defaults and env variables)"""
+        return (
+            self.client_id or env.CLOPOS_CLIENT_ID,
+            brand or self.brand or env.CLOPOS_BRAND,
+            str(venue_id or self.venue_id or env.CLOPOS_VENUE_ID),
+        )
+
+    def _auth_kwargs(self, key: TokenKey) -> dict:
+        client_id, brand, venue_id = key
+        return {
+            'client_id': client_id or UNSET,
+            'client_secret': self.client_secret,
+            'brand': brand or UNSET,
+            'venue_id': venue_id or UNSET,
+        }
+
+    def _usable(self, cached: Optional[CachedToken]) -> bool:
+        if cached is None:
+            return False
+
+        deadline = cached.expires_at - EXPIRY_LEEWAY
+        if not self.background_refresh:
+            deadline = min(deadline, cached.refresh_at)
+
+        return time.time() < deadline
+
+    def cached(self, brand: Optional[str] = None, venue_id: Optional[str] = None) -> Optional[str]:
+        """Currently cached token for the scope, if it is still usable"""
+        cached = self._tokens.get(self.key(brand, venue_id))
+        return cached.token if self._usable(cached) else None
+
+    def invalidate(
+        self,
+        brand: Optional[str] = None,
+        venue_id: Optional[str] = None,
+        token: Optional[str] = None,
+    ) -> None:
+        """Drop cached token of the scope, so that next request re-authenticates
+
+        Args:
+            brand: Brand of the token scope
+            venue_id: Venue ID of the token scope
+            token: Drop only if this is the cached token. Used when token is rejected, so that
+                concurrent callers which got the same rejection do not drop the fresh token.
+        """
+        key = self.key(brand, venue_id)
+        cached = self._drop(key, token)
+
+        if cached is not None and self.store is not None:
+            self.store.delete(self._store_key(key), cached.token)
+
+    async def ainvalidate(
+        self,
+        brand: Optional[str] = None,
+        venue_id: Optional[str] = None,
+        token: Optional[str] = None,
+    ) -> None:
+        """Async version of `invalidate`: token is deleted from the store in a worker thread"""
+        key = self.key(brand, venue_id)
+        cached = self._drop(key, token)
+
+        if cached is not None and self.store is not None:
+            await asyncio.to_thread(self.store.delete, self._store_key(key), cached.token)
+
+    def _drop(self, key: TokenKey, token: Optional[str] = None) -> Optional[CachedToken]:
+        """Drop cached token of the scope (only if it is `token`, when given), and return it"""
+        cached = self._tokens.get(key)
+        if cached is None or (token is not None and cached.token != token):
+            return None
+
+        self._tokens.pop(key, None)
+        self._cancel_timer(key)
+        return cached
+
+    def reject(self, headers: dict) -> None:
+        """Invalidate token of the request which was rejected by Clopos"""
+        self.stats.rejections += 1
+        self.invalidate(headers.get('x-brand'), headers.get('x-venue'), headers.get('x-token'))
+
+    async def areject(self, headers: dict) -> None:
+        """Async version of `reject`"""
+        self.stats.rejections += 1
+        await self.ainvalidate(
+            headers.get('x-brand'),
+            headers.get('x-venue'),
+            headers.get('x-token'),
+        )
+
+    def close(self) -> None:
+        """Cancel all scheduled background refreshes"""
+        for key in list(self._timers):
+            self._cancel_timer(key)
+
+        for task in list(self._tasks):
+            task.cancel()
+
+    # Sync #########################################################################################
+
+    def get_token(self, brand: Optional[str] = None, venue_id: Optional[str] = None) -> str:
+        """Get usable token for the scope, calling `auth` only if needed"""
+        key = self.key(brand, venue_id)
+
+        cached = self._tokens.get(key)
+        if self._usable(cached):
+            self.stats.cache_hits += 1
+            return cached.token  # type: ignore[union-attr]
+
+        with self._key_lock(key):
+            # Another thread might have refreshed it, while we were waiting for the lock
+            cached = self._tokens.get(key)
+            if self._usable(cached):
+                self.stats.cache_hits += 1
+                return cached.token  # type: ignore[union-attr]
+
+            cached = self._from_store(key)
+            if cached is not None:
+                return cached.token
+
+            self.stats.waits += 1
+            return self._refresh(key).token
+
+    def _key_lock(self, key: TokenKey) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _refresh(self, key: TokenKey) -> CachedToken:
+        with self._store_lock(key):
+            # Token might have been refreshed by another manager sharing the store
+            cached = self._from_store(key, fresh=True)
+            if cached is not None:
+                return cached
+
+            resp = self.client.auth(**self._auth_kwargs(key))
+            return self._save(key, self._parse(resp))
+
+    @contextmanager
+    def _store_lock(self, key: TokenKey) -> Iterator[None]:
+        if self.store is None:
+            yield
+            return
+
+        self.store.acquire(self._store_key(key))
+        try:
+            yield
+        finally:
+            self.store.release(self._store_key(key))
+
+    def _background_refresh(self, key: TokenKey) -> None:
+        try:
+            with self._key_lock(key):
+                self._refresh(key)
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Token is still valid, request itself will refresh it after expiry
+            self._logger.exception('Background token refresh failed')
+        else:
+            self.stats.background_refreshes += 1
+
+    # Async ########################################################################################
+
+    async def aget_token(self, brand: Optional[str] = None, venue_id: Optional[str] = None) -> str:
+        """Async version of `get_token`"""
+        key = self.key(brand, venue_id)
+
+        cached = self._tokens.get(key)
+        if self._usable(cached):
+            self.stats.cache_hits += 1
+
+            loop = asyncio.get_running_loop()
+            if self._timer_loops.get(key, loop) is not loop:
+                # background refresh was scheduled in another (e.g. closed) event loop
+                self._schedule(key, cached)  # type: ignore[arg-type]
+
+            return cached.token  # type: ignore[union-attr]
+
+        cached = await self._afrom_store(key)
+        if cached is not None:
+            return cached.token
+
+        self.stats.waits += 1
+        return (await self._arefresh_shared(key)).token
+
+    async def _arefresh_shared(self, key: TokenKey) -> CachedToken:
+        """Join in-flight `auth` request of the scope, or start a new one. Requests in flight
+        in other event loops (e.g. a closed one of previous `asyncio.run`) are not joined.
+        """
+        future = self._inflight.get(key)
+
+        if future is None or future.get_loop() is not asyncio.get_running_loop():
+            future = asyncio.ensure_future(self._arefresh(key))
+            self._inflight[key] = future
+            future.add_done_callback(partial(self._forget_inflight, key))
+
+        # Cancellation of one waiter should not cancel `auth` request for others
+        return await asyncio.shield(future)
+
+    def _forget_inflight(self, key: TokenKey, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    async def _arefresh(self, key: TokenKey) -> CachedToken:
+        if self.store is None:
+            resp = await self.client.auth(**self._auth_kwargs(key))
+            return self._remember(key, self._parse(resp))
+
+        # Do not block event loop, while another process is refreshing the token: the lock is
+        # polled without blocking, and the store is read and written in worker threads
+        store_key = self._store_key(key)
+        while not self.store.acquire(store_key, blocking=False):
+            await asyncio.sleep(STORE_LOCK_POLL_INTERVAL)
+
+        try:
+            cached = await self._afrom_store(key, fresh=True)
+            if cached is not None:
+                return cached
+
+            resp = await self.client.auth(**self._auth_kwargs(key))
+            cached = self._remember(key, self._parse(resp))
+            await asyncio.to_thread(self.store.set, store_key, cached)
+            return cached
+        finally:
+            self.store.release(store_key)
+
+    async def _abackground_refresh(self, key: TokenKey) -> None:
+        try:
+            await self._arefresh_shared(key)
+        except Exception:  # pylint: disable=broad-exception-caught
+            self._logger.exception('Background token refresh failed')
+        else:
+            self.stats.background_refreshes += 1
+
+    def _spawn_background_refresh(self, key: TokenKey) -> None:
+        task = asyncio.get_running_loop().create_task(self._abackground_refresh(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # Common #######################################################################################
+
+    @property
+    def _logger(self):
+        return LOGGER_FUNCTION('Clopos')
+
+    @staticmethod
+    def _store_key(key: TokenKey) -> str:
+        return ':'.join(key)
+
+    def _from_store(self, key: TokenKey, fresh: bool = False) -> Optional[CachedToken]:
+        """Adopt token from the shared store, if it is usable (or not due to refresh, if `fresh`)"""
+        if self.store is None:
+            return None
+
+        return self._adopt(key, self.store.get(self._store_key(key)), fresh)
+
+    async def _afrom_store(self, key: TokenKey, fresh: bool = False) -> Optional[CachedToken]:
+        """Async version of `_from_store`: the store is read in a worker thread"""
+        if self.store is None:
+            return None
+
+        cached = await asyncio.to_thread(self.store.get, self._store_key(key))
+        return self._adopt(key, cached, fresh)
+
+    def _adopt(
+        self,
+        key: TokenKey,
+        cached: Optional[CachedToken],
+        fresh: bool = False,
+    ) -> Optional[CachedToken]:
+        if cached is None or cached.token == getattr(self._tokens.get(key), 'token', None):
+            return None
+
+        if not (time.time() < cached.refresh_at if fresh else self._usable(cached)):
+            return None
+
+        self._tokens[key] = cached
+        self.stats.store_hits += 1
+        self._schedule(key, cached)
+
+        return cached
+
+    def _parse(self, resp) -> AuthResponse:
+        body = getattr(resp, 'body', None)
+        if not isinstance(body, AuthResponse):
+            raise CloposAuthError('Could not authenticate with given credentials', resp)
+
+        return body
+
+    def _save(self, key: TokenKey, body: AuthResponse) -> CachedToken:
+        cached = self._remember(key, body)
+
+        if self.store is not None:
+            self.store.set(self._store_key(key), cached)
+
+        return cached
+
+    def _remember(self, key: TokenKey, body: AuthResponse) -> CachedToken:
+        """Cache the token in memory, and schedule its refresh"""
+        now = time.time()
+        margin = self.refresh_margin
+        if margin >= body.expires_in:
+            margin = body.expires_in / 2
+        cached = CachedToken(
+            token=body.token,
+            expires_at=now + body.expires_in,
+            refresh_at=now + body.expires_in - margin,
+        )
+
+        self._tokens[key] = cached
+        self.stats.refreshes += 1
+        self._schedule(key, cached)
+
+        return cached
+
+    def _schedule(self, key: TokenKey, cached: CachedToken) -> None:
+        if not self.background_refresh:
+            return
+
+        self._cancel_timer(key)
+        delay = max(cached.refresh_at - time.time(), 0)
+
+        if self.client.request_executor.sync:
+            timer = threading.Timer(delay, self._background_refresh, args=(key,))
+            timer.daemon = True
+            timer.start()
+        else:
+            loop = asyncio.get_running_loop()
+            timer = loop.call_later(delay, self._spawn_background_refresh, key)
+            self._timer_loops[key] = loop
+
+        self._timers[key] = timer
+
+    def _cancel_timer(self, key: TokenKey) -> None:
+        self._timer_loops.pop(key, None)
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Literal, Optional, get_args
+
+__all__ = ['ValidationMode', 'validation', 'current_validation']
+
+ValidationMode = Literal['full', 'raw']
+"""How successful responses are turned into models:
+
+- `full`: validated by pydantic (default)
+- `raw`: decoded JSON (dicts and lists) is returned as is
+"""
+
+_validation: ContextVar[Optional[ValidationMode]] = ContextVar('clopos_validation', default=None)
+
+
+def current_validation() -> ValidationMode:
+    """Validation mode of the current call (`full` if it is not set)"""
+    return _validation.get() or 'full'
+
+
+@contextmanager
+def validation(mode: Optional[ValidationMode]) -> Iterator[None]:
+    """Set validation mode of the responses handled inside the block (in current thread/task).
+    `None` keeps the current mode.
+    """
+    if mode is None:
+        yield
+        return
+
+    if mode not in get_args(ValidationMode):
+        raise ValueError(f'Unknown validation mode: {mode}')
+
+    token = _validation.set(mode)
+    try:
+        yield
+    finally:
+        _validation.reset(token)
@@ -0,0 +1,557 @@
+import asyncio
+import itertools
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Literal, Optional
+
+from integrify.clopos.exceptions import CloposResponseError
+from integrify.clopos.schemas.enums import OrderStatus
+from integrify.logger import LOGGER_FUNCTION
+from integrify.utils import UNSET, Unset
+
+if TYPE_CHECKING:
+    from integrify.clopos.client import CloposClientClass
+
+__all__ = [
+    'StopListWatcher',
+    'StopListEvent',
+    'OrderWatcher',
+    'OrderEvent',
+    'DEFAULT_ORDER_INTERVALS',
+]
+
+DEFAULT_ORDER_INTERVALS: dict[str, float] = {
+    OrderStatus.NEW.value: 5,
+    OrderStatus.RECEIVED.value: 5,
+    OrderStatus.CONFIRMED.value: 10,
+    OrderStatus.PENDING.value: 10,
+    OrderStatus.IN_PROGRESS.value: 15,
+    OrderStatus.READY.value: 5,
+    OrderStatus.PICKED_UP.value: 10,
+    OrderStatus.SCHEDULED.value: 60,
+}
+"""Initial polling intervals (in seconds) of the orders per status"""
+
+FINAL_ORDER_STATUSES = frozenset(
+    {OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value, OrderStatus.IGNORE.value},
+)
+"""Statuses, after which orders are not tracked anymore"""
+
+ORDERS_PAGE_LIMIT = 100
+
+
+@dataclass
+class StopListEvent:
+    """Change of a product in the stop list"""
+
+    product_id: int
+    """Product ID"""
+
+    limit: Optional[int]
+    """New stock limit (`None` if product was removed from the stop list)"""
+
+    previous: Optional[int]
+    """Previous stock limit (`None` if product was not in the stop list)"""
+
+    timestamp: Optional[int]
+    """Timestamp of the change (`None` for removals)"""
+
+    @property
+    def kind(self) -> Literal['added', 'changed', 'removed']:
+        """Kind of the change"""
+        if self.previous is None:
+            return 'added'
+
+        return 'removed' if self.limit is None else 'changed'
+
+
+class _Watcher(ABC):
+    """Base of the watchers: polling loops (sync, in a background thread, and async iteration)
+    around `poll`/`apoll`, which return new events
+    """
+
+    name = 'Watcher'
+
+    def __init__(
+        self,
+        client: 'CloposClientClass',
+        callback: Optional[Callable[[Any], Any]],
+        interval: float,
+    ):
+        self.client = client
+        self.callback = callback
+        self.interval = interval
+
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @abstractmethod
+    def poll(self) -> list:
+        """Poll once, and return new events (they are also passed to `callback`)"""
+
+    @abstractmethod
+    async def apoll(self) -> list:
+        """Async version of `poll`"""
+
+    def run(self) -> None:
+        """Poll every `interval` seconds until `stop` is called. Failed polls are logged and
+        retried on the next interval.
+        """
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except Exception:  # pylint: disable=broad-exception-caught
+                self._logger.exception('%s poll failed', self.name)
+
+            self._stopped.wait(self.interval)
+
+    def start(self):
+        """Run polling in a background thread"""
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop polling"""
+        self._stopped.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            try:
+                events = await self.apoll()
+            except Exception:  # pylint: disable=broad-exception-caught
+                self._logger.exception('%s poll failed', self.name)
+                events = []
+
+            for event in events:
+                yield event
+
+            await asyncio.sleep(self.interval)
+
+    def _emit(self, events: list) -> list:
+        if self.callback:
+            for event in events:
+                self.callback(event)
+
+        return events
+
+    @property
+    def _logger(self):
+        return LOGGER_FUNCTION('Clopos')
+
+
+class StopListWatcher(_Watcher):
+    """Keeps `{product_id: limit}` map of the stop list up to date, by requesting only the
+    entries updated since the last seen timestamp (`by='timestamp'` filter), and emits change
+    events: to `callback` (sync), and to `async for` iteration (async).
+
+    Entries removed from the stop list are not returned by timestamp filter, so the full stop
+    list is fetched on the first poll and then every `resync_every` polls.
+
+    Example:
+    ```python
+    from integrify.clopos import CloposAsyncRequest, CloposRequest, StopListWatcher
+
+    watcher = StopListWatcher(CloposRequest, callback=print, interval=10)
+    watcher.start()  # polls in a background thread
+    watcher.limits  # {product_id: limit}
+
+    async for event in StopListWatcher(CloposAsyncRequest, interval=10):
+        print(event.product_id, event.kind, event.limit)
+    ```
+    """  # noqa: E501
+
+    name = 'Stop list'
+
+    def __init__(
+        self,
+        client: 'CloposClientClass',
+        callback: Optional[Callable[[StopListEvent], Any]] = None,
+        interval: float = 10,
+        resync_every: int = 30,
+        headers: Unset[dict] = UNSET,
+    ):
+        """
+        Args:
+            client: Clopos client (sync or async)
+            callback: Function called with every event
+            interval: Seconds between polls
+            resync_every: Number of polls between full fetches of the stop list (to notice
+                removed entries). Zero disables resyncing after the first poll
+            headers: Headers for requests (e.g. `x-brand`, `x-venue`)
+        """
+        super().__init__(client, callback, interval)
+        self.resync_every = resync_every
+        self.headers = headers
+
+        self.limits: dict[int, int] = {}
+        """Stock limits of the products in the stop list"""
+
+        self.cursor: Optional[int] = None
+        """Latest seen timestamp"""
+
+        self.polls = 0
+        """Number of successful polls"""
+
+    def poll(self) -> list[StopListEvent]:
+        """Fetch changes of the stop list, and apply them"""
+        full = self._full()
+        return self._apply(self.client.get_stop_list(**self._kwds(full)), full)
+
+    async def apoll(self) -> list[StopListEvent]:
+        """Async version of `poll`"""
+        full = self._full()
+        return self._apply(await self.client.get_stop_list(**self._kwds(full)), full)
+
+    def _full(self) -> bool:
+        return self.cursor is None or bool(
+            self.resync_every and self.polls % self.resync_every == 0
+        )
+
+    def _kwds(self, full: bool) -> dict:
+        kwds: dict[str, Any] = {'headers': self.headers, 'validation': 'raw'}
+        if not full:
+            kwds['filters'] = [{'by': 'timestamp', 'from_': self.cursor}]
+
+        return kwds
+
+    def _apply(self, resp: Any, full: bool) -> list[StopListEvent]:
+        body = getattr(resp, 'body', None)
+        if not isinstance(body, dict) or body.get('success') is not True:
+            raise CloposResponseError('Could not fetch stop list', resp)
+
+        events = []
+        seen = set()
+        for entry in body['data']:
+            product_id, limit = entry['id'], entry['limit']
+            seen.add(product_id)
+
+            if self.cursor is None or entry['timestamp'] > self.cursor:
+                self.cursor = entry['timestamp']
+
+            previous = self.limits.get(product_id)
+            if previous != limit:
+                self.limits[product_id] = limit
+                events.append(StopListEvent(product_id, limit, previous, entry['timestamp']))
+
+        if full:
+            for product_id in [id_ for id_ in self.limits if id_ not in seen]:
+                events.append(StopListEvent(product_id, None, self.limits.pop(product_id), None))
+
+        self.polls += 1
+        return self._emit(events)
+
+
+@dataclass
+class OrderEvent:
+    """Status transition of a tracked order"""
+
+    order_id: int
+    """Order ID"""
+
+    status: str
+    """New status"""
+
+    previous: Optional[str]
+    """Previous status (`None` for the first status seen)"""
+
+    order: dict
+    """Order data, as returned by Clopos"""
+
+    @property
+    def final(self) -> bool:
+        """Whether the order is not tracked anymore"""
+        return self.status in FINAL_ORDER_STATUSES
+
+
+@dataclass
+class _TrackedOrder:
+    id: int
+    status: Optional[str]
+    interval: float
+    due: float
+
+
+class _Budget:  # pylint: disable=too-few-public-methods
+    """Token bucket of requests per second, refilled continuously. Its capacity is at least one
+    request, so that budgets below one request per second still send requests.
+    """
+
+    def __init__(self, rate: float, clock: Callable[[], float]):
+        self.rate = rate
+        self.capacity = max(1, rate)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def take(self, count: int = 1) -> bool:
+        """Take `count` requests from the budget (`False` if there are not enough of them)"""
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens < count:
+            return False
+
+        self.tokens -= count
+        return True
+
+
+class OrderWatcher(_Watcher):  # pylint: disable=too-many-instance-attributes
+    """Tracks status of the orders until they are completed or cancelled, and emits status
+    transitions as events: to `callback` (sync), and to `async for` iteration (async).
+
+    Every order is checked on its own schedule: starting from the interval of its status
+    (`intervals`), which is multiplied by `backoff` after every check without a change (up to
+    `max_interval`), and reset on transition. Checks due at the same time are batched: orders
+    with the same status are checked with `get_orders(status=...)` if that takes fewer requests
+    than `get_order_by_id` for each of them, and the listing fits into the budget. At most
+    `budget` requests per second are sent; checks over the budget are postponed.
+
+    Example:
+    ```python
+    from integrify.clopos import CloposRequest, OrderWatcher
+
+    watcher = OrderWatcher(CloposRequest, callback=print, budget=5)
+    watcher.track(order_id)
+    watcher.start()  # polls in a background thread
+    ```
+    """  # noqa: E501
+
+    name = 'Order'
+
+    def __init__(
+        self,
+        client: 'CloposClientClass',
+        callback: Optional[Callable[[OrderEvent], Any]] = None,
+        interval: float = 1,
+        intervals: Optional[dict[str, float]] = None,
+        backoff: float = 2,
+        max_interval: float = 300,
+        budget: float = 10,
+        headers: Unset[dict] = UNSET,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            client: Clopos client (sync or async)
+            callback: Function called with every event
+            interval: Seconds between scheduler ticks (polls)
+            intervals: Initial check intervals per status, merged with `DEFAULT_ORDER_INTERVALS`
+            backoff: Multiplier of the interval after every check without a change
+            max_interval: Maximum interval between checks of an order
+            budget: Maximum number of requests per second
+            headers: Headers for requests (e.g. `x-brand`, `x-venue`)
+            clock: Time source, in seconds
+        """
+        super().__init__(client, callback, interval)
+        self.intervals = {**DEFAULT_ORDER_INTERVALS, **(intervals or {})}
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.headers = headers
+        self.clock = clock
+
+        self.orders: dict[int, _TrackedOrder] = {}
+        """Tracked orders by id"""
+
+        self._lock = threading.Lock()
+        """Guards `orders`, which are tracked from other threads while the watcher is polling"""
+
+        self.requests = 0
+        """Number of requests sent"""
+
+        self._budget = _Budget(budget, clock)
+        self._pages: dict[str, int] = {}
+        """Number of `get_orders` pages per status, learned from `total`"""
+
+    def track(self, order_id: int, status: Optional[str] = None) -> None:
+        """Start tracking the order. Without `status`, it is checked on the next poll."""
+        interval = self._interval(status)
+        due = self.clock() + interval if status else self.clock()
+        with self._lock:
+            self.orders[order_id] = _TrackedOrder(order_id, status, interval, due)
+
+    def untrack(self, order_id: int) -> None:
+        """Stop tracking the order"""
+        with self._lock:
+            self.orders.pop(order_id, None)
+
+    def poll(self) -> list[OrderEvent]:
+        """Check due orders (within the budget), and return their transitions"""
+        checked: dict[int, dict] = {}
+        batches, singles = self._plan()
+
+        for status, orders in batches:
+            listed = self._list(status)
+            if listed is None:  # over the budget
+                break
+
+            self._collect(orders, listed, checked, singles)
+
+        for order in singles:
+            if not self._budget.take():
+                break
+
+            self.requests += 1
+            self._collect_one(order, self.client.get_order_by_id(order.id, **self._kwds()), checked)
+
+        return self._apply(checked)
+
+    async def apoll(self) -> list[OrderEvent]:
+        """Async version of `poll`"""
+        checked: dict[int, dict] = {}
+        batches, singles = self._plan()
+
+        for status, orders in batches:
+            listed = await self._alist(status)
+            if listed is None:
+                break
+
+            self._collect(orders, listed, checked, singles)
+
+        allowed = []
+        for order in singles:
+            if not self._budget.take():
+                break
+            allowed.append(order)
+
+        self.requests += len(allowed)
+        responses = await asyncio.gather(
+            *(self.client.get_order_by_id(order.id, **self._kwds()) for order in allowed),
+        )
+        for order, resp in zip(allowed, responses):
+            self._collect_one(order, resp, checked)
+
+        return self._apply(checked)
+
+    def _kwds(self, **kwds) -> dict:
+        return {'headers': self.headers, 'validation': 'raw', **kwds}
+
+    def _interval(self, status: Optional[str]) -> float:
+        return self.intervals.get(status, 10)  # type: ignore[arg-type]
+
+    def _plan(self) -> tuple[list[tuple[str, list[_TrackedOrder]]], list[_TrackedOrder]]:
+        """Split due orders into batches by status, and the ones to check one by one. Listings,
+        which take more pages than the budget allows at once, would never finish, so their
+        orders are checked one by one.
+        """
+        now = self.clock()
+        with self._lock:
+            tracked = list(self.orders.values())
+
+        groups: dict[Optional[str], list[_TrackedOrder]] = defaultdict(list)
+        for order in tracked:
+            if order.due <= now:
+                groups[order.status].append(order)
+
+        batches, singles = [], []
+        for status, orders in groups.items():
+            pages = self._pages.get(status, 1)  # type: ignore[arg-type]
+            if status is not None and pages < len(orders) and pages <= self._budget.capacity:
+                batches.append((status, orders))
+            else:
+                singles.extend(orders)
+
+        return batches, singles
+
+    def _list(self, status: str) -> Optional[dict[int, dict]]:
+        """Orders with the status by id (`None` if budget was exceeded)"""
+        listed: dict[int, dict] = {}
+        for page in itertools.count(1):
+            if not self._budget.take():
+                return None
+
+            self.requests += 1
+            resp = self.client.get_orders(
+                **self._kwds(page=page, limit=ORDERS_PAGE_LIMIT, status=status)
+            )
+            if self._add_page(status, resp, listed):
+                break
+
+        return listed
+
+    async def _alist(self, status: str) -> Optional[dict[int, dict]]:
+        """Async version of `_list`"""
+        listed: dict[int, dict] = {}
+        for page in itertools.count(1):
+            if not self._budget.take():
+                return None
+
+            self.requests += 1
+            resp = await self.client.get_orders(
+                **self._kwds(page=page, limit=ORDERS_PAGE_LIMIT, status=status)
+            )
+            if self._add_page(status, resp, listed):
+                break
+
+        return listed
+
+    def _add_page(self, status: str, resp: Any, listed: dict[int, dict]) -> bool:
+        """Add orders of the page, and return whether it was the last page"""
+        body = getattr(resp, 'body', None)
+        if not isinstance(body, dict) or body.get('success') is not True:
+            raise CloposResponseError('Could not fetch orders', resp)
+
+        for order in body['data']:
+            listed[order['id']] = order
+
+        total = body.get('total')
+        if total is not None:
+            self._pages[status] = max(1, math.ceil(total / ORDERS_PAGE_LIMIT))
+            return len(listed) >= total or not body['data']
+
+        return len(body['data']) < ORDERS_PAGE_LIMIT
+
+    @staticmethod
+    def _collect(
+        orders: list[_TrackedOrder],
+        listed: dict[int, dict],
+        checked: dict[int, dict],
+        singles: list[_TrackedOrder],
+    ) -> None:
+        for order in orders:
+            if order.id in listed:
+                checked[order.id] = listed[order.id]
+            else:
+                singles.append(order)  # status changed, new one is fetched by id
+
+    def _collect_one(self, order: _TrackedOrder, resp: Any, checked: dict[int, dict]) -> None:
+        body = getattr(resp, 'body', None)
+        if getattr(resp, 'status_code', None) == 404:
+            self._logger.warning('Order %s is not found, not tracking it anymore', order.id)
+            self.untrack(order.id)
+        elif not isinstance(body, dict) or body.get('success') is not True:
+            raise CloposResponseError(f'Could not fetch order {order.id}', resp)
+        else:
+            checked[order.id] = body['data']
+
+    def _apply(self, checked: dict[int, dict]) -> list[OrderEvent]:
+        now = self.clock()
+        events = []
+
+        for order_id, data in checked.items():
+            order = self.orders.get(order_id)
+            if order is None:
+                continue
+
+            status = data['status']
+            if status != order.status:
+                events.append(OrderEvent(order_id, status, order.status, data))
+                order.status = status
+                order.interval = self._interval(status)
+            else:
+                order.interval = min(order.interval * self.backoff, self.max_interval)
+
+            order.due = now + order.interval
+            if status in FINAL_ORDER_STATUSES:
+                self.untrack(order_id)
+
+        return self._emit(events)
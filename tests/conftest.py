@@ -7,11 +7,23 @@ from integrify.clopos.schemas.common.response import ObjectResponse
 from integrify.clopos.schemas.orders.object import Order
 from integrify.clopos.schemas.receipts.object import Receipt
 from integrify.schemas import APIResponse
-from integrify.test import pytest_addoption  # noqa: F401
+from integrify.test import pytest_addoption as _pytest_addoption
 from integrify.test import requires_env as _requires_env
 from tests.client import CloposTestClientClass
 from tests.mocks import *  # noqa: F403
 
+
+def pytest_addoption(parser):
+    _pytest_addoption(parser)
+    parser.addoption(
+        '--benchmark',
+        action='store_true',
+        dest='benchmark',
+        default=False,
+        help='enable benchmarks (wall-clock assertions, see `tests/test_benchmarks.py`)',
+    )
+
+
 requires_env = partial(
     _requires_env,
     'CLOPOS_CLIENT_ID',
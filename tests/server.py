@@ -0,0 +1,431 @@
+import asyncio
+import itertools
+import json
+import shutil
+import ssl
+import subprocess
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator, Optional
+
+import httpx
+import pytest
+
+from integrify.clopos.client import CloposClientClass
+
+CREDENTIALS = {
+    'client_id': 'client',
+    'client_secret': 'secret',
+    'brand': 'openapitest',
+    'venue_id': '1',
+}
+
+
+def meta(**kwds) -> dict:
+    return {
+        'success': True,
+        'time': 1,
+        'timestamp': '2025-01-01T00:00:00Z',
+        'unix': 1735689600,
+        **kwds,
+    }
+
+
+def error(status_code: int, message: str) -> httpx.Response:
+    return httpx.Response(
+        status_code=status_code,
+        json={
+            'success': False,
+            'error': [{'message': message, 'http_code': status_code}],
+            'message': message,
+        },
+    )
+
+
+def timestamps(updated_at: str = '2025-01-01 00:00:00') -> dict:
+    return {'created_at': '2025-01-01 00:00:00', 'updated_at': updated_at}
+
+
+def catalog(products: int = 50) -> dict[str, list[dict]]:
+    """Catalog objects per path"""
+    return {
+        'products': [
+            {'id': i, 'name': f'Product {i}', 'price': '9.50', **timestamps()}
+            for i in range(1, products + 1)
+        ],
+        'categories': [
+            {
+                'id': i,
+                'name': f'Category {i}',
+                'status': 1,
+                'hidden': False,
+                'type': 'PRODUCT',
+                '_lft': i * 2 - 1,
+                '_rgt': i * 2,
+                'depth': 0,
+                'media': [],
+                **timestamps(),
+            }
+            for i in range(1, 6)
+        ],
+        'stations': [
+            {'id': i, 'name': f'Station {i}', 'status': 1, **timestamps()} for i in range(1, 4)
+        ],
+        'sale-types': [
+            {'id': i, 'name': f'Sale type {i}', 'status': {'1': 1}, **timestamps()}
+            for i in range(1, 4)
+        ],
+        'payment-methods': [
+            {
+                'id': i,
+                'name': f'Payment method {i}',
+                'customer_required': 0,
+                'is_system': 1,
+                'status': {'1': 1},
+                **timestamps(),
+            }
+            for i in range(1, 4)
+        ],
+    }
+
+
+class FakeClopos:
+    """Local Clopos stand-in, plugged into clients through `httpx.MockTransport`"""
+
+    def __init__(self, latency: float = 0, expires_in: int = 3600):
+        self.latency = latency
+        self.expires_in = expires_in
+
+        self.hits: Counter = Counter()
+        """Number of requests per path (without `/open-api/` prefix)"""
+
+        self.sent: Counter = Counter()
+        """Size of response bodies per path"""
+
+        self.log: list[tuple[str, str]] = []
+        """Methods and paths of the requests, in order"""
+
+        self.tokens: dict[str, tuple] = {}
+        """Issued tokens and (brand, venue id) they are scoped to"""
+        self._token_ids = itertools.count(1)
+
+        self.objects: dict[str, list[dict]] = {}
+        """Listed objects per path, e.g. `{'venues': [...]}`"""
+
+        self.with_total = True
+        """Whether list responses have `total`"""
+
+        self.fail_pages: set[int] = set()
+        """Pages of list endpoints, which fail with 500"""
+
+        self.stop_list_entries: dict[int, dict] = {}
+        """Stop list entries by product id"""
+
+        self.chunk_size = 0
+        """If set, response bodies are sent in chunks of this size (as a stream)"""
+
+        self.faults: dict[str, list] = {}
+        """Responses (or exceptions to raise) served before the real ones, per path"""
+
+        self.delays: dict[str, list[float]] = {}
+        """Latencies of the next requests per path (instead of `latency`)"""
+
+    def install(self, client: CloposClientClass) -> CloposClientClass:
+        """Replace httpx client of the given Clopos client with the fake one"""
+        if client.request_executor.sync:
+            client.request_executor.client = httpx.Client(
+                transport=httpx.MockTransport(self.handle),
+            )
+        else:
+            client.request_executor.client = httpx.AsyncClient(
+                transport=httpx.MockTransport(self.ahandle),
+            )
+
+        return client
+
+    def client(self, **kwds) -> CloposClientClass:
+        return self.install(CloposClientClass(**kwds))
+
+    def delay(self, request: httpx.Request) -> float:
+        delays = self.delays.get(request.url.path.split('/open-api/', 1)[-1])
+        return delays.pop(0) if delays else self.latency
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        delay = self.delay(request)
+        if delay:
+            time.sleep(delay)
+
+        response = self.respond(request)
+        if not self.chunk_size:
+            return response
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            content=self.chunks(response.content),
+        )
+
+    async def ahandle(self, request: httpx.Request) -> httpx.Response:
+        delay = self.delay(request)
+        if delay:
+            await asyncio.sleep(delay)
+
+        response = self.respond(request)
+        if not self.chunk_size:
+            return response
+
+        async def chunks():
+            for chunk in self.chunks(response.content):
+                yield chunk
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            content=chunks(),
+        )
+
+    def chunks(self, content: bytes) -> Iterator[bytes]:
+        for start in range(0, len(content), self.chunk_size):
+            yield content[start : start + self.chunk_size]
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.split('/open-api/', 1)[-1]
+        self.hits[path] += 1
+        self.log.append((request.method, path))
+
+        if self.faults.get(path):
+            fault = self.faults[path].pop(0)
+            if isinstance(fault, Exception):
+                raise fault
+
+            return fault
+
+        response = self.route(path, request)
+        self.sent[path] += len(response.content)
+        return response
+
+    def route(self, path: str, request: httpx.Request) -> httpx.Response:
+
+        if path == 'auth':
+            return self.auth(json.loads(request.content))
+
+        if request.headers.get('x-token') not in self.tokens:
+            return error(401, 'Unauthenticated.')
+
+        scope = (request.headers.get('x-brand'), request.headers.get('x-venue'))
+        if scope != self.tokens[request.headers['x-token']]:
+            return error(403, 'Token is not valid for this brand and venue.')
+
+        if path == 'products/stop-list':
+            return self.stop_list(self.query(request))
+
+        if request.method == 'POST' and path in self.objects:
+            return self.create(path, json.loads(request.content))
+
+        if path in self.objects:
+            return self.paginate(path, self.query(request))
+
+        collection, _, id_ = path.rpartition('/')
+        if collection in self.objects and id_.isdigit():
+            if request.method == 'PUT':
+                return self.update(collection, int(id_), json.loads(request.content))
+
+            if request.method == 'DELETE':
+                return self.delete(collection, int(id_))
+
+            return self.by_id(collection, int(id_))
+
+        return error(404, 'Not found')
+
+    def stop_list(self, params: dict) -> httpx.Response:
+        entries = list(self.stop_list_entries.values())
+
+        i = 0
+        while f'filters[{i}][0]' in params:
+            by, start = params[f'filters[{i}][0]'], int(params[f'filters[{i}][1][0]'])
+            end = int(params.get(f'filters[{i}][1][1]', 2**63))
+            entries = [e for e in entries if start <= e[by] <= end]
+            i += 1
+
+        return httpx.Response(status_code=200, json=meta(data=entries))
+
+    def create(self, path: str, payload: dict) -> httpx.Response:
+        """Create the object. Objects with the same `cid` are not duplicated"""
+        items = self.objects[path]
+        item = next(
+            (i for i in items if payload.get('cid') and i.get('cid') == payload['cid']), None
+        )
+
+        if item is None:
+            item = {**payload, 'id': len(items) + 1, **timestamps()}
+            items.append(item)
+
+        return httpx.Response(status_code=201, json=meta(data=item))
+
+    def by_id(self, path: str, id_: int) -> httpx.Response:
+        for item in self.objects[path]:
+            if item['id'] == id_:
+                return httpx.Response(status_code=200, json=meta(data=item))
+
+        return error(404, 'Not found')
+
+    def update(self, path: str, id_: int, payload: dict) -> httpx.Response:
+        for item in self.objects[path]:
+            if item['id'] == id_:
+                item.update(payload)
+                return httpx.Response(status_code=200, json=meta(data=item))
+
+        return error(404, 'Not found')
+
+    def delete(self, path: str, id_: int) -> httpx.Response:
+        items = self.objects[path]
+        for i, item in enumerate(items):
+            if item['id'] == id_:
+                del items[i]
+                return httpx.Response(status_code=200, json=meta())
+
+        return error(404, 'Not found')
+
+    def auth(self, payload: dict) -> httpx.Response:
+        if payload.get('client_secret') == 'wrong':
+            return error(401, 'Invalid credentials')
+
+        token = f'oauth_{next(self._token_ids)}'
+        self.tokens[token] = (payload.get('brand'), str(payload.get('venue_id')))
+
+        return httpx.Response(
+            status_code=200,
+            json={
+                'success': True,
+                'token': token,
+                'token_type': 'Bearer',
+                'expires_in': self.expires_in,
+                'message': 'Authenticated',
+            },
+        )
+
+    def revoke(self, token: Optional[str] = None) -> None:
+        """Expire given (or all) tokens on the server side"""
+        if token is None:
+            self.tokens.clear()
+        else:
+            self.tokens.pop(token, None)
+
+    @staticmethod
+    def query(request: httpx.Request) -> dict:
+        params = dict(request.url.params)
+
+        # `get_products` sends its params as json
+        if len(params) == 1 and next(iter(params)).startswith('{'):
+            return json.loads(next(iter(params)))
+
+        return params
+
+    def paginate(self, path: str, params: dict) -> httpx.Response:
+        items = self.objects[path]
+        if 'status' in params:
+            items = [item for item in items if str(item.get('status')) == params['status']]
+
+        if 'sort_by' in params:
+            items = sorted(
+                items,
+                key=lambda item: item.get(params['sort_by']) or '',
+                reverse=params.get('sort_order') == '-1',
+            )
+
+        page = int(params.get('page', 1))
+        limit = int(params.get('limit', 20))
+
+        if page in self.fail_pages:
+            return error(500, 'Server Error')
+
+        data = items[(page - 1) * limit : page * limit]
+        if params.get('selects[]'):
+            fields = {'id', 'name', 'type', *params['selects[]'].split(',')}
+            data = [{k: v for k, v in item.items() if k in fields} for item in data]
+
+        body = meta(data=data)
+        if self.with_total:
+            body['total'] = len(items)
+
+        return httpx.Response(status_code=200, json=body)
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps(meta(data=[{'id': 1, 'name': 'Venue 1'}])).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # concurrent connects are not dropped
+
+
+@contextmanager
+def https_server(directory: Path) -> Iterator[tuple[str, str]]:
+    """Local HTTPS server with a self-signed certificate, answering every GET with one venue.
+
+    Yields base url and path of the certificate. Skips the test, if `openssl` is not available.
+    """
+    if shutil.which('openssl') is None:
+        pytest.skip('openssl is not available')
+
+    cert, key = str(directory / 'cert.pem'), str(directory / 'key.pem')
+    subprocess.run(
+        [
+            'openssl',
+            'req',
+            '-x509',
+            '-newkey',
+            'ec',
+            '-pkeyopt',
+            'ec_paramgen_curve:prime256v1',
+            '-nodes',
+            '-days',
+            '1',
+            '-subj',
+            '/CN=localhost',
+            '-addext',
+            'subjectAltName=IP:127.0.0.1',
+            '-keyout',
+            key,
+            '-out',
+            cert,
+        ],  # fmt: skip
+        check=True,
+        capture_output=True,
+    )
+
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+
+    server = _Server(('127.0.0.1', 0), _JSONHandler)
+    # handshakes are done in the handler threads, not in the accepting one
+    server.socket = context.wrap_socket(
+        server.socket,
+        server_side=True,
+        do_handshake_on_connect=False,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield f'https://127.0.0.1:{server.server_address[1]}/', cert
+    finally:
+        server.shutdown()
+        server.server_close()
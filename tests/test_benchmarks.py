@@ -0,0 +1,449 @@
+# Benchmarks against local fake Clopos (see `tests/server.py`) with injected latency.
+# They assert wall-clock speedups, which depend on the machine and its load, so they only run
+# with `--benchmark` (e.g. `make test benchmark=1`).
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import httpx
+import pytest
+
+from integrify.clopos.cache import ResponseCache
+from integrify.clopos.catalog import CatalogCache, CatalogSync, SQLiteCatalogStore
+from integrify.clopos.client import CloposClientClass
+from integrify.clopos.executor import TransportConfig
+from integrify.clopos.handlers import (
+    GetPaginatedDataHandler,
+    GetProductByIDHandler,
+    GetProductsHandler,
+)
+from integrify.clopos.hedge import HedgePolicy
+from integrify.clopos.schemas.venues.object import Venue
+from integrify.clopos.tokens import TokenManager
+from integrify.clopos.validation import validation
+from integrify.clopos.watchers import OrderWatcher
+from tests.server import CREDENTIALS, FakeClopos, catalog, https_server, meta
+
+pytestmark = pytest.mark.skipif(
+    "not config.getoption('benchmark')",
+    reason='Benchmarks are enabled with --benchmark',
+)
+
+
+def timed(func, *args, **kwds) -> float:
+    start = time.perf_counter()
+    func(*args, **kwds)
+    return time.perf_counter() - start
+
+
+@pytest.fixture
+def venues_server():
+    server = FakeClopos(latency=0.02)
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 401)]
+    return server
+
+
+def test_fetch_all_speedup(venues_server: FakeClopos):
+    client = venues_server.client(token_manager=TokenManager(**CREDENTIALS))
+    client.token_manager.get_token()  # auth is not measured
+
+    sequential = timed(list, client.iter_venues(limit=20))
+    concurrent = timed(list, client.fetch_all('get_venues', concurrency=8, limit=20))
+
+    assert venues_server.hits['venues'] == 40
+    assert concurrent * 3 < sequential
+
+    client.token_manager.close()
+
+
+def test_async_fetch_all_speedup(venues_server: FakeClopos):
+    client = venues_server.client(sync=False, token_manager=TokenManager(**CREDENTIALS))
+
+    async def consume(items):
+        return [item async for item in items]
+
+    async def main():
+        await client.token_manager.aget_token()
+
+        start = time.perf_counter()
+        await consume(client.iter_venues(limit=20))
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await consume(client.fetch_all('get_venues', concurrency=8, limit=20))
+        concurrent = time.perf_counter() - start
+
+        client.token_manager.close()
+        return sequential, concurrent
+
+    sequential, concurrent = asyncio.run(main())
+
+    assert venues_server.hits['venues'] == 40
+    assert concurrent * 3 < sequential
+
+
+def test_cached_lookup_latency(venues_server: FakeClopos):
+    cache = ResponseCache()
+    client = venues_server.client(token_manager=TokenManager(**CREDENTIALS), cache=cache)
+    client.token_manager.get_token()
+
+    uncached = statistics.median(timed(client.get_venues, page=page) for page in range(1, 21))
+    cached = statistics.median(timed(client.get_venues, page=page) for page in range(1, 21))
+
+    assert venues_server.hits['venues'] == 20
+    assert cache.stats.hits == 20
+    assert cached * 20 < uncached, (cached, uncached)
+
+    client.token_manager.close()
+
+
+def test_stale_while_revalidate_tail_latency(venues_server: FakeClopos):
+    def p95(max_stale: float) -> float:
+        now = [0.0]
+        cache = ResponseCache({'get_venues': 10}, max_stale=max_stale, clock=lambda: now[0])
+        client = venues_server.client(token_manager=TokenManager(**CREDENTIALS), cache=cache)
+        client.get_venues()  # warm up
+
+        latencies = []
+        for second in range(0, 120, 3):  # entry expires every few calls
+            now[0] = second
+            latencies.append(timed(client.get_venues))
+
+        client.token_manager.close()
+        return statistics.quantiles(latencies, n=20)[-1]
+
+    blocking = p95(max_stale=0)
+    revalidating = p95(max_stale=60)
+
+    assert revalidating * 5 < blocking, (revalidating, blocking)
+
+
+def test_catalog_restart_time_to_first_order(tmp_path):
+    server = FakeClopos(latency=0.05)
+    server.objects.update(catalog(products=2000))
+    store = SQLiteCatalogStore(str(tmp_path / 'catalog.sqlite3'))
+
+    def restart(store):
+        # new process: new client, nothing in memory
+        start = time.perf_counter()
+        client = server.client(token_manager=TokenManager(**CREDENTIALS))
+        cache = CatalogCache(client, store).start()
+        assert cache.get('products', 2000) is not None  # ready to take orders
+        seconds = time.perf_counter() - start
+
+        if cache.revalidation:
+            cache.revalidation.join()
+        client.token_manager.close()
+        return seconds
+
+    without_store = restart(None)
+    restart(store)  # first start fills the store
+    with_store = restart(store)
+
+    assert with_store * 5 < without_store, (with_store, without_store)
+
+
+def test_catalog_sync_delta(clopos_product_dish_with_modifiers):
+    product = clopos_product_dish_with_modifiers.json()['data']
+    server = FakeClopos()
+    server.objects['products'] = [{**product, 'id': i} for i in range(1, 1001)]
+
+    sync = CatalogSync(server.client(token_manager=TokenManager(**CREDENTIALS)))
+    sync.pull()
+    full = sum(server.sent.values())
+
+    for item in server.objects['products'][:5]:
+        item['updated_at'] = '2030-01-01 00:00:00'
+    server.sent.clear()
+
+    delta = sync.pull()
+    assert delta.updated == [1, 2, 3, 4, 5]
+    assert sum(server.sent.values()) * 10 < full, (sum(server.sent.values()), full)
+
+    sync.client.token_manager.close()
+
+
+def test_order_watcher_simulation():
+    # 50 orders over 15 simulated minutes: NEW -> IN_PROGRESS -> READY -> COMPLETED
+    def status_at(i: int, second: int) -> str:
+        age = second - i * 4
+        ready = 120 + (i % 5) * 60
+        if age < 30:
+            return 'NEW'
+        if age < ready:
+            return 'IN_PROGRESS'
+        return 'READY' if age < ready + 120 else 'COMPLETED'
+
+    def simulate(check) -> tuple[int, float]:
+        server = FakeClopos()
+        server.objects['orders'] = []
+        client = server.client(token_manager=TokenManager(**CREDENTIALS))
+        seen: dict[tuple[int, str], int] = {}
+
+        for second in range(900):
+            server.objects['orders'] = [
+                {'id': i, 'status': status_at(i, second)} for i in range(50) if i * 4 <= second
+            ]
+            for order_id, status in check(client, second):
+                seen.setdefault((order_id, status), second)
+
+        client.token_manager.close()
+
+        changes = {
+            (i, status_at(i, second)): second
+            for i in range(50)
+            for second in range(899, i * 4 - 1, -1)
+        }
+        delays = [seen[change] - second for change, second in changes.items() if change in seen]
+        assert len(delays) == len(changes)
+        return sum(server.hits.values()), statistics.mean(delays)
+
+    # fixed loop: every open order is checked every 5 seconds
+    known: dict[int, str] = {}
+
+    def fixed_loop(client, second):
+        if second % 5:
+            return []
+
+        for i in range(50):
+            if i * 4 <= second and known.get(i) != 'COMPLETED':
+                known[i] = client.get_order_by_id(i, validation='raw').body['data']['status']
+
+        return known.items()
+
+    now = [0.0]
+    watcher = OrderWatcher(None, budget=20, max_interval=30, clock=lambda: now[0])  # type: ignore[arg-type]
+
+    def watch(client, second):
+        watcher.client = client
+        now[0] = second
+        if second % 4 == 0 and second < 200:
+            watcher.track(second // 4)
+
+        return [(event.order_id, event.status) for event in watcher.poll()]
+
+    fixed_requests, fixed_delay = simulate(fixed_loop)
+    watcher_requests, watcher_delay = simulate(watch)
+
+    # far fewer requests, while transitions are still noticed within `max_interval`
+    assert watcher_requests * 4 < fixed_requests, (watcher_requests, fixed_requests)
+    assert watcher_delay < 30, (watcher_delay, fixed_delay)
+
+
+def test_hedged_tail_latency():
+    def p99(hedging) -> float:
+        server = FakeClopos()
+        server.objects.update(catalog(products=1))
+        server.delays['products/1'] = [0.1 if i % 10 == 9 else 0.002 for i in range(200)]
+        client = server.client(
+            token_manager=TokenManager(**CREDENTIALS),
+            sync=False,
+            validation='raw',
+            hedging=hedging,
+        )
+
+        async def main():
+            await client.token_manager.aget_token()
+
+            latencies = []
+            for _ in range(100):
+                start = time.perf_counter()
+                await client.get_product_by_id(1)
+                latencies.append(time.perf_counter() - start)
+
+            return statistics.quantiles(latencies, n=100)[-1]
+
+        return asyncio.run(main())
+
+    plain = p99(None)
+    hedging = HedgePolicy(percentile=0.8, min_samples=10, initial_delay=0.01, budget=0.15)
+    hedged = p99(hedging)
+
+    assert hedged * 3 < plain, (hedged, plain)
+    assert hedging.stats.hedge_rate <= 0.15
+
+
+def test_validation_modes_throughput(
+    clopos_product_goods_with_variations_response,
+    clopos_product_dish_with_modifiers,
+    clopos_product_timer_response,
+):
+    products = [
+        clopos_product_goods_with_variations_response.json()['data'],
+        clopos_product_dish_with_modifiers.json()['data'],
+        clopos_product_timer_response.json()['data'],
+    ] * 300
+    response = httpx.Response(200, json=meta(data=products, total=len(products)))
+    handler = GetProductsHandler()
+
+    throughput = {}
+    for mode in ('full', 'raw'):
+        with validation(mode):  # type: ignore[arg-type]
+            handler.handle_response(response)  # warm up
+            seconds = min(timed(handler.handle_response, response) for _ in range(5))
+
+        throughput[mode] = len(products) / seconds
+
+    # skipping model building altogether is much faster
+    assert throughput['raw'] > throughput['full'] * 1.3, throughput
+
+
+def test_handler_overhead_is_constant(clopos_product_dish_with_modifiers):
+    response = clopos_product_dish_with_modifiers
+    handler = GetProductByIDHandler()
+    handler.handle_response(response)
+
+    warm = statistics.median(timed(handler.handle_response, response) for _ in range(50))
+    # as if every request was sent by a new client
+    fresh = statistics.median(
+        timed(GetProductByIDHandler().handle_response, response) for _ in range(50)
+    )
+
+    assert GetProductByIDHandler().validator is handler.validator
+    assert GetPaginatedDataHandler(Venue) is GetPaginatedDataHandler(Venue)
+    assert fresh < warm * 2, (fresh, warm)
+
+
+def test_import_time():
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import integrify.clopos'],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    # import time: self [us] | cumulative | imported package
+    modules = {}
+    for line in result.stderr.splitlines():
+        self_us, cumulative_us, name = line.removeprefix('import time:').split('|')
+        if self_us.strip().isdigit():
+            modules[name.strip()] = (int(self_us), int(cumulative_us))
+
+    assert 'integrify.clopos.handlers' not in modules
+    assert 'integrify.clopos.schemas.products.object' not in modules
+    assert 'integrify.clopos.schemas.receipts.object' not in modules
+
+    # clopos modules themselves take less time than the core library
+    own = sum(
+        self_us for name, (self_us, _) in modules.items() if name.startswith('integrify.clopos')
+    )
+    assert own < modules['integrify.api'][1]
+
+
+def test_client_construction_time():
+    client = CloposClientClass()
+    seconds = min(timed(CloposClientClass) for _ in range(20))
+
+    assert seconds < 0.002
+    assert client.request_executor._client is None  # created on first request
+    assert isinstance(dict.__getitem__(client.handlers, 'get_products'), str)
+    assert client.handlers['get_products'].validator is not None
+
+
+def test_connection_pool_throughput(tmp_path):
+    async def throughput(transport: TransportConfig, base_url: str) -> float:
+        client = CloposClientClass(
+            base_url=base_url,
+            sync=False,
+            validation='raw',
+            transport=transport,
+        )
+
+        await client.get_venues()  # warm-up: SSL context and handlers are not measured
+
+        start = time.perf_counter()
+        for _ in range(20):  # 100 requests, 5 concurrent
+            resps = await asyncio.gather(*(client.get_venues() for _ in range(5)))
+            assert all(resp.ok for resp in resps)
+
+        elapsed = time.perf_counter() - start
+        await client.request_executor.client.aclose()
+        return 100 / elapsed
+
+    pooled, unpooled = [], []
+    with https_server(tmp_path) as (base_url, cert):
+        for _ in range(3):  # best of 3, interleaved
+            pooled.append(asyncio.run(throughput(TransportConfig(verify=cert), base_url)))
+            unpooled.append(
+                asyncio.run(
+                    throughput(TransportConfig(verify=cert, max_keepalive_connections=0), base_url),
+                ),
+            )
+
+    # every request without keep-alive pays TCP and TLS handshake
+    assert max(pooled) > max(unpooled) * 1.5, (pooled, unpooled)
+
+
+def test_bulk_receipts_throughput():
+    server = FakeClopos(latency=0.005)
+    server.objects['receipts'] = []
+    client = server.client(token_manager=TokenManager(**CREDENTIALS), sync=False)
+
+    def receipts(start: int):
+        for i in range(start, start + 200):
+            yield {
+                'cid': f'receipt-{i}',
+                'payment_methods': [{'id': 1, 'name': 'Cash', 'amount': '10.00'}],
+                'user_id': 1,
+            }
+
+    async def main():
+        await client.token_manager.aget_token()
+
+        start = time.perf_counter()
+        for receipt in receipts(0):
+            await client.create_receipt(**receipt, validation='raw')
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = await client.create_receipts_bulk(receipts(200), concurrency=16)
+        bulk = time.perf_counter() - start
+
+        return sequential, bulk, result
+
+    sequential, bulk, result = asyncio.run(main())
+
+    assert len(result.created) == 200
+    assert bulk * 4 < sequential, (bulk, sequential)
+
+
+def test_bulk_receipts_memory():
+    body = json.dumps(meta(data={'id': 1})).encode()
+
+    async def handle(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(201, content=body, headers={'content-type': 'application/json'})
+
+    client = CloposClientClass(
+        sync=False,
+        transport=TransportConfig(transport=httpx.MockTransport(handle)),
+    )
+
+    def receipts(count: int):
+        for i in range(count):
+            yield {
+                'cid': f'receipt-{i}',
+                'payment_methods': [{'id': 1, 'name': 'Cash', 'amount': '10.00'}],
+                'user_id': 1,
+                'meta': {'note': 'x' * 2048},
+            }
+
+    def peak(count: int) -> int:
+        tracemalloc.start()
+        result = asyncio.run(
+            client.create_receipts_bulk(receipts(count), headers={'x-token': 'token'}),
+        )
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        assert len(result.created) == count
+        return peak
+
+    peak(10)  # warm-up: imports and caches are not measured
+    small, large = peak(200), peak(1_200)
+
+    # input (over 2 KB per receipt) is streamed: only ids of created receipts are kept
+    assert (large - small) / 1_000 < 500, (small, large)
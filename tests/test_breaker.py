@@ -0,0 +1,167 @@
+import asyncio
+
+import httpx
+import pytest
+
+from integrify.clopos.breaker import CircuitBreaker
+from integrify.clopos.exceptions import CloposCircuitOpenError
+from integrify.clopos.retry import RetryPolicy
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos, error
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 6)]
+    server.objects['receipts'] = []
+    server.objects['products'] = []
+    return server
+
+
+def make_client(server: FakeClopos, breaker: CircuitBreaker, **kwds):
+    return server.client(
+        token_manager=TokenManager(**CREDENTIALS),
+        circuit_breaker=breaker,
+        validation='raw',
+        **kwds,
+    )
+
+
+def test_opens_on_error_rate(server: FakeClopos, clock: Clock):
+    breaker = CircuitBreaker(error_rate=0.5, window=4, min_calls=4, clock=clock)
+    client = make_client(server, breaker)
+    server.faults['receipts'] = [error(500, 'Error'), httpx.ConnectError('reset')]
+
+    client.get_receipts()
+    with pytest.raises(httpx.ConnectError):
+        client.get_receipts()
+    client.get_receipts()
+    assert breaker.state('receipts') == 'closed'  # not enough calls yet
+
+    client.get_receipts()
+    assert breaker.state('receipts') == 'open'
+
+    with pytest.raises(CloposCircuitOpenError) as exc_info:
+        client.get_receipts()
+
+    assert exc_info.value.group == 'receipts'
+    assert exc_info.value.retry_after == 30
+    assert server.hits['receipts'] == 4
+    assert breaker.stats['receipts'].rejected == 1
+    assert breaker.stats['receipts'].trips == 1
+
+    assert client.get_products().ok  # other groups are not affected
+
+
+def test_client_errors_are_not_failures(server: FakeClopos, clock: Clock):
+    breaker = CircuitBreaker(window=2, min_calls=2, clock=clock)
+    client = make_client(server, breaker)
+
+    for _ in range(3):
+        client.get_receipt_by_id(1000)  # 404
+
+    assert breaker.state('receipts') == 'closed'
+    assert breaker.stats['receipts'].failures == 0
+
+
+def test_opens_on_latency(server: FakeClopos, clock: Clock):
+    breaker = CircuitBreaker(slow_call=0.01, slow_rate=0.5, window=2, min_calls=2, clock=clock)
+    client = make_client(server, breaker)
+    server.latency = 0.02
+
+    client.get_venues()
+    client.get_venues()
+
+    assert breaker.state('default') == 'open'
+    assert breaker.stats['default'].slow_calls == 2
+
+
+def test_half_open(server: FakeClopos, clock: Clock):
+    breaker = CircuitBreaker(window=2, min_calls=2, open_for=10, probes=2, clock=clock)
+    client = make_client(server, breaker)
+    server.faults['venues'] = [error(503, 'Unavailable')] * 2
+
+    client.get_venues()
+    client.get_venues()
+    assert breaker.state('default') == 'open'
+
+    clock.now = 10
+    assert client.get_venues().ok
+    assert breaker.state('default') == 'half_open'
+    assert client.get_venues().ok
+    assert breaker.state('default') == 'closed'
+
+
+def test_failed_probe(server: FakeClopos, clock: Clock):
+    breaker = CircuitBreaker(window=1, min_calls=1, open_for=10, clock=clock)
+    client = make_client(server, breaker)
+    server.faults['venues'] = [error(503, 'Unavailable')] * 2
+
+    client.get_venues()
+    clock.now = 10
+    client.get_venues()  # probe fails
+
+    assert breaker.state('default') == 'open'
+    assert breaker.stats['default'].trips == 2
+
+    clock.now = 15
+    with pytest.raises(CloposCircuitOpenError):
+        client.get_venues()
+
+
+def test_probes_are_limited(clock: Clock):
+    breaker = CircuitBreaker(window=1, min_calls=1, open_for=10, clock=clock)
+    breaker.acquire('get_venues')
+    breaker.release('get_venues', 0, error=httpx.ConnectError('reset'))
+
+    clock.now = 10
+    breaker.acquire('get_venues')  # probe in flight
+    with pytest.raises(CloposCircuitOpenError):
+        breaker.acquire('get_venues')
+
+    breaker.release('get_venues', 0, result=httpx.Response(200))
+    assert breaker.state('default') == 'closed'
+
+
+def test_open_circuit_is_not_retried(server: FakeClopos, clock: Clock):
+    breaker = CircuitBreaker(window=1, min_calls=1, clock=clock)
+    policy = RetryPolicy(backoff=0.001, jitter=False)
+    client = make_client(server, breaker, retry_policy=policy)
+    server.faults['venues'] = [error(503, 'Unavailable')]
+
+    with pytest.raises(CloposCircuitOpenError):
+        client.get_venues()
+
+    assert server.hits['venues'] == 1
+    assert policy.stats.retries == 1
+
+
+def test_async(server: FakeClopos, clock: Clock):
+    breaker = CircuitBreaker(window=2, min_calls=2, clock=clock)
+    client = make_client(server, breaker, sync=False)
+    server.faults['orders'] = [error(502, 'Bad gateway')] * 2
+    server.objects['orders'] = []
+
+    async def main():
+        await client.get_orders()
+        await client.get_orders()
+
+        with pytest.raises(CloposCircuitOpenError):
+            await client.get_orders()
+
+    asyncio.run(main())
+    assert breaker.stats['orders'].rejected == 1
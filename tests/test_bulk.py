@@ -0,0 +1,109 @@
+import asyncio
+
+import httpx
+import pytest
+
+from integrify.clopos.bulk import BulkResult
+from integrify.clopos.schemas.common.response import ErrorResponse
+from integrify.clopos.schemas.receipts.request import CreateReceiptRequest
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos, error
+
+
+def receipt(i: int) -> dict:
+    return {
+        'cid': f'receipt-{i}',
+        'payment_methods': [{'id': 1, 'name': 'Cash', 'amount': '10.00'}],
+        'user_id': 1,
+    }
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects['receipts'] = []
+    return server
+
+
+def make_client(server: FakeClopos, **kwds):
+    return server.client(token_manager=TokenManager(**CREDENTIALS), **kwds)
+
+
+def test_sync(server: FakeClopos):
+    client = make_client(server)
+    server.faults['receipts'] = [error(422, 'Invalid receipt')]
+
+    result = client.create_receipts_bulk((receipt(i) for i in range(20)), concurrency=4)
+
+    assert isinstance(result, BulkResult)
+    assert result.total == 20
+    assert len(result.created) == 19
+    assert not result.ok
+
+    ((cid, failure),) = result.failed.items()
+    assert isinstance(failure, ErrorResponse)
+    assert failure.message == 'Invalid receipt'
+    assert cid not in result.created
+
+    ids = {item['cid']: item['id'] for item in server.objects['receipts']}
+    assert result.created == ids
+
+
+def test_async(server: FakeClopos):
+    client = make_client(server, sync=False)
+    server.faults['receipts'] = [httpx.ConnectError('reset')]
+
+    async def receipts():
+        for i in range(10):
+            yield receipt(i)
+
+    async def main():
+        await client.token_manager.aget_token()
+        return await client.create_receipts_bulk(receipts(), concurrency=3)
+
+    result = asyncio.run(main())
+
+    assert len(result.created) == 9
+    (failure,) = result.failed.values()
+    assert failure.error[0].exception == 'ConnectError'
+    assert failure.message == 'reset'
+
+
+def test_request_models(server: FakeClopos):
+    client = make_client(server)
+
+    result = client.create_receipts_bulk(
+        [CreateReceiptRequest.model_validate(receipt(1))],
+        validation='full',
+    )
+
+    assert result.created == {'receipt-1': 1}
+
+
+def test_invalid_payload_is_failure(server: FakeClopos):
+    client = make_client(server)
+
+    result = client.create_receipts_bulk([{'cid': 'broken', 'user_id': 1}, receipt(1)])
+
+    assert set(result.created) == {'receipt-1'}
+    assert result.failed['broken'].error[0].exception == 'ValidationError'
+
+
+@pytest.mark.parametrize('sync', [True, False])
+def test_input_is_consumed_lazily(server: FakeClopos, sync: bool):
+    client = make_client(server, sync=sync)
+    server.latency = 0.005
+    in_flight = []
+
+    def receipts():
+        for i in range(30):
+            in_flight.append(i - len(server.objects['receipts']))
+            yield receipt(i)
+
+    if sync:
+        result = client.create_receipts_bulk(receipts(), concurrency=5)
+    else:
+        result = asyncio.run(client.create_receipts_bulk(receipts(), concurrency=5))
+
+    assert len(result.created) == 30
+    assert max(in_flight) <= 5
@@ -0,0 +1,280 @@
+import asyncio
+import time
+
+import pytest
+
+from integrify.clopos.cache import ResponseCache
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 26)]
+    server.objects['products'] = [
+        {'id': i, 'name': f'Product {i}', 'price': 10} for i in range(1, 26)
+    ]
+    return server
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def make_client(server: FakeClopos, cache: ResponseCache, **kwds):
+    return server.client(token_manager=TokenManager(**CREDENTIALS), cache=cache, **kwds)
+
+
+def test_hit_and_miss(server: FakeClopos, clock: Clock):
+    cache = ResponseCache(clock=clock)
+    client = make_client(server, cache)
+
+    first = client.get_venues(limit=10)
+    second = client.get_venues(limit=10)
+
+    assert second is first
+    assert server.hits['venues'] == 1
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+    assert len(cache) == 1
+    assert cache.size == int(first.headers['content-length'])
+
+
+def test_ttl(server: FakeClopos, clock: Clock):
+    client = make_client(server, ResponseCache({'get_venues': 60}, clock=clock))
+
+    client.get_venues()
+    clock.now = 59
+    client.get_venues()
+    assert server.hits['venues'] == 1
+
+    clock.now = 60
+    client.get_venues()
+    assert server.hits['venues'] == 2
+
+
+def test_not_cached_endpoints(server: FakeClopos, clock: Clock):
+    cache = ResponseCache({'get_venues': 0}, clock=clock)
+    client = make_client(server, cache)
+
+    client.get_venues()
+    client.get_venues()
+    client.get_products()
+    client.get_products()
+
+    assert server.hits['venues'] == 2
+    assert server.hits['products'] == 2
+    assert len(cache) == 0
+
+
+def test_key(server: FakeClopos, clock: Clock):
+    cache = ResponseCache({'get_products': 60}, clock=clock)
+    client = make_client(server, cache, validation='raw')  # selected fields only
+
+    client.get_products(selects=['id', 'name'])
+    client.get_products(selects=['id', 'name'])
+    client.get_products(selects=['id', 'name', 'price'])
+    client.get_products(filters={'type': ['GOODS']})
+    client.get_products(filters={'type': ['DISH']})
+    client.get_products(selects=['id', 'name'], headers={'x-brand': 'other'})
+    client.get_venues()
+    client.get_venues(validation='full')
+
+    assert server.hits['products'] == 5
+    assert server.hits['venues'] == 2
+    assert cache.stats.hits == 1
+
+
+def test_credentials(server: FakeClopos, clock: Clock):
+    cache = ResponseCache(clock=clock)
+    client = make_client(server, cache)
+    other = server.client(
+        token_manager=TokenManager(**{**CREDENTIALS, 'client_id': 'other'}),
+        cache=cache,
+    )
+
+    client.get_venues()
+    other.get_venues()
+    client.get_venues()
+    assert server.hits['venues'] == 2
+
+    tokens = [client.token_manager.get_token(), other.token_manager.get_token()]
+    scope = {'x-brand': CREDENTIALS['brand'], 'x-venue': CREDENTIALS['venue_id']}
+    for token in tokens * 2:
+        client.get_venues(headers={**scope, 'x-token': token})
+
+    assert server.hits['venues'] == 4
+    assert cache.stats.hits == 3
+
+
+def test_lru_by_entries(server: FakeClopos, clock: Clock):
+    cache = ResponseCache(max_entries=2, clock=clock)
+    client = make_client(server, cache)
+
+    client.get_venues(page=1)
+    client.get_venues(page=2)
+    client.get_venues(page=1)  # page 2 is the least recently used now
+    client.get_venues(page=3)
+
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+
+    client.get_venues(page=1)
+    client.get_venues(page=2)
+    assert server.hits['venues'] == 4
+
+
+def test_lru_by_bytes(server: FakeClopos, clock: Clock):
+    cache = ResponseCache(clock=clock)
+    client = make_client(server, cache)
+
+    # pages of the same size
+    size = int(client.get_venues(page=3, limit=5).headers['content-length'])
+    cache.max_bytes = size * 2
+
+    client.get_venues(page=4, limit=5)
+    client.get_venues(page=5, limit=5)
+
+    assert len(cache) == 2
+    assert cache.size <= cache.max_bytes
+    assert cache.stats.evictions == 1
+
+
+def test_invalidate(server: FakeClopos, clock: Clock):
+    cache = ResponseCache({'get_products': 60}, clock=clock)
+    client = make_client(server, cache)
+
+    client.get_venues(page=1)
+    client.get_venues(page=2)
+    client.get_products()
+
+    assert client.invalidate_cache('get_venues') == 2
+    assert len(cache) == 1
+    assert client.invalidate_cache() == 1
+    assert cache.size == 0
+    assert cache.stats.invalidations == 3
+
+    client.get_products()
+    assert server.hits['products'] == 2
+
+
+def test_errors_are_not_cached(server: FakeClopos, clock: Clock):
+    cache = ResponseCache(clock=clock)
+    client = make_client(server, cache)
+    server.fail_pages.add(1)
+
+    assert not client.get_venues(page=1).ok
+    assert not client.get_venues(page=1).ok
+
+    assert server.hits['venues'] == 2
+    assert len(cache) == 0
+
+
+def test_without_cache(server: FakeClopos):
+    client = make_client(server, None)
+
+    client.get_venues()
+    client.get_venues()
+
+    assert server.hits['venues'] == 2
+    assert client.invalidate_cache() == 0
+
+
+def test_async(server: FakeClopos, clock: Clock):
+    cache = ResponseCache(clock=clock)
+    client = make_client(server, cache, sync=False)
+
+    async def main():
+        first = await client.get_venues(limit=10)
+        second = await client.get_venues(limit=10)
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert second is first
+    assert server.hits['venues'] == 1
+    assert cache.stats.hits == 1
+
+
+def wait_for(condition, timeout: float = 2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.001)
+
+
+def test_stale_while_revalidate(server: FakeClopos, clock: Clock):
+    cache = ResponseCache({'get_venues': 60}, max_stale=30, clock=clock)
+    client = make_client(server, cache)
+    server.latency = 0.05
+
+    first = client.get_venues()
+    clock.now = 70
+
+    start = time.perf_counter()
+    stale = client.get_venues()
+    assert time.perf_counter() - start < server.latency
+    assert stale is first
+
+    client.get_venues()  # still stale, refresh is already in flight
+    wait_for(lambda: cache.stats.refreshes == 1)
+
+    fresh = client.get_venues()
+    assert fresh is not first
+    assert server.hits['venues'] == 2
+    assert cache.stats.stale_hits == 2
+
+
+def test_max_stale(server: FakeClopos, clock: Clock):
+    cache = ResponseCache({'get_venues': 60}, max_stale=30, clock=clock)
+    client = make_client(server, cache)
+
+    first = client.get_venues()
+    clock.now = 90  # too stale, caller waits for the fresh response
+
+    assert client.get_venues() is not first
+    assert server.hits['venues'] == 2
+    assert cache.stats.stale_hits == 0
+
+
+def test_failed_refresh(server: FakeClopos, clock: Clock):
+    cache = ResponseCache({'get_venues': 60}, max_stale=30, clock=clock)
+    client = make_client(server, cache)
+
+    first = client.get_venues(page=1)
+    server.fail_pages.add(1)
+    clock.now = 70
+
+    assert client.get_venues(page=1) is first
+    wait_for(lambda: cache.stats.refresh_failures == 1)
+    assert client.get_venues(page=1) is first  # stale response is kept
+
+
+def test_async_stale_while_revalidate(server: FakeClopos, clock: Clock):
+    cache = ResponseCache({'get_venues': 60}, max_stale=30, clock=clock)
+    client = make_client(server, cache, sync=False, validation='raw')
+
+    async def main():
+        first = await client.get_venues()
+        clock.now = 70
+
+        stale = await client.get_venues()
+        await asyncio.gather(*client._refresh_tasks)
+        fresh = await client.get_venues()
+        return first, stale, fresh
+
+    first, stale, fresh = asyncio.run(main())
+
+    assert stale is first
+    assert fresh is not first
+    assert isinstance(fresh.body, dict)  # refreshed in the same validation mode
+    assert cache.stats.refreshes == 1
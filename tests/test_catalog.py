@@ -0,0 +1,252 @@
+import asyncio
+import threading
+from decimal import Decimal
+
+import pytest
+
+from integrify.clopos.catalog import CATALOG_ROUTES, CatalogCache, CatalogSync, SQLiteCatalogStore
+from integrify.clopos.schemas.products.object import Product
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos, catalog, error
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects.update(catalog(products=250))
+    return server
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteCatalogStore(str(tmp_path / 'catalog.sqlite3'))
+
+
+def make_client(server: FakeClopos, **kwds):
+    return server.client(token_manager=TokenManager(**CREDENTIALS), **kwds)
+
+
+def test_cold_start(server: FakeClopos, store: SQLiteCatalogStore):
+    cache = CatalogCache(make_client(server), store, clock=lambda: 100).start()
+
+    assert cache.revalidation is None
+    assert len(cache['products']) == 250
+    assert len(cache['categories']) == 5
+    assert cache.get('products', 7).price == Decimal('9.50')
+    assert cache.get('products', 1000) is None
+    assert cache.fetched_at == dict.fromkeys(CATALOG_ROUTES, 100)
+
+    rows, fetched_at = store.load('products')
+    assert len(rows) == 250
+    assert fetched_at == 100
+
+
+def test_warm_start(server: FakeClopos, store: SQLiteCatalogStore):
+    CatalogCache(make_client(server), store).start()
+    server.hits.clear()
+    server.objects['products'][0]['name'] = 'Renamed'
+
+    cache = CatalogCache(make_client(server), store).start(revalidate=False)
+
+    assert not server.hits
+    assert isinstance(cache.get('products', 1), Product)
+    assert cache.get('products', 1).name == 'Product 1'
+
+    cache.refresh(['products'])
+    assert cache.get('products', 1).name == 'Renamed'
+    assert store.load('products')[0][0].count('Renamed') == 1
+
+
+def test_background_revalidation(server: FakeClopos, store: SQLiteCatalogStore):
+    CatalogCache(make_client(server), store, kinds=['stations']).start()
+    server.objects['stations'].pop()
+
+    cache = CatalogCache(make_client(server), store, kinds=['stations']).start()
+    assert len(cache['stations']) == 3  # stored ones are served right away
+
+    cache.revalidation.join()
+    assert len(cache['stations']) == 2
+    assert len(store.load('stations')[0]) == 2
+
+
+def test_missing_kinds_are_fetched(server: FakeClopos, store: SQLiteCatalogStore):
+    CatalogCache(make_client(server), store, kinds=['stations']).start()
+    server.hits.clear()
+
+    cache = CatalogCache(make_client(server), store).start(revalidate=False)
+
+    assert 'stations' not in server.hits
+    assert server.hits['products'] == 3
+    assert len(cache['payment_methods']) == 3
+
+
+def test_failed_revalidation(server: FakeClopos, store: SQLiteCatalogStore):
+    CatalogCache(make_client(server), store, kinds=['products']).start()
+    server.fail_pages.add(2)
+
+    cache = CatalogCache(make_client(server), store, kinds=['products']).start()
+    cache.revalidation.join()
+
+    assert len(cache['products']) == 250
+
+
+def test_memory_only(server: FakeClopos):
+    cache = CatalogCache(make_client(server), kinds=['sale_types']).start()
+
+    assert [sale_type.id for sale_type in cache['sale_types']] == [1, 2, 3]
+
+
+def test_async(server: FakeClopos, store: SQLiteCatalogStore):
+    CatalogCache(make_client(server), store).start()
+    server.objects['categories'].pop()
+
+    async def main():
+        cache = await CatalogCache(make_client(server, sync=False), store).astart()
+        before = len(cache['categories'])
+
+        await cache.revalidation
+        return before, len(cache['categories'])
+
+    assert asyncio.run(main()) == (5, 4)
+
+
+def change(server: FakeClopos, id_: int, **kwds):
+    product = next(item for item in server.objects['products'] if item['id'] == id_)
+    product.update(kwds, updated_at='2025-02-01 00:00:00')
+
+
+def test_sync_first_pull_is_full_scan(server: FakeClopos, store: SQLiteCatalogStore):
+    sync = CatalogSync(make_client(server), store=store)
+    delta = sync.pull()
+
+    assert delta.full_scan
+    assert len(delta.added) == delta.fetched == 250
+    assert delta.high_water_mark == '2025-01-01 00:00:00'
+    assert isinstance(sync.records[1], Product)
+
+
+def test_sync_delta(server: FakeClopos, store: SQLiteCatalogStore):
+    sync = CatalogSync(make_client(server), store=store)
+    sync.pull()
+
+    change(server, 5, name='Changed')
+    server.objects['products'].append({**server.objects['products'][0], 'id': 251})
+    server.objects['products'] = [p for p in server.objects['products'] if p['id'] != 7]
+    change(server, 9, deleted_at='2025-02-01 00:00:00')
+    server.hits.clear()
+
+    delta = sync.pull()
+
+    assert not delta.full_scan
+    assert delta.added == [251]
+    assert delta.updated == [5]
+    assert sorted(delta.deleted) == [7, 9]
+    assert delta.fetched == 2
+    assert delta.high_water_mark == '2025-02-01 00:00:00'
+
+    assert server.hits['products'] == 3  # index pages
+    assert server.hits['products/5'] == server.hits['products/251'] == 1
+    assert sync.records[5].name == 'Changed'
+    assert 7 not in sync.records and 9 not in sync.records
+
+    assert not sync.pull()  # nothing changed since
+
+
+def test_sync_is_persisted(server: FakeClopos, store: SQLiteCatalogStore):
+    CatalogSync(make_client(server), store=store).pull()
+    change(server, 5, name='Changed')
+
+    sync = CatalogSync(make_client(server), store=store)
+    assert len(sync.records) == 250
+
+    delta = sync.pull()
+    assert delta.updated == [5]
+    assert not delta.full_scan
+
+    assert CatalogSync(make_client(server), store=store).records[5].name == 'Changed'
+
+
+def test_sync_too_many_changes(server: FakeClopos):
+    sync = CatalogSync(make_client(server), max_changes=2)
+    sync.pull()
+
+    for id_ in (1, 2, 3):
+        change(server, id_, price='1.00')
+
+    delta = sync.pull()
+    assert delta.full_scan
+    assert delta.updated == [1, 2, 3]
+    assert sync.records[1].price == Decimal('1.00')
+
+
+def test_sync_without_index(server: FakeClopos):
+    sync = CatalogSync(make_client(server), kind='stations')
+    sync.pull()
+
+    server.objects['stations'][0]['name'] = 'Renamed'  # `updated_at` is not changed
+    del server.objects['stations'][2]
+
+    delta = sync.pull()
+    assert delta.full_scan
+    assert (delta.added, delta.updated, delta.deleted) == ([], [1], [3])
+
+
+def test_async_sync(server: FakeClopos):
+    sync = CatalogSync(make_client(server, sync=False))
+
+    async def main():
+        await sync.apull()
+        change(server, 10, name='Changed')
+        return await sync.apull()
+
+    delta = asyncio.run(main())
+
+    assert delta.updated == [10]
+    assert not delta.full_scan
+    assert sync.records[10].name == 'Changed'
+
+
+def test_sync_concurrent_changes(server: FakeClopos, store: SQLiteCatalogStore):
+    sync = CatalogSync(make_client(server), store=store, concurrency=8)
+    sync.pull()
+
+    for id_ in range(1, 81):
+        change(server, id_, name=f'Changed {id_}')
+
+    gone = set(range(5, 81, 10))  # deleted after the index was fetched
+    for id_ in gone:
+        server.faults[f'products/{id_}'] = [error(404, 'Not found')]
+    server.latency = 0.001
+
+    delta = sync.pull()
+
+    assert not delta.full_scan
+    assert sorted(delta.deleted) == sorted(gone)
+    assert sorted(delta.updated) == sorted(set(range(1, 81)) - gone)
+
+    expected = {p['id']: p['name'] for p in server.objects['products'] if p['id'] not in gone}
+    assert {id_: record.name for id_, record in sync.records.items()} == expected
+
+    stored = CatalogSync(make_client(server), store=store).records
+    assert {id_: record.name for id_, record in stored.items()} == expected
+
+
+def test_handler_request_model_is_per_thread(server: FakeClopos):
+    handler = make_client(server).handlers['get_product_by_id']
+    url = 'products/{id}'
+    ready, done = threading.Barrier(2), threading.Barrier(2)
+    urls = {}
+
+    def call(id_: int):
+        handler.handle_request(id_)
+        ready.wait()  # both models are set before either url is built
+        urls[id_] = handler.set_urlparams(url)
+        done.wait()
+
+    threads = [threading.Thread(target=call, args=(id_,)) for id_ in (1, 2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert urls == {1: 'products/1', 2: 'products/2'}
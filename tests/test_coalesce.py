@@ -0,0 +1,143 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from integrify.clopos.coalesce import RequestCoalescer
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos, catalog
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos(latency=0.05)
+    server.objects.update(catalog(products=500))
+    server.objects['customers'] = [{'id': 7, 'name': 'Customer 7'}]
+    return server
+
+
+def make_client(server: FakeClopos, coalescer: RequestCoalescer, **kwds):
+    return server.client(
+        token_manager=TokenManager(**CREDENTIALS),
+        coalescer=coalescer,
+        validation='raw',
+        **kwds,
+    )
+
+
+def test_async_coalescing(server: FakeClopos):
+    coalescer = RequestCoalescer()
+    client = make_client(server, coalescer, sync=False)
+
+    async def main():
+        await client.token_manager.aget_token()
+        return await asyncio.gather(
+            *(client.get_product_by_id(419, with_=['modifications']) for _ in range(50)),
+        )
+
+    resps = asyncio.run(main())
+
+    assert server.hits['products/419'] == 1
+    assert all(resp is resps[0] for resp in resps)
+    assert resps[0].body['data']['id'] == 419
+    assert (coalescer.stats.sent, coalescer.stats.coalesced) == (1, 49)
+
+
+def test_sync_coalescing(server: FakeClopos):
+    coalescer = RequestCoalescer()
+    client = make_client(server, coalescer)
+    client.token_manager.get_token()
+
+    with ThreadPoolExecutor(10) as pool:
+        resps = list(pool.map(lambda _: client.get_customer_by_id(7), range(10)))
+
+    assert server.hits['customers/7'] == 1
+    assert all(resp is resps[0] for resp in resps)
+    assert coalescer.stats.coalesced == 9
+
+
+def test_different_requests(server: FakeClopos):
+    coalescer = RequestCoalescer()
+    client = make_client(server, coalescer, sync=False)
+
+    async def main():
+        await client.token_manager.aget_token()
+        await asyncio.gather(
+            client.get_product_by_id(1),
+            client.get_product_by_id(1, with_=['modifications']),
+            client.get_product_by_id(2),
+            client.get_product_by_id(1, headers={'x-brand': 'other', 'x-token': 'oauth_1'}),
+        )
+
+        await client.get_product_by_id(1)  # not in flight anymore
+
+    asyncio.run(main())
+
+    assert server.hits['products/1'] == 4
+    assert coalescer.stats.coalesced == 0
+
+
+def test_credentials(server: FakeClopos):
+    coalescer = RequestCoalescer()
+    clients = [
+        make_client(server, coalescer),
+        server.client(
+            token_manager=TokenManager(**{**CREDENTIALS, 'client_id': 'other'}),
+            coalescer=coalescer,
+            validation='raw',
+        ),
+    ]
+    for client in clients:
+        client.token_manager.get_token()
+
+    with ThreadPoolExecutor(10) as pool:
+        list(pool.map(lambda i: clients[i % 2].get_customer_by_id(7), range(10)))
+
+    assert server.hits['customers/7'] == 2  # one per credential
+    assert coalescer.stats.coalesced == 8
+
+
+def test_routes(server: FakeClopos):
+    coalescer = RequestCoalescer(routes=['get_product_by_id'])
+    client = make_client(server, coalescer)
+    client.token_manager.get_token()
+
+    with ThreadPoolExecutor(5) as pool:
+        list(pool.map(lambda _: client.get_customer_by_id(7), range(5)))
+
+    assert server.hits['customers/7'] == 5
+
+
+def test_errors_are_shared(server: FakeClopos):
+    coalescer = RequestCoalescer()
+    client = make_client(server, coalescer, sync=False)
+    server.faults['products/1'] = [httpx.ConnectError('reset')]
+
+    async def main():
+        await client.token_manager.aget_token()
+        return await asyncio.gather(
+            *(client.get_product_by_id(1) for _ in range(3)),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(result, httpx.ConnectError) for result in results)
+    assert server.hits['products/1'] == 1
+
+
+def test_cancelled_caller(server: FakeClopos):
+    client = make_client(server, RequestCoalescer(), sync=False)
+
+    async def main():
+        await client.token_manager.aget_token()
+        first = asyncio.ensure_future(client.get_product_by_id(1))
+        second = asyncio.ensure_future(client.get_product_by_id(1))
+        await asyncio.sleep(0.01)
+
+        first.cancel()  # request is still awaited by the second caller
+        return await second
+
+    assert asyncio.run(main()).ok
+    assert server.hits['products/1'] == 1
@@ -0,0 +1,165 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from integrify.clopos.hedge import HedgePolicy
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos, catalog
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects.update(catalog(products=10))
+    return server
+
+
+def make_client(server: FakeClopos, hedging: HedgePolicy, **kwds):
+    return server.client(
+        token_manager=TokenManager(**CREDENTIALS),
+        hedging=hedging,
+        validation='raw',
+        **kwds,
+    )
+
+
+def test_delay_from_percentile():
+    policy = HedgePolicy(percentile=0.9, initial_delay=1, min_samples=10, min_delay=0.005)
+    assert policy.delay('get_product_by_id') == 1
+
+    for latency in range(1, 11):
+        policy.observe('get_product_by_id', latency / 100)
+
+    assert policy.delay('get_product_by_id') == pytest.approx(0.10)
+    assert policy.delay('get_stop_list') == 1
+
+    policy.percentile = 0
+    assert policy.delay('get_product_by_id') == pytest.approx(0.01)
+
+
+def test_budget():
+    policy = HedgePolicy(budget=0.25)
+
+    claims = []
+    for _ in range(8):
+        policy._start()
+        claims.append(policy._claim())
+
+    assert claims == [False, False, False, True, False, False, False, True]
+    assert policy.stats.over_budget == 6
+
+
+def test_sync_hedge_wins(server: FakeClopos):
+    policy = HedgePolicy(initial_delay=0.02, budget=1)
+    client = make_client(server, policy)
+    client.token_manager.get_token()
+    server.delays['products/1'] = [0.5, 0]
+
+    start = time.perf_counter()
+    assert client.get_product_by_id(1).ok
+
+    assert time.perf_counter() - start < 0.25
+    assert (policy.stats.hedged, policy.stats.wins) == (1, 1)
+
+    # losing request is recorded when it loses (time until then), and only once
+    latencies = policy._latencies['get_product_by_id']
+    assert len(latencies) == 2
+    assert max(latencies) >= 0.02
+
+    time.sleep(0.5)
+    assert len(latencies) == 2
+
+
+def test_fast_requests_are_not_hedged(server: FakeClopos):
+    policy = HedgePolicy(initial_delay=0.5, budget=1)
+    client = make_client(server, policy)
+
+    for _ in range(3):
+        assert client.get_product_by_id(1).ok
+
+    assert server.hits['products/1'] == 3
+    assert policy.stats.requests == 3
+    assert policy.stats.hedged == 0
+    assert client.get_products().ok
+    assert policy.stats.requests == 3  # not a hedged endpoint
+
+
+def test_queue_time_is_not_latency(server: FakeClopos):
+    policy = HedgePolicy(initial_delay=0.08, budget=1, workers=2)
+    client = make_client(server, policy)
+    client.token_manager.get_token()
+    server.latency = 0.03
+
+    with ThreadPoolExecutor(8) as pool:
+        resps = list(pool.map(lambda _: client.get_product_by_id(1), range(8)))
+
+    assert all(resp.ok for resp in resps)
+    assert policy.stats.hedged == 0
+
+
+def test_concurrent_hedges_keep_their_ids(server: FakeClopos):
+    policy = HedgePolicy(initial_delay=0.001, min_delay=0.001, budget=1, workers=32)
+    client = make_client(server, policy)
+    client.token_manager.get_token()
+    server.latency = 0.002
+
+    ids = [i % 10 + 1 for i in range(200)]
+    with ThreadPoolExecutor(8) as pool:
+        resps = list(pool.map(client.get_product_by_id, ids))
+
+    assert policy.stats.hedged > 0
+    assert [resp.body['data']['id'] for resp in resps] == ids
+
+
+def test_over_budget(server: FakeClopos):
+    policy = HedgePolicy(initial_delay=0.01, budget=0.1)
+    client = make_client(server, policy)
+    server.delays['products/1'] = [0.05]
+
+    assert client.get_product_by_id(1).ok
+    assert server.hits['products/1'] == 1
+    assert policy.stats.over_budget == 1
+
+
+def test_async_loser_is_cancelled(server: FakeClopos):
+    policy = HedgePolicy(initial_delay=0.02, budget=1)
+    client = make_client(server, policy, sync=False)
+    server.delays['products/1'] = [1, 0]
+
+    async def main():
+        await client.token_manager.aget_token()
+
+        start = time.perf_counter()
+        resp = await client.get_product_by_id(1)
+        elapsed = time.perf_counter() - start
+
+        await asyncio.sleep(0)
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        return resp, elapsed, tasks
+
+    resp, elapsed, tasks = asyncio.run(main())
+
+    assert resp.ok
+    assert elapsed < 0.5
+    assert not tasks  # slow request was cancelled
+    assert policy.stats.wins == 1
+    assert policy.stats.hedge_rate == 1
+
+    latencies = policy._latencies['get_product_by_id']
+    assert len(latencies) == 2  # cancelled one with the time until it lost
+    assert max(latencies) >= 0.02
+
+
+def test_async_primary_wins(server: FakeClopos):
+    policy = HedgePolicy(initial_delay=0.02, budget=1)
+    client = make_client(server, policy, sync=False)
+    server.delays['products/1'] = [0.05, 0.2]
+
+    async def main():
+        await client.token_manager.aget_token()
+        return await client.get_product_by_id(1)
+
+    assert asyncio.run(main()).ok
+    assert (policy.stats.hedged, policy.stats.wins) == (1, 0)
@@ -0,0 +1,187 @@
+import asyncio
+
+import httpx
+import pytest
+
+from integrify.clopos.idempotency import IdempotencyRegistry
+from integrify.clopos.retry import RetryPolicy
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos, error
+
+RECEIPT = {
+    'cid': 'receipt-1',
+    'payment_methods': [{'id': 1, 'name': 'Cash', 'amount': '10.00'}],
+    'user_id': 1,
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects['receipts'] = []
+    server.objects['customers'] = []
+    return server
+
+
+def make_client(server: FakeClopos, registry: IdempotencyRegistry, **kwds):
+    return server.client(
+        token_manager=TokenManager(**CREDENTIALS),
+        idempotency=registry,
+        retry_policy=RetryPolicy(backoff=0.001, jitter=False),
+        validation='raw',
+        **kwds,
+    )
+
+
+def posts(server: FakeClopos, path: str = 'receipts') -> int:
+    return server.log.count(('POST', path))
+
+
+def test_repeated_request_is_replayed(server: FakeClopos):
+    registry = IdempotencyRegistry()
+    client = make_client(server, registry)
+
+    first = client.create_receipt(**RECEIPT)
+    second = client.create_receipt(**RECEIPT)
+
+    assert second is first
+    assert posts(server) == 1
+    assert (registry.stats.sent, registry.stats.replayed) == (1, 1)
+
+    client.create_receipt(**{**RECEIPT, 'cid': 'receipt-2'})
+    assert posts(server) == 2
+
+
+def test_responses_expire(server: FakeClopos):
+    clock = Clock()
+    registry = IdempotencyRegistry(ttl=60, clock=clock)
+    client = make_client(server, registry)
+
+    client.create_receipt(**RECEIPT)
+    clock.now = 60
+    client.create_receipt(**RECEIPT)
+
+    assert posts(server) == 2
+
+
+def test_ambiguous_failure_is_reconciled(server: FakeClopos):
+    registry = IdempotencyRegistry()
+    client = make_client(server, registry)
+
+    # the receipt was created, but the response was lost
+    server.objects['receipts'].append({**RECEIPT, 'id': 7})
+    server.faults['receipts'] = [httpx.ReadTimeout('timed out')]
+
+    resp = client.create_receipt(**RECEIPT)
+
+    assert resp.ok
+    assert resp.body['data']['id'] == 7
+    assert posts(server) == 1  # not sent again
+    assert server.log.count(('GET', 'receipts/7')) == 1
+    assert (registry.stats.ambiguous, registry.stats.reconciled) == (1, 1)
+
+    assert client.create_receipt(**RECEIPT) is resp
+
+
+def test_lookup_finds_latest(server: FakeClopos):
+    registry = IdempotencyRegistry(lookup_limit=10)
+    client = make_client(server, registry)
+
+    server.objects['receipts'] = [
+        {'id': i, 'cid': f'other-{i}', 'created_at': f'2025-01-01 00:00:{i:02}'}
+        for i in range(1, 31)
+    ]
+    # the newest receipt is the one, whose response was lost
+    server.objects['receipts'].append({**RECEIPT, 'id': 31, 'created_at': '2025-01-01 00:01:00'})
+    server.faults['receipts'] = [httpx.ReadTimeout('timed out')]
+
+    resp = client.create_receipt(**RECEIPT)
+
+    assert resp.body['data']['id'] == 31
+    assert posts(server) == 1
+    assert len(server.objects['receipts']) == 31
+
+
+def test_ambiguous_failure_not_found(server: FakeClopos):
+    registry = IdempotencyRegistry()
+    client = make_client(server, registry)
+    server.faults['receipts'] = [error(502, 'Bad gateway')]
+
+    assert client.create_receipt(**RECEIPT).ok
+
+    assert posts(server) == 2
+    assert server.log.count(('GET', 'receipts')) == 1
+    assert registry.stats.reconciled == 0
+    assert len(server.objects['receipts']) == 1
+
+
+def test_connection_errors_are_not_looked_up(server: FakeClopos):
+    registry = IdempotencyRegistry()
+    client = make_client(server, registry)
+    server.faults['receipts'] = [httpx.ConnectError('refused'), error(503, 'Unavailable')]
+
+    assert client.create_receipt(**RECEIPT).ok
+
+    assert posts(server) == 3
+    assert ('GET', 'receipts') not in server.log
+    assert registry.stats.ambiguous == 0
+
+
+def test_customers(server: FakeClopos):
+    registry = IdempotencyRegistry()
+    client = make_client(server, registry)
+    server.objects['customers'].append({'id': 3, 'name': 'Customer', 'cid': 'customer-1'})
+    server.faults['customers'] = [httpx.RemoteProtocolError('disconnected')]
+
+    resp = client.create_customer(name='Customer', cid='customer-1')
+
+    assert resp.body['data']['id'] == 3
+    assert posts(server, 'customers') == 1
+
+    client.create_customer(name='Customer')  # without `cid`
+    client.create_customer(name='Customer')
+    assert posts(server, 'customers') == 3
+
+
+def test_concurrent_requests_are_sent_once(server: FakeClopos):
+    registry = IdempotencyRegistry()
+    client = make_client(server, registry, sync=False)
+    server.latency = 0.02
+
+    async def main():
+        await client.token_manager.aget_token()
+        return await asyncio.gather(*(client.create_receipt(**RECEIPT) for _ in range(5)))
+
+    resps = asyncio.run(main())
+
+    assert all(resp is resps[0] for resp in resps)
+    assert posts(server) == 1
+
+
+def test_async_reconcile(server: FakeClopos):
+    registry = IdempotencyRegistry()
+    client = make_client(server, registry, sync=False)
+    server.objects['receipts'].append({**RECEIPT, 'id': 7})
+    server.faults['receipts'] = [error(504, 'Gateway timeout')]
+
+    resp = asyncio.run(client.create_receipt(**RECEIPT))
+
+    assert resp.body['data']['id'] == 7
+    assert posts(server) == 1
+    assert registry.stats.reconciled == 1
+
+
+def test_ambiguous():
+    assert IdempotencyRegistry.ambiguous(error=httpx.ReadTimeout('timed out'))
+    assert IdempotencyRegistry.ambiguous(result=httpx.Response(502))
+    assert not IdempotencyRegistry.ambiguous(error=httpx.ConnectTimeout('timed out'))
+    assert not IdempotencyRegistry.ambiguous(result=httpx.Response(503))
+    assert not IdempotencyRegistry.ambiguous(result=httpx.Response(422))
@@ -0,0 +1,286 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import httpx
+import pytest
+
+from integrify.clopos.breaker import CircuitBreaker
+from integrify.clopos.outbox import Outbox
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos, error
+
+PAYMENT = [{'id': 1, 'name': 'Cash', 'amount': '10.00'}]
+ORDER = {
+    'service': {
+        'sale_type_id': 1,
+        'sale_type_name': 'Delivery',
+        'venue_id': 1,
+        'venue_name': 'Main',
+    },
+    'customer': {'id': 1, 'name': 'Customer'},
+    'products': [{'product_id': 1, 'count': 1}],
+}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects['receipts'] = [{'id': 1, 'cid': 'existing'}]
+    return server
+
+
+def make_outbox(server: FakeClopos, tmp_path, clock: Clock, sync: bool = True, **kwds):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS), sync=sync)
+    return Outbox(client, str(tmp_path / 'outbox.db'), clock=clock, **kwds)
+
+
+def enqueue_receipt(outbox: Outbox, cid: str):
+    outbox.enqueue('create_receipt', cid=cid, payment_methods=PAYMENT, user_id=1)
+    outbox.enqueue(
+        'close_receipt',
+        cid=cid,
+        payment_methods=PAYMENT,
+        closed_at='2025-01-01 12:00:00',
+    )
+
+
+def test_ordering_and_ids(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock)
+    enqueue_receipt(outbox, 'receipt-1')
+    outbox.enqueue('delete_receipt', key='receipt-1')
+
+    assert outbox.pending() == 3
+    assert outbox.dispatch() == 3
+    assert outbox.pending() == 0
+
+    assert [entry for entry in server.log if entry[1] != 'auth'] == [
+        ('POST', 'receipts'),
+        ('PUT', 'receipts/2'),  # id of the created receipt
+        ('DELETE', 'receipts/2'),
+    ]
+
+
+def test_duplicate_cids(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock)
+
+    first = outbox.enqueue('create_receipt', cid='receipt-1', payment_methods=PAYMENT, user_id=1)
+    second = outbox.enqueue('create_receipt', cid='receipt-1', payment_methods=PAYMENT, user_id=1)
+
+    assert first == second
+    assert (outbox.stats.enqueued, outbox.stats.duplicates) == (1, 1)
+
+    outbox.dispatch()
+    outbox.enqueue('create_receipt', cid='receipt-1', payment_methods=PAYMENT, user_id=1)
+    assert outbox.dispatch() == 0  # already delivered
+    assert server.hits['receipts'] == 1
+
+
+def test_conflict_is_delivered(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock)
+    server.faults['receipts'] = [error(409, 'Receipt with this cid exists')]
+
+    outbox.enqueue('create_receipt', cid='receipt-1', payment_methods=PAYMENT, user_id=1)
+
+    assert outbox.dispatch() == 1
+    assert outbox.stats.duplicates == 1
+
+
+def test_order_conflict_fails(server: FakeClopos, tmp_path, clock: Clock):
+    # orders are not deduplicated by `cid`, so `409` is not taken as delivered
+    server.objects['orders'] = []
+    server.faults['orders'] = [error(409, 'Conflict')]
+    outbox = make_outbox(server, tmp_path, clock)
+
+    order = {'customer_id': 1, 'payload': ORDER, 'meta': {'cid': 'order-1'}}
+    assert outbox.enqueue('create_order', key='order-1', **order) != outbox.enqueue(
+        'create_order', key='order-1', **order
+    )
+
+    assert outbox.dispatch() == 0
+    assert outbox.stats.duplicates == 0
+    assert [entry.route_name for entry in outbox.failed()] == ['create_order']
+
+
+def test_transient_failures_are_retried(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock, backoff=10)
+    server.faults['receipts'] = [error(503, 'Unavailable'), httpx.ConnectError('reset')]
+    enqueue_receipt(outbox, 'receipt-1')
+
+    assert outbox.dispatch() == 0
+    clock.now += 5
+    assert outbox.dispatch() == 0  # not due yet
+
+    clock.now += 5
+    assert outbox.dispatch() == 0  # network error, backoff is doubled
+
+    clock.now += 20
+    assert outbox.dispatch() == 2
+    assert outbox.stats.retries == 2
+    assert server.hits['receipts'] == 3
+
+
+def test_open_circuit_is_retried(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock)
+    outbox.client.circuit_breaker = CircuitBreaker(window=1, min_calls=1, open_for=60)
+    server.faults['receipts'] = [error(500, 'Error')]
+
+    outbox.enqueue('create_receipt', cid='receipt-1', payment_methods=PAYMENT, user_id=1)
+    outbox.enqueue('create_receipt', cid='receipt-2', payment_methods=PAYMENT, user_id=1)
+
+    assert outbox.dispatch() == 0
+    assert server.hits['receipts'] == 1  # the second one was not sent
+    assert outbox.stats.retries == 2
+
+
+def test_survives_restart(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock)
+    server.faults['receipts'] = [httpx.ConnectError('reset')]
+    enqueue_receipt(outbox, 'receipt-1')
+    outbox.dispatch()
+
+    restarted = make_outbox(server, tmp_path, clock)
+    clock.now += 60
+
+    assert restarted.pending() == 2
+    assert restarted.dispatch() == 2
+    assert server.objects['receipts'][-1]['closed_at'] == '2025-01-01 12:00:00'
+
+
+def test_failed_request_blocks_its_key(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock)
+    server.faults['receipts'] = [error(422, 'Invalid receipt')]
+    enqueue_receipt(outbox, 'receipt-1')
+    outbox.enqueue('update_closed_receipt', key='existing', id=1, order_status='READY')
+
+    assert outbox.dispatch() == 1  # other keys are not blocked
+
+    (failed,) = outbox.failed()
+    assert failed.route_name == 'create_receipt'
+    assert failed.error == '422: Invalid receipt'
+    assert outbox.pending() == 1  # close waits for create
+
+    outbox.requeue(failed.id, user_id=2)
+    assert outbox.dispatch() == 2
+    assert server.objects['receipts'][-1]['user_id'] == 2
+
+
+def test_unknown_id_fails(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock)
+    outbox.enqueue('delete_receipt', key='receipt-1')
+
+    assert outbox.dispatch() == 0
+    assert 'ID of the object is unknown' in outbox.failed()[0].error
+
+
+def test_invalid_route(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock)
+
+    with pytest.raises(ValueError):
+        outbox.enqueue('get_receipts', cid='receipt-1')
+
+    with pytest.raises(ValueError):
+        outbox.enqueue('delete_receipt', id=1)
+
+
+def test_async_dispatch(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock, sync=False)
+    server.latency = 0.05
+    for i in range(5):
+        enqueue_receipt(outbox, f'receipt-{i}')
+
+    start = time.perf_counter()
+    assert asyncio.run(outbox.adispatch()) == 10
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5  # receipts are sent concurrently, 2 requests each
+    assert all(receipt.get('closed_at') for receipt in server.objects['receipts'][1:])
+
+
+def test_background_dispatcher(server: FakeClopos, tmp_path):
+    outbox = make_outbox(server, tmp_path, time.time, interval=10)
+    outbox.start()
+
+    try:
+        enqueue_receipt(outbox, 'receipt-1')  # wakes up the dispatcher
+
+        deadline = time.monotonic() + 5
+        while outbox.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        outbox.stop()
+
+    assert outbox.stats.delivered == 2
+
+
+def test_replay_after_crash(server: FakeClopos, tmp_path, clock: Clock, monkeypatch):
+    outbox = make_outbox(server, tmp_path, clock)
+    enqueue_receipt(outbox, 'receipt-1')
+
+    def crash(*args):
+        raise KeyboardInterrupt  # the receipt is created, but its delivery is not recorded
+
+    monkeypatch.setattr(outbox, '_delivered', crash)
+    with pytest.raises(KeyboardInterrupt):
+        outbox.dispatch()
+
+    server.faults['receipts'] = [error(409, 'Receipt with this cid exists')]
+    restarted = make_outbox(server, tmp_path, clock)
+
+    assert restarted.dispatch() == 2
+    assert restarted.stats.duplicates == 1
+    assert ('PUT', 'receipts/2') in server.log  # id of the existing receipt
+    assert server.objects['receipts'][-1]['closed_at'] == '2025-01-01 12:00:00'
+
+
+def test_async_replay_after_conflict(server: FakeClopos, tmp_path, clock: Clock):
+    server.objects['receipts'].append({'id': 2, 'cid': 'receipt-1'})
+    server.faults['receipts'] = [error(409, 'Receipt with this cid exists')]
+    outbox = make_outbox(server, tmp_path, clock, sync=False)
+    enqueue_receipt(outbox, 'receipt-1')
+
+    assert asyncio.run(outbox.adispatch()) == 2
+    assert server.objects['receipts'][-1]['closed_at'] == '2025-01-01 12:00:00'
+
+
+def test_async_dispatch_does_not_block_loop(server: FakeClopos, tmp_path, clock: Clock):
+    outbox = make_outbox(server, tmp_path, clock, sync=False)
+    entry_id = asyncio.run(
+        outbox.aenqueue('create_receipt', cid='receipt-1', payment_methods=PAYMENT, user_id=1)
+    )
+    assert entry_id == outbox.enqueue('create_receipt', cid='receipt-1')  # duplicate
+
+    # another process is enqueuing
+    conn = sqlite3.connect(outbox.path, isolation_level=None, check_same_thread=False)
+    conn.execute('BEGIN IMMEDIATE')
+    threading.Timer(0.3, conn.close).start()
+
+    async def main():
+        dispatch = asyncio.ensure_future(outbox.adispatch())
+
+        gaps = []
+        while not dispatch.done():
+            start = time.monotonic()
+            await asyncio.sleep(0.01)
+            gaps.append(time.monotonic() - start)
+
+        return await dispatch, max(gaps)
+
+    delivered, gap = asyncio.run(main())
+
+    assert delivered == 1
+    assert gap < 0.2
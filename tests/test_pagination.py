@@ -0,0 +1,212 @@
+import asyncio
+
+import httpx
+import pytest
+
+from integrify.clopos.exceptions import CloposResponseError
+from integrify.clopos.pagination import PageSizeController
+from integrify.clopos.schemas.products.object import Product
+from integrify.clopos.schemas.venues.object import Venue
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos, meta
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 26)]
+    server.objects['products'] = [
+        {'id': i, 'name': f'Product {i}', 'price': i, 'type': 'GOODS'} for i in range(1, 21)
+    ]
+    return server
+
+
+def test_iter_stops_on_short_page(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    venues = list(client.iter_venues(limit=10))
+
+    assert [venue.id for venue in venues] == list(range(1, 26))
+    assert all(isinstance(venue, Venue) for venue in venues)
+    assert server.hits['venues'] == 3
+
+
+def test_iter_stops_on_total(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    products = list(client.iter_products(limit=10, selects=['id', 'name', 'price']))
+
+    assert len(products) == 20
+    assert all(isinstance(product, Product) for product in products)
+    assert server.hits['products'] == 2  # no extra request for the empty page
+
+
+def test_iter_continues_after_short_page(server: FakeClopos):
+    server.faults['venues'] = [
+        httpx.Response(200, json=meta(data=server.objects['venues'][:5], total=25)),
+    ]
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    venues = list(client.iter_venues(limit=10))
+
+    assert [venue.id for venue in venues] == [*range(1, 6), *range(11, 26)]
+    assert server.hits['venues'] == 3
+
+
+def test_iter_customers(server: FakeClopos):
+    server.objects['customers'] = [
+        {
+            'id': i,
+            'cid': f'customer-{i}',
+            'name': f'Customer {i}',
+            'venue_id': 1,
+            'group_id': 1,
+            'balance_id': i,
+            'created_at': '2025-01-01 12:00:00',
+            'updated_at': '2025-01-01 12:00:00',
+        }
+        for i in range(1, 26)
+    ]
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    customers = list(client.iter_customers(limit=10))
+
+    assert [customer.id for customer in customers] == list(range(1, 26))
+    assert server.hits['customers'] == 3
+
+
+def test_iter_is_lazy(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    venues = client.iter_venues(page=2, limit=5)
+    assert server.hits['venues'] == 0
+
+    assert next(venues).id == 6
+    assert server.hits['venues'] == 1
+
+
+def test_iter_failed_page(server: FakeClopos):
+    client = server.client()
+
+    with pytest.raises(CloposResponseError) as exc:
+        list(client.iter_venues(headers={'x-token': 'wrong'}))
+
+    assert exc.value.response.status_code == 401
+
+
+def test_iter_only_paginated_endpoints(server: FakeClopos):
+    client = server.client()
+
+    assert client.is_paginated('get_products')
+    assert not client.is_paginated('get_stop_list')
+
+    with pytest.raises(AttributeError):
+        client.iter_stop_list
+
+    with pytest.raises(AttributeError):
+        client.iter_unknown
+
+
+def test_async_iter(server: FakeClopos):
+    client = server.client(sync=False, token_manager=TokenManager(**CREDENTIALS))
+
+    async def main():
+        return [venue.id async for venue in client.iter_venues(limit=10)]
+
+    assert asyncio.run(main()) == list(range(1, 26))
+    assert server.hits['venues'] == 3
+
+
+def test_fetch_all(server: FakeClopos):
+    server.latency = 0.005
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    venues = list(client.fetch_all('get_venues', concurrency=2, limit=3))
+
+    assert [venue.id for venue in venues] == list(range(1, 26))
+    assert server.hits['venues'] == 9
+
+
+def test_fetch_all_without_total(server: FakeClopos):
+    server.with_total = False
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    venues = list(client.fetch_all('get_venues', limit=10))
+
+    assert [venue.id for venue in venues] == list(range(1, 26))
+    assert server.hits['venues'] == 3
+
+
+def test_fetch_all_failed_page(server: FakeClopos):
+    server.fail_pages = {2}
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+    venues = client.fetch_all('get_venues', limit=5)
+
+    assert [next(venues).id for _ in range(5)] == [1, 2, 3, 4, 5]
+
+    with pytest.raises(CloposResponseError) as exc:
+        next(venues)
+
+    assert exc.value.response.status_code == 500
+
+
+def test_fetch_all_only_paginated_endpoints(server: FakeClopos):
+    with pytest.raises(ValueError):
+        server.client().fetch_all('get_stop_list')
+
+
+def test_async_fetch_all(server: FakeClopos):
+    server.latency = 0.005
+    client = server.client(sync=False, token_manager=TokenManager(**CREDENTIALS))
+
+    async def main():
+        return [venue.id async for venue in client.fetch_all('get_venues', limit=4)]
+
+    assert asyncio.run(main()) == list(range(1, 26))
+    assert server.hits['venues'] == 7
+
+
+def test_page_size_grows_on_fast_pages(server: FakeClopos):
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 1001)]
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+    controller = PageSizeController(limit=10, min_limit=10, max_limit=160)
+
+    venues = list(client.iter_venues(limit=controller))
+
+    assert [venue.id for venue in venues] == list(range(1, 1001))
+    # offset 10 is not aligned to 20, so the first page size is used twice
+    assert controller.limits[:6] == [10, 10, 20, 40, 80, 160]
+    assert set(controller.limits[6:]) == {160}
+    assert server.hits['venues'] == len(controller.history)
+
+
+def test_page_size_shrinks_on_big_pages(server: FakeClopos):
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 201)]
+    client = server.client(sync=False, token_manager=TokenManager(**CREDENTIALS))
+    controller = PageSizeController(limit=80, min_limit=5, max_page_bytes=500)
+
+    async def main():
+        return [venue.id async for venue in client.iter_venues(limit=controller)]
+
+    assert asyncio.run(main()) == list(range(1, 201))
+    assert controller.limits[:3] == [80, 40, 20]
+    assert controller.limit < 20
+    assert all(sample.size for sample in controller.history)
+
+
+def test_page_size_keeps_offsets_aligned(server: FakeClopos):
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 101)]
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+    controller = PageSizeController(limit=10, max_limit=40, target_seconds=10)
+
+    list(client.iter_venues(page=2, limit=controller))
+
+    # items 11-20, 21-40, 41-80, 81-100
+    assert [(s.page, s.limit) for s in controller.history] == [(2, 10), (2, 20), (2, 40), (3, 40)]
+
+
+def test_page_size_bounds():
+    with pytest.raises(ValueError):
+        PageSizeController(min_limit=0)
+
+    assert PageSizeController(limit=5000, max_limit=1000).limit == 1000
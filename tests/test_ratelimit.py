@@ -0,0 +1,165 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from integrify.clopos.ratelimit import RateLimit, RateLimiter, SQLiteBucketStore
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 6)]
+    return server
+
+
+def test_burst_then_wait(clock: Clock):
+    limiter = RateLimiter(RateLimit(10, burst=3), clock=clock)
+
+    waits = [limiter.reserve('get_venues') for _ in range(5)]
+
+    assert waits[:3] == [0, 0, 0]
+    assert waits[3:] == pytest.approx([0.1, 0.2])  # reserved in order
+
+
+def test_refill(clock: Clock):
+    limiter = RateLimiter(2, clock=clock)
+
+    limiter.reserve(None)
+    limiter.reserve(None)
+    assert limiter.reserve(None) == pytest.approx(0.5)
+
+    clock.now += 10  # bucket is full again, but not over capacity
+    assert [limiter.reserve(None) for _ in range(2)] == [0, 0]
+    assert limiter.reserve(None) > 0
+
+
+def test_endpoint_limits(clock: Clock):
+    limiter = RateLimiter(100, endpoints={'create_receipt': 1}, clock=clock)
+
+    assert limiter.reserve('create_receipt') == 0
+    assert limiter.reserve('create_receipt') == pytest.approx(1)
+    assert limiter.reserve('get_receipts') == 0  # only global limit applies
+
+    assert limiter.endpoint_stats['create_receipt'].delayed == 1
+    assert limiter.endpoint_stats['get_receipts'].delayed == 0
+
+
+def test_stats(clock: Clock):
+    limiter = RateLimiter(RateLimit(4, burst=1), clock=clock)
+
+    for _ in range(3):
+        limiter.reserve('get_venues')
+
+    assert limiter.stats.requests == 3
+    assert limiter.stats.delayed == 2
+    assert limiter.stats.total_wait == pytest.approx(0.75)
+    assert limiter.stats.max_wait == pytest.approx(0.5)
+    assert limiter.stats.mean_wait == pytest.approx(0.25)
+
+
+def test_shared_between_processes(tmp_path, clock: Clock):
+    path = str(tmp_path / 'buckets.sqlite3')
+    first = RateLimiter(RateLimit(1, burst=2), store=SQLiteBucketStore(path), clock=clock)
+    second = RateLimiter(RateLimit(1, burst=2), store=SQLiteBucketStore(path), clock=clock)
+
+    assert first.reserve(None) == 0
+    assert second.reserve(None) == 0
+    assert first.reserve(None) == pytest.approx(1)
+    assert second.reserve(None) == pytest.approx(2)
+
+
+def test_threads():
+    limiter = RateLimiter(RateLimit(200, burst=1))
+    threads = [
+        threading.Thread(target=lambda: [limiter.acquire('get_venues') for _ in range(5)])
+        for _ in range(4)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert time.perf_counter() - start >= 19 / 200
+    assert limiter.stats.requests == 20
+    assert limiter.stats.delayed == 19
+
+
+def test_client(server: FakeClopos):
+    limiter = RateLimiter(endpoints={'get_venues': RateLimit(100, burst=1)})
+    client = server.client(token_manager=TokenManager(**CREDENTIALS), rate_limiter=limiter)
+
+    start = time.perf_counter()
+    for _ in range(5):
+        assert client.get_venues().ok
+
+    assert time.perf_counter() - start >= 4 / 100
+    assert server.hits['venues'] == 5
+    assert 'auth' not in limiter.endpoint_stats  # token requests are not limited
+    assert limiter.endpoint_stats['get_venues'].delayed == 4
+
+
+def test_async_client(server: FakeClopos):
+    limiter = RateLimiter(RateLimit(100, burst=2))
+    client = server.client(
+        token_manager=TokenManager(**CREDENTIALS),
+        rate_limiter=limiter,
+        sync=False,
+    )
+
+    async def main():
+        start = time.perf_counter()
+        resps = await asyncio.gather(*(client.get_venues() for _ in range(6)))
+        return time.perf_counter() - start, resps
+
+    elapsed, resps = asyncio.run(main())
+
+    assert all(resp.ok for resp in resps)
+    assert elapsed >= 4 / 100
+    assert limiter.stats.delayed == 4
+
+
+def test_async_store_does_not_block_loop(tmp_path):
+    path = str(tmp_path / 'buckets.sqlite3')
+    limiter = RateLimiter(RateLimit(100), store=SQLiteBucketStore(path))
+
+    # another process is reserving
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.execute('BEGIN IMMEDIATE')
+    threading.Timer(0.3, conn.close).start()
+
+    async def main():
+        acquire = asyncio.ensure_future(limiter.aacquire('get_venues'))
+
+        gaps = []
+        while not acquire.done():
+            start = time.monotonic()
+            await asyncio.sleep(0.01)
+            gaps.append(time.monotonic() - start)
+
+        return await acquire, max(gaps)
+
+    wait, gap = asyncio.run(main())
+
+    assert wait == 0
+    assert gap < 0.2
+    assert limiter.stats.requests == 1
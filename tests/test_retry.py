@@ -0,0 +1,172 @@
+import asyncio
+from email.utils import formatdate
+
+import httpx
+import pytest
+
+from integrify.clopos.idempotency import IdempotencyRegistry
+from integrify.clopos.retry import RetryPolicy
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos, error
+
+RECEIPT = {
+    'cid': 'receipt-1',
+    'payment_methods': [{'id': 1, 'name': 'Cash', 'amount': '10.00'}],
+    'user_id': 1,
+}
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 6)]
+    server.objects['receipts'] = []
+    server.objects['orders'] = []
+    return server
+
+
+def make_client(server: FakeClopos, policy: RetryPolicy, **kwds):
+    return server.client(
+        token_manager=TokenManager(**CREDENTIALS),
+        retry_policy=policy,
+        validation='raw',
+        **kwds,
+    )
+
+
+def fast(**kwds) -> RetryPolicy:
+    return RetryPolicy(**{'backoff': 0.001, 'jitter': False, **kwds})
+
+
+def test_transient_errors_are_retried(server: FakeClopos):
+    policy = fast()
+    client = make_client(server, policy)
+    server.faults['venues'] = [error(503, 'Unavailable'), httpx.ConnectError('reset')]
+
+    assert client.get_venues().ok
+    assert server.hits['venues'] == 3
+    assert policy.stats.retries == 2
+    assert policy.stats.recovered == 1
+    assert policy.stats.route_retries['get_venues'] == 2
+
+
+def test_attempts_are_limited(server: FakeClopos):
+    policy = fast(attempts=2)
+    client = make_client(server, policy)
+    server.faults['venues'] = [error(500, 'Error')] * 3
+
+    assert client.get_venues().status_code == 500
+    assert server.hits['venues'] == 2
+    assert policy.stats.exhausted == 1
+
+
+def test_errors_are_raised_after_retries(server: FakeClopos):
+    client = make_client(server, fast(attempts=2))
+    server.faults['venues'] = [httpx.ReadTimeout('timeout')] * 2
+
+    with pytest.raises(httpx.ReadTimeout):
+        client.get_venues()
+
+
+def test_permanent_errors_are_not_retried(server: FakeClopos):
+    policy = fast()
+    client = make_client(server, policy)
+    server.faults['venues'] = [error(422, 'Invalid')]
+
+    assert client.get_venues().status_code == 422
+    assert server.hits['venues'] == 1
+    assert policy.stats.retries == 0
+
+
+def test_post_with_cid(server: FakeClopos):
+    client = make_client(server, fast(), idempotency=IdempotencyRegistry())
+    server.faults['receipts'] = [error(502, 'Bad gateway')]
+
+    assert client.create_receipt(**RECEIPT).ok
+    assert server.hits['receipts'] == 3  # failed attempt, lookup of the cid, retry
+    assert len(server.objects['receipts']) == 1
+
+
+def test_post_with_cid_without_registry(server: FakeClopos):
+    # Clopos answers `409` to a repeated cid, so writes are retried only if they are reconciled
+    policy = fast()
+    client = make_client(server, policy)
+    server.faults['receipts'] = [error(502, 'Bad gateway')]
+
+    assert client.create_receipt(**RECEIPT).status_code == 502
+    assert server.hits['receipts'] == 1
+    assert policy.stats.retries == 0
+
+
+def test_orders_are_not_retried(server: FakeClopos):
+    policy = fast()
+    client = make_client(server, policy, idempotency=IdempotencyRegistry())
+    server.faults['orders'] = [error(502, 'Bad gateway')]
+
+    order = {
+        'customer_id': 1,
+        'payload': {
+            'service': {
+                'sale_type_id': 1,
+                'sale_type_name': 'Delivery',
+                'venue_id': 1,
+                'venue_name': 'Main',
+            },
+            'customer': {'id': 1, 'name': 'Customer'},
+            'products': [{'product_id': 1, 'count': 1}],
+        },
+    }
+    assert client.create_order(**order).status_code == 502
+    assert server.hits['orders'] == 1
+
+    server.faults['orders'] = [error(502, 'Bad gateway')]
+    assert client.create_order(**order, meta={'cid': 'order-1'}).status_code == 502
+    assert server.hits['orders'] == 2
+    assert policy.stats.retries == 0
+
+
+def test_backoff():
+    policy = RetryPolicy(backoff=1, multiplier=2, max_backoff=5, jitter=False)
+    assert [policy.delay(retry) for retry in range(5)] == [1, 2, 4, 5, 5]
+
+    policy.jitter = True
+    assert all(0 <= policy.delay(2) <= 4 for _ in range(100))
+
+
+def test_retry_after(server: FakeClopos):
+    assert RetryPolicy.retry_after(httpx.Response(429, headers={'Retry-After': '3'})) == 3
+    assert RetryPolicy.retry_after(httpx.Response(429)) is None
+
+    date = formatdate(timeval=None, usegmt=True)
+    assert RetryPolicy.retry_after(httpx.Response(503, headers={'Retry-After': date})) == 0
+
+    policy = RetryPolicy(backoff=10)
+    client = make_client(server, policy)
+    server.faults['venues'] = [
+        httpx.Response(429, headers={'Retry-After': '0.01'}, json={'success': False}),
+    ]
+
+    assert client.get_venues().ok
+    assert policy.stats.total_delay == 0.01
+
+
+def test_deadline(server: FakeClopos):
+    policy = RetryPolicy(backoff=5, jitter=False, deadline=1)
+    client = make_client(server, policy)
+    server.faults['venues'] = [error(503, 'Unavailable')]
+
+    assert client.get_venues().status_code == 503  # next attempt would be after the deadline
+    assert policy.stats.retries == 0
+    assert policy.stats.calls == 1
+
+
+def test_async(server: FakeClopos):
+    policy = fast()
+    client = make_client(server, policy, sync=False)
+    server.faults['venues'] = [error(504, 'Timeout'), httpx.ConnectError('reset')]
+
+    resp = asyncio.run(client.get_venues())
+
+    assert resp.ok
+    assert server.hits['venues'] == 3
+    assert policy.stats.retries == 2
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import tracemalloc
+
+import pytest
+
+from integrify.clopos.exceptions import CloposResponseError
+from integrify.clopos.schemas.products.object import Product
+from integrify.clopos.streaming import DataStreamParser, StreamedPage
+from integrify.clopos.tokens import TokenManager
+from tests.server import CREDENTIALS, FakeClopos
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.chunk_size = 7
+    server.objects['products'] = [
+        {'id': i, 'name': f'Product "{i}" [{{}}] ü', 'price': i, 'type': 'GOODS'}
+        for i in range(1, 26)
+    ]
+    return server
+
+
+def test_parser():
+    document = json.dumps(
+        {
+            'success': True,
+            'data': [{'id': 1, 'tags': ['a', ']'], 'nested': {'x': [1, 2.5]}}, 2, 'x"}', None],
+            'total': 1234,
+            'sorts': ['id'],
+        },
+        indent=2,
+    )
+    parser = DataStreamParser()
+
+    items = []
+    for char in document:
+        items.extend(parser.feed(char))
+
+    assert items == [{'id': 1, 'tags': ['a', ']'], 'nested': {'x': [1, 2.5]}}, 2, 'x"}', None]
+    assert parser.close() == {'success': True, 'total': 1234, 'sorts': ['id']}
+
+
+@pytest.mark.parametrize('document', ['{"data": [{"id": 1}', '{"data": [] "a": 1}', '[]'])
+def test_parser_invalid(document: str):
+    parser = DataStreamParser()
+
+    with pytest.raises(ValueError):
+        parser.feed(document)
+        parser.close()
+
+
+def test_stream_page(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    page = client.stream('get_products', page=2, limit=10)
+    assert isinstance(page, StreamedPage)
+    assert page.body is None
+
+    products = list(page)
+
+    assert [product.id for product in products] == list(range(11, 21))
+    assert all(isinstance(product, Product) for product in products)
+    assert products[0].name == 'Product "11" [{}] ü'
+    assert page.body.total == 25
+    assert page.response.is_closed
+
+
+def test_iter_stream(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    streamed = list(client.iter_products(limit=10, stream=True))
+    server.chunk_size = 0
+    loaded = list(client.iter_products(limit=10))
+
+    assert streamed == loaded
+    assert server.hits['products'] == 6
+
+
+def test_async_iter_stream(server: FakeClopos):
+    client = server.client(sync=False, token_manager=TokenManager(**CREDENTIALS))
+
+    async def main():
+        return [product.id async for product in client.iter_products(limit=10, stream=True)]
+
+    assert asyncio.run(main()) == list(range(1, 26))
+    assert server.hits['products'] == 3
+
+
+def test_stream_failed(server: FakeClopos):
+    client = server.client()
+
+    with pytest.raises(CloposResponseError) as exc:
+        client.stream('get_products', headers={'x-token': 'wrong'})
+
+    assert exc.value.response.status_code == 401
+    assert exc.value.response.body.message == 'Unauthenticated.'
+
+    with pytest.raises(ValueError):
+        client.stream('get_stop_list')
+
+
+def test_stream_retries_rejected_token(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+    client.token_manager.get_token()
+    server.revoke()
+
+    assert len(list(client.stream('get_products', limit=100))) == 25
+    assert server.hits['auth'] == 2
+
+
+def test_stream_memory():
+    server = FakeClopos()
+    server.chunk_size = 4096
+    server.objects['products'] = [
+        {'id': i, 'name': 'Product' * 50, 'price': i, 'type': 'GOODS', 'barcode': str(i)}
+        for i in range(1, 2001)
+    ]
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+    client.token_manager.get_token()
+
+    def peak(func, *args, **kwds) -> int:
+        tracemalloc.start()
+        func(*args, **kwds)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    def consume(items):
+        for _ in items:
+            pass
+
+    # rendering of the response by fake server is not client's memory
+    rendering = peak(server.paginate, 'products', {'limit': 2000})
+    loaded = peak(consume, client.iter_products(limit=2000)) - rendering
+    streamed = peak(consume, client.iter_products(limit=2000, stream=True)) - rendering
+
+    assert streamed * 10 < loaded
@@ -0,0 +1,345 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from integrify.clopos.exceptions import CloposAuthError
+from integrify.clopos.schemas.venues.object import Venue
+from integrify.clopos.tokens import (
+    FileTokenStore,
+    MemoryTokenStore,
+    SQLiteTokenStore,
+    TokenManager,
+)
+from tests.server import CREDENTIALS, FakeClopos
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 4)]
+    return server
+
+
+def test_token_is_injected_and_cached(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    for _ in range(3):
+        resp = client.get_venues()
+
+        assert resp.ok
+        assert isinstance(resp.body.data[0], Venue)
+
+    assert server.hits['auth'] == 1
+    assert server.hits['venues'] == 3
+
+    stats = client.token_manager.stats
+    assert stats.refreshes == 1
+    assert stats.waits == 1
+    assert stats.cache_hits == 2
+
+    client.token_manager.close()
+
+
+def test_explicit_token_is_not_overridden(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    resp = client.get_venues(headers={'x-token': 'manual'})
+
+    assert resp.status_code == 401
+    assert server.hits['auth'] == 0
+
+
+def test_token_per_venue(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    client.get_venues()
+    client.get_venues(headers={'x-venue': '2'})
+    client.get_venues(headers={'x-venue': '2'})
+
+    assert server.hits['auth'] == 2
+    client.token_manager.close()
+
+
+def test_scope_headers_are_sent(server: FakeClopos):
+    # Token is valid only for its brand and venue, which are not in env variables here
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+    aclient = server.client(sync=False, token_manager=TokenManager(**CREDENTIALS))
+
+    assert client.get_venues().ok
+    assert client.get_venues(headers={'x-venue': '2'}).ok
+    assert asyncio.run(aclient.get_venues()).ok
+    assert asyncio.run(aclient.get_venues(headers={'x-brand': 'other'})).ok
+    assert server.hits['auth'] == 4
+
+    client.token_manager.close()
+    aclient.token_manager.close()
+
+
+def test_background_refresh_before_expiry(server: FakeClopos):
+    server.expires_in = 12  # refresh_at = 0.2s, usable until 7s
+    manager = TokenManager(**CREDENTIALS, refresh_margin=11.8)
+    client = server.client(token_manager=manager)
+
+    client.get_venues()
+    time.sleep(0.5)
+    client.get_venues()
+
+    assert server.hits['auth'] >= 2
+    assert manager.stats.background_refreshes >= 1
+    assert manager.stats.waits == 1
+    assert manager.stats.cache_hits == 1
+
+    manager.close()
+
+
+def test_refresh_without_background(server: FakeClopos):
+    server.expires_in = 12
+    manager = TokenManager(**CREDENTIALS, refresh_margin=11.9, background_refresh=False)
+    client = server.client(token_manager=manager)
+
+    client.get_venues()
+    time.sleep(0.2)
+    client.get_venues()
+
+    assert server.hits['auth'] == 2
+    assert manager.stats.waits == 2
+    assert manager.stats.background_refreshes == 0
+
+
+def test_wrong_credentials(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**{**CREDENTIALS, 'client_secret': 'wrong'}))
+
+    with pytest.raises(CloposAuthError) as exc:
+        client.get_venues()
+
+    assert not exc.value.response.ok
+    assert server.hits['venues'] == 0
+
+
+def test_async_token_is_injected_and_cached(server: FakeClopos):
+    client = server.client(sync=False, token_manager=TokenManager(**CREDENTIALS))
+
+    async def main():
+        await client.get_venues()
+        return await asyncio.gather(*(client.get_venues() for _ in range(20)))
+
+    responses = asyncio.run(main())
+
+    assert all(resp.ok for resp in responses)
+    assert server.hits['auth'] == 1
+    assert client.token_manager.stats.cache_hits == 20
+    assert client.token_manager.stats.waits == 1
+
+    client.token_manager.close()
+
+
+def test_auto_auth():
+    from integrify.clopos.client import CloposClientClass
+
+    assert CloposClientClass().token_manager is None
+    assert isinstance(CloposClientClass(auto_auth=True).token_manager, TokenManager)
+
+
+def test_async_single_flight_refresh(server: FakeClopos):
+    server.latency = 0.001
+    client = server.client(sync=False, token_manager=TokenManager(**CREDENTIALS))
+
+    async def main():
+        return await asyncio.gather(*(client.get_venues() for _ in range(1000)))
+
+    assert all(resp.ok for resp in asyncio.run(main()))
+    assert server.hits['auth'] == 1
+    assert client.token_manager.stats.waits == 1000
+
+    client.token_manager.close()
+
+
+def test_async_retry_after_rejected_token(server: FakeClopos):
+    server.latency = 0.001
+    client = server.client(sync=False, token_manager=TokenManager(**CREDENTIALS))
+
+    async def main():
+        await client.get_venues()
+        server.revoke()  # e.g. token revoked or expired earlier than expected
+        return await asyncio.gather(*(client.get_venues() for _ in range(1000)))
+
+    assert all(resp.ok for resp in asyncio.run(main()))
+    assert server.hits['auth'] == 2
+    assert server.hits['venues'] == 2001
+    assert client.token_manager.stats.rejections == 1000
+
+    client.token_manager.close()
+
+
+def test_sync_retry_after_rejected_token(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    client.get_venues()
+    server.revoke()
+    resp = client.get_venues()
+
+    assert resp.ok
+    assert server.hits['auth'] == 2
+    assert client.token_manager.stats.rejections == 1
+
+    # Rejected response is returned as is, if token is given manually
+    assert client.get_venues(headers={'x-token': 'manual'}).status_code == 401
+    assert client.token_manager.stats.rejections == 1
+
+    client.token_manager.close()
+
+
+def test_sync_single_flight_refresh(server: FakeClopos):
+    server.latency = 0.01
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    with ThreadPoolExecutor(16) as pool:
+        responses = list(pool.map(lambda _: client.get_venues(), range(64)))
+
+    assert all(resp.ok for resp in responses)
+    assert server.hits['auth'] == 1
+
+    client.token_manager.close()
+
+
+@pytest.fixture(params=['memory', 'file', 'sqlite'])
+def store_factory(request, tmp_path):
+    if request.param == 'memory':
+        store = MemoryTokenStore()
+        return lambda: store
+
+    store_class = FileTokenStore if request.param == 'file' else SQLiteTokenStore
+    # Every "worker" gets its own instance, as if it was another process
+    return lambda: store_class(str(tmp_path / 'tokens'))
+
+
+def test_token_store_is_shared(server: FakeClopos, store_factory):
+    workers = [
+        server.client(token_manager=TokenManager(**CREDENTIALS, store=store_factory()))
+        for _ in range(4)
+    ]
+
+    for worker in workers:
+        assert worker.get_venues().ok
+
+    assert server.hits['auth'] == 1
+    assert sum(worker.token_manager.stats.store_hits for worker in workers) == 3
+
+    for worker in workers:
+        worker.token_manager.close()
+
+
+def test_token_store_concurrent_refresh(server: FakeClopos, store_factory):
+    server.latency = 0.01
+    workers = [
+        server.client(token_manager=TokenManager(**CREDENTIALS, store=store_factory()))
+        for _ in range(8)
+    ]
+
+    with ThreadPoolExecutor(8) as pool:
+        responses = list(pool.map(lambda worker: worker.get_venues(), workers))
+
+    assert all(resp.ok for resp in responses)
+    assert server.hits['auth'] == 1
+
+    for worker in workers:
+        worker.token_manager.close()
+
+
+def test_token_store_async(server: FakeClopos, store_factory):
+    server.latency = 0.01
+    workers = [
+        server.client(sync=False, token_manager=TokenManager(**CREDENTIALS, store=store_factory()))
+        for _ in range(4)
+    ]
+
+    async def main():
+        return await asyncio.gather(*(worker.get_venues() for worker in workers))
+
+    assert all(resp.ok for resp in asyncio.run(main()))
+    assert server.hits['auth'] == 1
+
+    for worker in workers:
+        worker.token_manager.close()
+
+
+def test_token_store_rejected_token_is_dropped(server: FakeClopos, store_factory):
+    first, second = (
+        server.client(token_manager=TokenManager(**CREDENTIALS, store=store_factory()))
+        for _ in range(2)
+    )
+
+    first.get_venues()
+    server.revoke()
+    assert first.get_venues().ok
+
+    # Second worker gets the refreshed token, not the revoked one
+    assert second.get_venues().ok
+    assert second.token_manager.stats.rejections == 0
+    assert server.hits['auth'] == 2
+
+    first.token_manager.close()
+    second.token_manager.close()
+
+
+def test_async_consecutive_event_loops(server: FakeClopos):
+    server.expires_in = 12  # refresh_at = 0.2s, usable until 7s
+    manager = TokenManager(**CREDENTIALS, refresh_margin=11.8)
+    client = server.client(sync=False, token_manager=manager)
+
+    assert asyncio.run(client.get_venues()).ok  # refresh is scheduled in this loop
+
+    async def main():
+        resp = await client.get_venues()
+        await asyncio.sleep(0.5)
+        return resp
+
+    assert asyncio.run(main()).ok
+    assert manager.stats.background_refreshes >= 1
+    assert server.hits['auth'] >= 2
+
+    manager.close()
+
+
+def test_async_concurrent_event_loops(server: FakeClopos):
+    server.latency = 0.05
+    client = server.client(sync=False, token_manager=TokenManager(**CREDENTIALS))
+
+    with ThreadPoolExecutor(2) as pool:
+        responses = list(pool.map(lambda _: asyncio.run(client.get_venues()), range(2)))
+
+    assert all(resp.ok for resp in responses)  # `auth` of the other loop is not joined
+
+    client.token_manager.close()
+
+
+def test_token_store_async_does_not_block_loop(server: FakeClopos, tmp_path):
+    fcntl = pytest.importorskip('fcntl')
+    store = FileTokenStore(str(tmp_path / 'tokens'))
+    client = server.client(sync=False, token_manager=TokenManager(**CREDENTIALS, store=store))
+
+    # another process is writing the store
+    file = open(store.path, 'w', encoding='utf-8')
+    fcntl.flock(file, fcntl.LOCK_EX)
+    threading.Timer(0.3, file.close).start()
+
+    async def main():
+        request = asyncio.ensure_future(client.get_venues())
+
+        gaps = []
+        while not request.done():
+            start = time.monotonic()
+            await asyncio.sleep(0.01)
+            gaps.append(time.monotonic() - start)
+
+        return await request, max(gaps)
+
+    resp, gap = asyncio.run(main())
+
+    assert resp.ok
+    assert gap < 0.2
+
+    client.token_manager.close()
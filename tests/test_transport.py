@@ -0,0 +1,93 @@
+import asyncio
+
+import httpx
+import pytest
+
+from integrify.clopos.client import CloposClientClass
+from integrify.clopos.executor import TransportConfig
+from tests.server import meta
+
+
+def venues(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json=meta(data=[{'id': 1, 'name': 'Venue 1'}]))
+
+
+def test_client_kwargs():
+    config = TransportConfig(
+        timeout=5,
+        connect_timeout=1,
+        max_connections=50,
+        max_keepalive_connections=10,
+        keepalive_expiry=30,
+    )
+    kwds = config.client_kwargs()
+
+    assert kwds['timeout'] == httpx.Timeout(5, connect=1)
+    assert kwds['limits'] == httpx.Limits(
+        max_connections=50,
+        max_keepalive_connections=10,
+        keepalive_expiry=30,
+    )
+    assert kwds['http2'] is False
+    assert 'transport' not in kwds
+
+
+def test_route_timeout():
+    config = TransportConfig(
+        connect_timeout=2,
+        timeouts={'create_receipt': 30, 'get_stop_list': httpx.Timeout(1)},
+    )
+
+    assert config.route_timeout('create_receipt') == httpx.Timeout(30, connect=2)
+    assert config.route_timeout('get_stop_list') == httpx.Timeout(1)
+    assert config.route_timeout('get_venues') is None
+
+
+def test_custom_transport():
+    transport = httpx.MockTransport(venues)
+    client = CloposClientClass(validation='raw', transport=TransportConfig(transport=transport))
+
+    assert client.get_venues(headers={'x-token': 'token'}).ok
+    assert client.request_executor.client._transport is transport
+
+
+def test_async_custom_transport():
+    async def handle(request: httpx.Request) -> httpx.Response:
+        return venues(request)
+
+    transport = TransportConfig(transport=httpx.MockTransport(handle))
+    client = CloposClientClass(sync=False, validation='raw', transport=transport)
+
+    assert asyncio.run(client.get_venues(headers={'x-token': 'token'})).ok
+
+
+def test_per_endpoint_timeout():
+    timeouts = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        timeouts.append(request.extensions['timeout'])
+        return venues(request)
+
+    transport = TransportConfig(
+        timeout=10,
+        timeouts={'get_venues': 3},
+        transport=httpx.MockTransport(handle),
+    )
+    client = CloposClientClass(validation='raw', transport=transport)
+
+    client.get_venues(headers={'x-token': 'token'})
+    client.get_users(headers={'x-token': 'token'})
+
+    assert timeouts[0] == httpx.Timeout(3).as_dict()
+    assert timeouts[1] == httpx.Timeout(10).as_dict()
+
+    page = client.stream('get_venues', headers={'x-token': 'token'})
+    page.close()
+    assert timeouts[2] == httpx.Timeout(3).as_dict()
+
+
+def test_http2_requires_h2():
+    pytest.importorskip('h2')
+
+    client = CloposClientClass(transport=TransportConfig(http2=True))
+    assert client.request_executor.client._transport._pool._http2
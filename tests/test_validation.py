@@ -0,0 +1,65 @@
+from decimal import Decimal
+
+import pytest
+
+from integrify.clopos.handlers import GetProductByIDHandler
+from integrify.clopos.schemas.common.response import ErrorResponse
+from integrify.clopos.schemas.products.object import Product
+from integrify.clopos.schemas.venues.object import Venue
+from integrify.clopos.tokens import TokenManager
+from integrify.clopos.validation import validation
+from tests.server import CREDENTIALS, FakeClopos, error
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    server.objects['venues'] = [{'id': i, 'name': f'Venue {i}'} for i in range(1, 26)]
+    return server
+
+
+def test_full(clopos_product_dish_with_modifiers):
+    resp = GetProductByIDHandler().handle_response(clopos_product_dish_with_modifiers)
+
+    assert isinstance(resp.body.data, Product)
+    assert resp.body.data.price == Decimal(200)
+
+
+def test_raw(clopos_product_dish_with_modifiers):
+    with validation('raw'):
+        resp = GetProductByIDHandler().handle_response(clopos_product_dish_with_modifiers)
+
+    assert resp.body == clopos_product_dish_with_modifiers.json()
+
+
+@pytest.mark.parametrize('mode', ['full', 'raw'])
+def test_errors_are_validated(mode: str):
+    with validation(mode):  # type: ignore[arg-type]
+        resp = GetProductByIDHandler().handle_response(error(404, 'Not found'))
+
+    assert isinstance(resp.body, ErrorResponse)
+    assert resp.body.message == 'Not found'
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError), validation('lazy'):  # type: ignore[arg-type]
+        pass
+
+
+def test_client_and_call_modes(server: FakeClopos):
+    client = server.client(token_manager=TokenManager(**CREDENTIALS), validation='raw')
+
+    assert client.get_venues().body['data'][0] == {'id': 1, 'name': 'Venue 1'}
+    assert isinstance(client.get_venues(validation='full').body.data[0], Venue)
+
+
+def test_iter_modes(server: FakeClopos):
+    server.chunk_size = 16
+    client = server.client(token_manager=TokenManager(**CREDENTIALS))
+
+    raw = list(client.iter_venues(limit=10, validation='raw'))
+    streamed = list(client.iter_venues(limit=10, validation='full', stream=True))
+
+    assert raw == server.objects['venues']
+    assert [venue.id for venue in streamed] == list(range(1, 26))
+    assert all(isinstance(venue, Venue) for venue in streamed)
@@ -0,0 +1,290 @@
+import asyncio
+import threading
+
+import pytest
+
+from integrify.clopos.exceptions import CloposResponseError
+from integrify.clopos.tokens import TokenManager
+from integrify.clopos.watchers import OrderWatcher, StopListEvent, StopListWatcher
+from tests.server import CREDENTIALS, FakeClopos
+
+
+@pytest.fixture
+def server():
+    server = FakeClopos()
+    for i in range(1, 101):
+        server.stop_list_entries[i] = {'id': i, 'limit': 10, 'timestamp': 1000 + i}
+    return server
+
+
+def make_client(server: FakeClopos, **kwds):
+    return server.client(token_manager=TokenManager(**CREDENTIALS), **kwds)
+
+
+def stop(server: FakeClopos, product_id: int, limit: int, timestamp: int):
+    server.stop_list_entries[product_id] = {
+        'id': product_id,
+        'limit': limit,
+        'timestamp': timestamp,
+    }
+
+
+def test_first_poll(server: FakeClopos):
+    watcher = StopListWatcher(make_client(server))
+    events = watcher.poll()
+
+    assert len(events) == 100
+    assert events[0] == StopListEvent(1, 10, None, 1001)
+    assert events[0].kind == 'added'
+    assert watcher.limits == dict.fromkeys(range(1, 101), 10)
+    assert watcher.cursor == 1100
+
+
+def test_delta_polls(server: FakeClopos):
+    received = []
+    watcher = StopListWatcher(make_client(server), callback=received.append)
+    watcher.poll()
+    full = server.sent['products/stop-list']
+
+    stop(server, 5, 3, 2000)
+    stop(server, 200, 1, 2001)
+    events = watcher.poll()
+
+    assert [(e.product_id, e.kind, e.limit, e.previous) for e in events] == [
+        (5, 'changed', 3, 10),
+        (200, 'added', 1, None),
+    ]
+    assert received[-2:] == events
+    assert watcher.limits[5] == 3
+    assert watcher.cursor == 2001
+
+    assert watcher.poll() == []  # nothing changed since
+    assert (server.sent['products/stop-list'] - full) * 10 < full
+
+
+def test_resync_notices_removals(server: FakeClopos):
+    watcher = StopListWatcher(make_client(server), resync_every=3)
+    watcher.poll()
+
+    del server.stop_list_entries[7]
+    assert watcher.poll() == []
+    assert watcher.poll() == []
+
+    events = watcher.poll()  # full resync
+    assert events == [StopListEvent(7, None, 10, None)]
+    assert events[0].kind == 'removed'
+    assert 7 not in watcher.limits
+
+
+def test_failed_poll(server: FakeClopos):
+    watcher = StopListWatcher(make_client(server), headers={'x-token': 'invalid'})
+
+    with pytest.raises(CloposResponseError):
+        watcher.poll()
+
+
+def test_background_thread(server: FakeClopos):
+    changed = threading.Event()
+
+    def callback(event: StopListEvent):
+        if event.product_id == 5 and event.limit == 0:
+            changed.set()
+
+    watcher = StopListWatcher(make_client(server), callback=callback, interval=0.01).start()
+    stop(server, 5, 0, 2000)
+
+    assert changed.wait(2)
+    watcher.stop()
+    assert watcher.limits[5] == 0
+
+
+def test_async_iterator(server: FakeClopos):
+    watcher = StopListWatcher(make_client(server, sync=False), interval=0.01)
+
+    async def main():
+        events = []
+        async for event in watcher:
+            events.append(event)
+
+            if len(events) == 100:
+                stop(server, 5, 0, 2000)
+            elif len(events) == 101:
+                watcher.stop()
+
+        return events
+
+    events = asyncio.run(main())
+    assert events[-1] == StopListEvent(5, 0, 10, 2000)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def orders_server():
+    server = FakeClopos()
+    server.objects['orders'] = [{'id': i, 'status': 'NEW'} for i in range(1, 11)]
+    return server
+
+
+def set_status(server: FakeClopos, order_id: int, status: str):
+    next(order for order in server.objects['orders'] if order['id'] == order_id)['status'] = status
+
+
+def test_order_transitions(orders_server: FakeClopos):
+    clock = Clock()
+    received = []
+    watcher = OrderWatcher(make_client(orders_server), callback=received.append, clock=clock)
+    watcher.track(1)
+
+    events = watcher.poll()
+    assert [(e.order_id, e.status, e.previous) for e in events] == [(1, 'NEW', None)]
+
+    set_status(orders_server, 1, 'IN_PROGRESS')
+    assert watcher.poll() == []  # not due yet
+
+    clock.now = 5
+    events = watcher.poll()
+    assert [(e.order_id, e.status, e.previous) for e in events] == [(1, 'IN_PROGRESS', 'NEW')]
+    assert received == [*received[:1], *events]
+
+    set_status(orders_server, 1, 'COMPLETED')
+    clock.now = 20
+    events = watcher.poll()
+    assert events[0].final
+    assert events[0].order == {'id': 1, 'status': 'COMPLETED'}
+    assert not watcher.orders
+
+
+def test_order_backoff(orders_server: FakeClopos):
+    clock = Clock()
+    watcher = OrderWatcher(make_client(orders_server), clock=clock, max_interval=30)
+    watcher.track(1, 'NEW')
+
+    checks = []
+    for second in range(0, 120):
+        clock.now = second
+        before = watcher.requests
+        watcher.poll()
+        if watcher.requests > before:
+            checks.append(second)
+
+    assert checks == [5, 15, 35, 65, 95]  # 5, 10, 20, 30 (max), 30
+
+
+def test_orders_are_batched(orders_server: FakeClopos):
+    clock = Clock()
+    watcher = OrderWatcher(make_client(orders_server), clock=clock)
+    for i in range(1, 11):
+        watcher.track(i, 'NEW')
+
+    set_status(orders_server, 3, 'READY')
+    clock.now = 5
+    events = watcher.poll()
+
+    assert [(e.order_id, e.status) for e in events] == [(3, 'READY')]
+    assert orders_server.hits['orders'] == 1
+    assert orders_server.hits['orders/3'] == 1
+    assert watcher.requests == 2
+
+
+def test_order_budget(orders_server: FakeClopos):
+    clock = Clock()
+    watcher = OrderWatcher(make_client(orders_server), clock=clock, budget=3)
+    for i in range(1, 11):
+        watcher.track(i)  # unknown status, checked one by one
+
+    assert len(watcher.poll()) == 3
+    assert len(watcher.poll()) == 0  # budget is spent
+
+    clock.now = 1
+    assert len(watcher.poll()) == 3
+    assert watcher.requests == 6
+
+
+def test_order_budget_below_one_request(orders_server: FakeClopos):
+    clock = Clock()
+    watcher = OrderWatcher(make_client(orders_server), clock=clock, budget=0.5)
+    watcher.track(1)
+    watcher.track(2)
+
+    assert len(watcher.poll()) == 1
+    assert len(watcher.poll()) == 0
+
+    clock.now = 2
+    assert len(watcher.poll()) == 1
+
+
+def test_listing_over_budget(orders_server: FakeClopos):
+    clock = Clock()
+    orders_server.objects['orders'] = [{'id': i, 'status': 'NEW'} for i in range(1, 251)]
+    watcher = OrderWatcher(make_client(orders_server), clock=clock, budget=2)
+    for i in range(1, 6):
+        watcher.track(i, 'NEW')
+        set_status(orders_server, i, 'READY')
+
+    events = []
+    for second in range(5, 10):
+        clock.now = second
+        events.extend(watcher.poll())
+
+    # listing takes 3 pages, more than the budget, so orders are checked by id after the first try
+    assert orders_server.hits['orders'] == 2
+    assert sorted(event.order_id for event in events) == [1, 2, 3, 4, 5]
+
+
+def test_track_while_polling(orders_server: FakeClopos):
+    watcher = OrderWatcher(make_client(orders_server))
+    for i in range(1000, 50000):
+        watcher.track(i, 'SCHEDULED')  # not due
+
+    stopped = threading.Event()
+
+    def track():
+        while not stopped.is_set():
+            for i in range(100, 200):
+                watcher.track(i, 'NEW')
+            for i in range(100, 200):
+                watcher.untrack(i)
+
+    thread = threading.Thread(target=track)
+    thread.start()
+    try:
+        for _ in range(20):
+            watcher._plan()  # pylint: disable=protected-access
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def test_missing_order_is_untracked(orders_server: FakeClopos):
+    watcher = OrderWatcher(make_client(orders_server))
+    watcher.track(404)
+
+    assert watcher.poll() == []
+    assert not watcher.orders
+
+
+def test_async_order_watcher(orders_server: FakeClopos):
+    watcher = OrderWatcher(make_client(orders_server, sync=False), interval=0.01)
+    watcher.intervals['NEW'] = 0.01
+    watcher.track(1)
+    watcher.track(2)
+
+    async def main():
+        events = []
+        async for event in watcher:
+            events.append((event.order_id, event.status))
+            if len(events) == 2:
+                set_status(orders_server, 2, 'CANCELLED')
+            elif len(events) == 3:
+                watcher.stop()
+
+        return events
+
+    assert asyncio.run(main()) == [(1, 'NEW'), (2, 'NEW'), (2, 'CANCELLED')]